@@ -0,0 +1,1384 @@
+"""Micro benchmarks for the aggregator building blocks.
+
+Run from the repository root, for example::
+
+    python scripts/benchmark.py store --events 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.dedup_store import DedupStore  # noqa: E402
+
+
+BASE_TS_US = 1_735_689_600_000_000  # 2025-01-01T00:00:00Z
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _latency_summary(samples: list[float]) -> dict[str, float]:
+    return {
+        "count": len(samples),
+        "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def _records(
+    count: int, topic: str = "bench", offset: int = 0, topics: int = 0
+) -> list[tuple[str, str, int, str, str]]:
+    """Build store records; ``topics > 0`` spreads them over ``topic-N`` names."""
+    return [
+        (
+            f"{topic}-{(offset + idx) % topics}" if topics else topic,
+            f"evt-{offset + idx}",
+            BASE_TS_US + (offset + idx) * 1000,
+            "bench",
+            json.dumps({"seq": offset + idx}),
+        )
+        for idx in range(count)
+    ]
+
+
+def _timed_reads(store: DedupStore, stop: threading.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        store.stats()
+        store.load_events("bench-read")
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.001)
+
+
+def bench_store(args: argparse.Namespace) -> dict[str, object]:
+    """Measure ingest events/sec and read latency while ingest is running."""
+    report: dict[str, object] = {"events": args.events, "batch_size": args.batch_size}
+    scenarios: dict[str, Callable[[DedupStore, list], None]] = {
+        "single": lambda store, records: [store.mark_processed(*record) for record in records],
+        "batched": lambda store, records: [
+            store.mark_processed_many(records[idx : idx + args.batch_size])
+            for idx in range(0, len(records), args.batch_size)
+        ],
+    }
+    for name, ingest in scenarios.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DedupStore(Path(tmp) / "bench.sqlite")
+            store.mark_processed_many(_records(50, topic="bench-read"))
+            records = _records(args.events)
+            samples: list[float] = []
+            stop = threading.Event()
+            reader = threading.Thread(target=_timed_reads, args=(store, stop, samples))
+            reader.start()
+            start = time.perf_counter()
+            ingest(store, records)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            reader.join()
+            if hasattr(store, "close"):
+                store.close()
+        report[name] = {
+            "events_per_sec": round(args.events / elapsed, 1),
+            "read_latency": _latency_summary(samples),
+        }
+    return report
+
+
+def _populate(db_path: Path, events: int, topics: int, batch_size: int = 5000) -> None:
+    store = DedupStore(db_path)
+    for offset in range(0, events, batch_size):
+        count = min(batch_size, events - offset)
+        store.mark_processed_many(_records(count, topic="topic", offset=offset, topics=topics))
+    store.close()
+
+
+def bench_startup(args: argparse.Namespace) -> dict[str, object]:
+    """Measure service construction time and peak memory on a pre-populated store."""
+    from src.service import AggregatorService
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(args.db) if args.db else Path(tmp) / "startup.sqlite"
+        if not db_path.exists():
+            _populate(db_path, args.events, args.topics)
+        report: dict[str, object] = {"events": args.events, "db_bytes": db_path.stat().st_size}
+
+        def construct() -> None:
+            store = DedupStore(db_path)
+            AggregatorService(store)
+            store.close()
+
+        def materialize_all() -> None:
+            # Equivalent of the previous start-up path, kept for comparison.
+            store = DedupStore(db_path)
+            existing = store.load_events()
+            len(existing), {row[0] for row in existing}
+            store.close()
+
+        for name, fn in (("service_init", construct), ("load_all_events", materialize_all)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report[name] = {"seconds": round(elapsed, 4), "peak_mib": round(peak / 2**20, 2)}
+    return report
+
+
+def bench_query(args: argparse.Namespace) -> dict[str, object]:
+    """Time the /events query shapes on a large store, with and without indexes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(args.db) if args.db else Path(tmp) / "query.sqlite"
+        if not db_path.exists():
+            _populate(db_path, args.events, args.topics)
+        store = DedupStore(db_path)
+        span_us = args.events * 1000
+        window = (BASE_TS_US + span_us // 2, BASE_TS_US + span_us // 2 + span_us // 100)
+        queries: dict[str, Callable[[], object]] = {
+            "topic_page": lambda: store.load_events("topic-7", limit=100),
+            "topic_range": lambda: store.load_events(
+                "topic-7", since_us=window[0], until_us=window[1]
+            ),
+            "source_range": lambda: store.load_events(
+                source="bench", since_us=window[0], until_us=window[1]
+            ),
+            "global_page": lambda: store.load_events(limit=100, since_us=window[0]),
+        }
+        report: dict[str, object] = {"events": args.events, "topics": args.topics}
+        variants = [("indexed", ())]
+        if args.compare:
+            variants.append(
+                (
+                    "unindexed",
+                    (
+                        "DROP INDEX processed_events_ts",
+                        "DROP INDEX processed_events_topic_ts",
+                        "DROP INDEX processed_events_source_ts",
+                    ),
+                )
+            )
+        for variant, statements in variants:
+            with store._connect() as conn:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.commit()
+            results: dict[str, object] = {}
+            for name, run in queries.items():
+                samples = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    run()
+                    samples.append(time.perf_counter() - start)
+                results[name] = _latency_summary(samples)
+            report[variant] = results
+        store.close()
+    return report
+
+
+def bench_rollups(args: argparse.Namespace) -> dict[str, object]:
+    """Ingest cost of the rollup tables and /stats/rollups reads vs counting events."""
+    # Spread the events over a day so the topics span ~1440 minute buckets.
+    step_us = 86_400_000_000 // args.events
+    records = [
+        (topic, event_id, BASE_TS_US + idx * step_us, f"src-{idx % 5}", payload)
+        for idx, (topic, event_id, _, _, payload) in enumerate(
+            _records(args.events, topic="topic", topics=args.topics)
+        )
+    ]
+    report: dict[str, object] = {"events": args.events, "topics": args.topics}
+    with tempfile.TemporaryDirectory() as tmp:
+        for enabled in (False, True):
+            store = DedupStore(Path(tmp) / f"rollups-{enabled}.sqlite", rollups=enabled)
+            start = time.perf_counter()
+            for idx in range(0, len(records), args.batch_size):
+                batch = records[idx : idx + args.batch_size]
+                # Every tenth event is delivered twice.
+                store.mark_processed_many(batch + batch[:: 10])
+            elapsed = time.perf_counter() - start
+            report["ingest_rollups_on" if enabled else "ingest_rollups_off"] = {
+                "events_per_sec": round(args.events / elapsed, 1)
+            }
+            if not enabled:
+                store.close()
+
+        def count_events() -> object:
+            counts: dict[int, int] = {}
+            for row in store.load_events("topic-7"):
+                minute = row[2] - row[2] % 60_000_000
+                counts[minute] = counts.get(minute, 0) + 1
+            return counts
+
+        def group_by_sql() -> object:
+            with store._read() as conn:
+                return conn.execute(
+                    "SELECT ts_us - ts_us % 60000000, COUNT(*) FROM processed_events "
+                    "WHERE topic_id = (SELECT id FROM topics WHERE topic = ?) GROUP BY 1",
+                    ("topic-7",),
+                ).fetchall()
+
+        queries: dict[str, Callable[[], object]] = {
+            "rollups_topic": lambda: store.load_rollups("topic-7"),
+            "rollups_all": lambda: store.load_rollups(),
+            "events_count_python": count_events,
+            "events_group_by_sql": group_by_sql,
+        }
+        results: dict[str, object] = {}
+        for name, run in queries.items():
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                run()
+                samples.append(time.perf_counter() - start)
+            results[name] = _latency_summary(samples)
+        # Fold everything into hours, then read the whole day again.
+        merged = store.downsample_rollups(BASE_TS_US + 86_400_000_000, 0)
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            store.load_rollups()
+            samples.append(time.perf_counter() - start)
+        results["rollups_all_hourly"] = _latency_summary(samples)
+        report["reads"] = results
+        report["rows_merged"] = merged
+        store.close()
+    return report
+
+
+def _publish_events(count: int) -> list[dict[str, object]]:
+    return [
+        {
+            "topic": f"topic-{idx % 10}",
+            "event_id": f"evt-{idx}",
+            "timestamp": "2025-01-01T00:00:00+00:00",
+            "source": "bench",
+            "payload": {"seq": idx, "amount": idx * 1.5, "tags": ["a", "b"]},
+        }
+        for idx in range(count)
+    ]
+
+
+def bench_ingest(args: argparse.Namespace) -> dict[str, object]:
+    """CPU time per event for JSON-array /publish parsing vs the NDJSON validator."""
+    from src.models import PublishRequest, parse_event_line
+
+    events = _publish_events(args.batch_size)
+    json_body = json.dumps(events).encode("utf-8")
+    ndjson_body = "\n".join(json.dumps(event) for event in events).encode("utf-8")
+
+    def current_path() -> None:
+        PublishRequest.from_payload(json.loads(json_body))
+
+    def ndjson_path() -> None:
+        for line in ndjson_body.split(b"\n"):
+            parse_event_line(line)
+
+    report: dict[str, object] = {"batch_size": args.batch_size, "rounds": args.rounds}
+    for name, fn in (("publish_json", current_path), ("publish_ndjson", ndjson_path)):
+        start = time.process_time()
+        for _ in range(args.rounds):
+            fn()
+        cpu = time.process_time() - start
+        report[name] = {"cpu_us_per_event": round(cpu / (args.rounds * args.batch_size) * 1e6, 3)}
+    return report
+
+
+def _realistic_records(count: int, seed: int = 7) -> list[tuple[str, str, int, str, str]]:
+    """Clickstream-like events: few topics/sources, ~300-byte JSON payloads."""
+    rng = random.Random(seed)
+    topics = [
+        f"shop.{name}"
+        for name in ("page_view", "add_to_cart", "checkout", "search", "login", "payment")
+    ]
+    sources = [f"web-frontend-{idx:02d}" for idx in range(12)] + ["mobile-android", "mobile-ios"]
+    cities = ["Jakarta", "Bandung", "Surabaya", "Medan", "Makassar", "Denpasar", "Yogyakarta"]
+    agents = [
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/124.0 Safari/537.36",
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 "
+        "(KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1",
+        "okhttp/4.12.0",
+    ]
+    records = []
+    for idx in range(count):
+        payload = {
+            "user_id": rng.randrange(1, 500000),
+            "session_id": "%032x" % rng.getrandbits(128),
+            "url": f"/products/{rng.randrange(1, 20000)}?ref={rng.choice(['home', 'search', 'promo'])}",
+            "user_agent": rng.choice(agents),
+            "amount": round(rng.uniform(1, 500), 2),
+            "currency": "IDR",
+            "geo": {"country": "ID", "city": rng.choice(cities)},
+            "tags": rng.sample(["new", "sale", "mobile", "returning", "vip"], 2),
+        }
+        records.append(
+            (
+                rng.choice(topics),
+                f"evt-{idx:08d}",
+                BASE_TS_US + idx * 1000,
+                rng.choice(sources),
+                json.dumps(payload),
+            )
+        )
+    return records
+
+
+def bench_storage(args: argparse.Namespace) -> dict[str, object]:
+    """On-disk size, ingest and read throughput per payload storage mode."""
+    records = _realistic_records(args.events)
+    modes = {
+        "none": {"compression": "none"},
+        "zlib": {"compression": "zlib"},
+        "zlib_zdict": {"compression": "zlib", "zdict_size": args.zdict_size},
+    }
+    report: dict[str, object] = {
+        "events": args.events,
+        "raw_payload_mib": round(sum(len(rec[4]) for rec in records) / 2**20, 1),
+    }
+    for name, options in modes.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "storage.sqlite"
+            store = DedupStore(db_path, **options)
+            start = time.perf_counter()
+            for offset in range(0, len(records), args.batch_size):
+                store.mark_processed_many(records[offset : offset + args.batch_size])
+            ingest = time.perf_counter() - start
+            with store._connect() as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            size = db_path.stat().st_size
+
+            start = time.perf_counter()
+            after = None
+            read = 0
+            while True:
+                rows = store.load_events(None, after, 1000, lazy=True)
+                if not rows:
+                    break
+                for row in rows:
+                    json.loads(row[4].decode())
+                read += len(rows)
+                after = (rows[-1][2], rows[-1][0], rows[-1][1])
+            elapsed = time.perf_counter() - start
+            store.close()
+        report[name] = {
+            "db_mib": round(size / 2**20, 1),
+            "ingest_events_per_sec": round(len(records) / ingest),
+            "read_events_per_sec": round(read / elapsed),
+        }
+    return report
+
+
+async def _publish_through_app(
+    metrics_enabled: bool, batches: int, batch_size: int, trace_sample_rate: float = 0.0
+) -> float:
+    """Publish ``batches`` batches through the ASGI app; return events/s to commit."""
+    import httpx
+
+    from src.config import Settings
+    from src.main import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            database_path=Path(tmp) / "dedup.sqlite",
+            metrics_enabled=metrics_enabled,
+            trace_sample_rate=trace_sample_rate,
+        )
+        app = create_app(settings)
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app)
+        bodies = [
+            json.dumps(
+                [
+                    dict(event, event_id=f"evt-{round_no}-{event['event_id']}")
+                    for event in _publish_events(batch_size)
+                ]
+            )
+            for round_no in range(batches)
+        ]
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                start = time.perf_counter()
+                for body in bodies:
+                    response = await client.post(
+                        "/publish", content=body, headers={"content-type": "application/json"}
+                    )
+                    response.raise_for_status()
+                await app.state.aggregator.join()
+                elapsed = time.perf_counter() - start
+        finally:
+            await app.router.shutdown()
+    return batches * batch_size / elapsed
+
+
+def bench_metrics(args: argparse.Namespace) -> dict[str, object]:
+    """End-to-end /publish throughput with the /metrics instruments on and off."""
+    import logging
+
+    logging.disable(logging.INFO)
+    runs: dict[str, list[float]] = {"enabled": [], "disabled": []}
+    for _ in range(args.repeat):
+        # Interleave the two modes so drift affects both equally.
+        for mode in ("disabled", "enabled"):
+            rate = asyncio.run(
+                _publish_through_app(mode == "enabled", args.batches, args.batch_size)
+            )
+            runs[mode].append(rate)
+    enabled = statistics.median(runs["enabled"])
+    disabled = statistics.median(runs["disabled"])
+    return {
+        "events": args.batches * args.batch_size,
+        "repeat": args.repeat,
+        "events_per_sec_disabled": round(disabled, 1),
+        "events_per_sec_enabled": round(enabled, 1),
+        "overhead_pct": round((disabled - enabled) / disabled * 100, 2),
+    }
+
+
+def bench_tracing(args: argparse.Namespace) -> dict[str, object]:
+    """End-to-end /publish throughput by trace sample rate (0 = tracing off)."""
+    import logging
+
+    logging.disable(logging.INFO)
+    runs: dict[float, list[float]] = {rate: [] for rate in args.rates}
+    for _ in range(args.repeat):
+        for rate in args.rates:
+            runs[rate].append(
+                asyncio.run(_publish_through_app(True, args.batches, args.batch_size, rate))
+            )
+    baseline = statistics.median(runs[args.rates[0]])
+    result: dict[str, object] = {
+        "events": args.batches * args.batch_size,
+        "repeat": args.repeat,
+    }
+    for rate in args.rates:
+        median = statistics.median(runs[rate])
+        result[f"sample_rate_{rate:g}"] = {
+            "events_per_sec": round(median, 1),
+            "overhead_pct": round((baseline - median) / baseline * 100, 2),
+        }
+    return result
+
+
+async def _ack_run(
+    ingest_log: bool, ack: str, batches: int, batch_size: int, concurrency: int
+) -> dict[str, object]:
+    """Concurrent /publish?ack=... through the ASGI app until everything is stored."""
+    import httpx
+
+    from src.config import Settings
+    from src.main import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(database_path=Path(tmp) / "dedup.sqlite", ingest_log=ingest_log)
+        app = create_app(settings)
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app)
+        bodies = [
+            json.dumps(
+                [
+                    dict(event, event_id=f"evt-{round_no}-{event['event_id']}")
+                    for event in _publish_events(batch_size)
+                ]
+            )
+            for round_no in range(batches)
+        ]
+        latencies: list[float] = []
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+                async def publisher(worker: int) -> None:
+                    for body in bodies[worker::concurrency]:
+                        sent = time.perf_counter()
+                        response = await client.post(
+                            "/publish",
+                            params={"ack": ack},
+                            content=body,
+                            headers={"content-type": "application/json"},
+                        )
+                        response.raise_for_status()
+                        latencies.append(time.perf_counter() - sent)
+                        # The in-process transport never suspends; a real network
+                        # client would, which is what lets the log flusher run.
+                        await asyncio.sleep(0)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(publisher(idx) for idx in range(concurrency)))
+                await app.state.aggregator.join()
+                elapsed = time.perf_counter() - start
+                stats = (await client.get("/stats")).json()
+        finally:
+            await app.router.shutdown()
+    return {
+        "events_per_sec": round(batches * batch_size / elapsed, 1),
+        "publish": _latency_summary(latencies),
+        "fsyncs_per_request": round(stats["ingest_log"].get("flushes", 0) / batches, 3),
+    }
+
+
+def bench_acks(args: argparse.Namespace) -> dict[str, object]:
+    """Throughput and publish latency per ingest log ack mode."""
+    import logging
+
+    logging.disable(logging.INFO)
+    modes = [
+        ("no_log", False, "accepted"),
+        ("accepted", True, "accepted"),
+        ("durable", True, "durable"),
+        ("committed", True, "committed"),
+    ]
+    results: dict[str, object] = {}
+    for concurrency in args.concurrency:
+        for name, enabled, ack in modes:
+            results[f"{name}@{concurrency}"] = asyncio.run(
+                _ack_run(enabled, ack, args.batches, args.batch_size, concurrency)
+            )
+    return {"events": args.batches * args.batch_size, "runs": results}
+
+
+async def _executor_run(
+    coalesce_max: int, args: argparse.Namespace
+) -> dict[str, object]:
+    """Publish with small worker batches while readers poll /events."""
+    import httpx
+
+    workers, batches, batch_size = args.workers, args.batches, args.batch_size
+
+    from src.config import Settings
+    from src.main import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            database_path=Path(tmp) / "dedup.sqlite",
+            worker_count=workers,
+            batch_max_size=batch_size,
+            batch_linger_ms=0,
+            ingest_log=False,
+            sqlite_synchronous=args.synchronous,
+            store_coalesce_max=coalesce_max,
+            loop_lag_interval_ms=50,
+        )
+        app = create_app(settings)
+        await app.router.startup()
+        aggregator = app.state.aggregator
+        transport = httpx.ASGITransport(app=app)
+        # One topic per worker partition keeps every worker busy.
+        bodies = [
+            json.dumps(
+                [
+                    dict(event, topic=f"topic-{round_no % workers}", event_id=f"evt-{round_no}-{idx}")
+                    for idx, event in enumerate(_publish_events(batch_size))
+                ]
+            )
+            for round_no in range(batches)
+        ]
+        read_latencies: list[float] = []
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                publishing = True
+
+                async def publisher(worker: int) -> None:
+                    for body in bodies[worker::16]:
+                        response = await client.post(
+                            "/publish", content=body, headers={"content-type": "application/json"}
+                        )
+                        response.raise_for_status()
+                        await asyncio.sleep(0)
+
+                async def reader() -> None:
+                    while publishing:
+                        sent = time.perf_counter()
+                        response = await client.get("/events", params={"limit": 100})
+                        response.raise_for_status()
+                        read_latencies.append(time.perf_counter() - sent)
+
+                readers_tasks = [asyncio.create_task(reader()) for _ in range(args.readers)]
+                start = time.perf_counter()
+                await asyncio.gather(*(publisher(idx) for idx in range(16)))
+                await aggregator.join()
+                elapsed = time.perf_counter() - start
+                publishing = False
+                await asyncio.gather(*readers_tasks)
+        finally:
+            await app.router.shutdown()
+    metrics = aggregator.metrics
+
+    def mean_ms(histogram) -> float:
+        return round(histogram.total / max(1, histogram.count) * 1000, 3)
+
+    return {
+        "events_per_sec": round(batches * batch_size / elapsed, 1),
+        "store_transactions": metrics.store_latency.count,
+        "store_ms_mean": mean_ms(metrics.store_latency),
+        "write_queue_wait_ms_mean": mean_ms(metrics.store_queue_wait),
+        "read_queue_wait_ms_mean": mean_ms(metrics.store_read_queue_wait),
+        "loop_lag_ms_mean": mean_ms(metrics.loop_lag),
+        "events_read": _latency_summary(read_latencies),
+    }
+
+
+def bench_executor(args: argparse.Namespace) -> dict[str, object]:
+    """Store writer coalescing on vs off under concurrent publishes and reads."""
+    import logging
+
+    logging.disable(logging.INFO)
+    results: dict[str, object] = {}
+    for name, coalesce_max in (("no_coalescing", 1), ("coalescing", args.coalesce_max)):
+        results[name] = asyncio.run(_executor_run(coalesce_max, args))
+    return {
+        "events": args.batches * args.batch_size,
+        "workers": args.workers,
+        "synchronous": args.synchronous,
+        "runs": results,
+    }
+
+
+async def _polling_run(
+    mode: str, events: int, polls: int, limit: int
+) -> dict[str, dict[str, float]]:
+    """Poll /events?topic=...&limit=... and /stats against an idle, populated service."""
+    import httpx
+
+    from src.config import Settings
+    from src.main import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            database_path=Path(tmp) / "dedup.sqlite",
+            ingest_log=False,
+            response_cache_size=0 if mode == "no_cache" else 256,
+        )
+        app = create_app(settings)
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app)
+        results: dict[str, dict[str, float]] = {}
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for start in range(0, events, 500):
+                    batch = [
+                        dict(event, topic="orders", event_id=f"evt-{start + idx}")
+                        for idx, event in enumerate(_publish_events(min(500, events - start)))
+                    ]
+                    await client.post("/publish", json=batch)
+                await app.state.aggregator.join()
+                targets = {
+                    "events": ("/events", {"topic": "orders", "limit": limit}),
+                    "stats": ("/stats", {}),
+                }
+                for name, (path, params) in targets.items():
+                    etag = (await client.get(path, params=params)).headers.get("etag")
+                    headers = {"If-None-Match": etag} if mode == "conditional" and etag else {}
+                    latencies = []
+                    for _ in range(polls):
+                        sent = time.perf_counter()
+                        response = await client.get(path, params=params, headers=headers)
+                        latencies.append(time.perf_counter() - sent)
+                        assert response.status_code in (200, 304)
+                    results[name] = _latency_summary(latencies)
+        finally:
+            await app.router.shutdown()
+    return results
+
+
+def bench_polling(args: argparse.Namespace) -> dict[str, object]:
+    """Dashboard-style polling latency: uncached vs cached body vs If-None-Match."""
+    import logging
+
+    logging.disable(logging.INFO)
+    return {
+        "events": args.events,
+        "limit": args.limit,
+        "runs": {
+            mode: asyncio.run(_polling_run(mode, args.events, args.polls, args.limit))
+            for mode in ("no_cache", "cached", "conditional")
+        },
+    }
+
+
+async def _sync_publish_run(mode: str, size: int, rounds: int) -> dict[str, float]:
+    """POST ``rounds`` batches of ``size`` (half repeats of the previous batch)."""
+    import httpx
+
+    from src.config import Settings
+    from src.main import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            database_path=Path(tmp) / "dedup.sqlite",
+            ingest_log=False,
+            batch_max_size=500,
+            queue_maxsize=0,
+        )
+        app = create_app(settings)
+        await app.router.startup()
+        template = _publish_events(size)
+        params = {"sync": "true"} if mode == "sync" else {"ack": "committed"}
+        latencies = []
+        try:
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60
+            ) as client:
+                for round_no in range(rounds + 1):
+                    # Event ids overlap the previous round by half the batch.
+                    offset = round_no * size // 2
+                    body = json.dumps(
+                        [
+                            dict(event, event_id=f"evt-{offset + idx}")
+                            for idx, event in enumerate(template)
+                        ]
+                    )
+                    sent = time.perf_counter()
+                    response = await client.post(
+                        "/publish",
+                        params=params,
+                        content=body,
+                        headers={"content-type": "application/json"},
+                    )
+                    response.raise_for_status()
+                    if round_no:  # the first round only warms up
+                        latencies.append(time.perf_counter() - sent)
+        finally:
+            await app.router.shutdown()
+    return _latency_summary(latencies)
+
+
+def _store_resolve_run(size: int, rounds: int) -> dict[str, dict[str, float]]:
+    """The two store paths alone on batches that are half duplicates."""
+    results: dict[str, dict[str, float]] = {}
+    for name in ("mark_processed_many", "mark_processed_set"):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DedupStore(Path(tmp) / "dedup.sqlite")
+            call = getattr(store, name)
+            call(_records(size, topics=10))
+            timings = []
+            for round_no in range(1, rounds + 1):
+                batch = _records(size, offset=round_no * size // 2, topics=10)
+                started = time.perf_counter()
+                call(batch)
+                timings.append(time.perf_counter() - started)
+            store.close()
+        results[name] = _latency_summary(timings)
+    return results
+
+
+def bench_sync(args: argparse.Namespace) -> dict[str, object]:
+    """Latency of /publish?sync=true vs ack=committed, and of the store calls behind them."""
+    import logging
+
+    logging.disable(logging.INFO)
+    return {
+        str(size): {
+            "publish": {
+                mode: asyncio.run(_sync_publish_run(mode, size, args.rounds))
+                for mode in ("committed", "sync")
+            },
+            "store": _store_resolve_run(size, args.rounds),
+        }
+        for size in args.sizes
+    }
+
+
+async def _queue_run(events: int, chunk: int, trace: bool) -> dict[str, float]:
+    """Queue ``events`` before the workers start, then drain them into the store."""
+    from src.config import Settings
+    from src.models import Event
+    from src.service import create_service
+
+    def batches():
+        for start in range(0, events, chunk):
+            yield [
+                Event(**dict(event, event_id=f"evt-{start + idx}"))
+                for idx, event in enumerate(_publish_events(min(chunk, events - start)))
+            ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            database_path=Path(tmp) / "dedup.sqlite",
+            ingest_log=False,
+            batch_max_size=500,
+            prefilter_bloom_bytes=0,
+            prefilter_lru_size=0,
+        )
+        aggregator, dedup_store = create_service(settings)
+        result: dict[str, float] = {}
+        submit_cpu = 0.0
+        if trace:
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+        for batch in batches():
+            # Request parsing is identical in both layouts; only time admission.
+            started = time.process_time()
+            await aggregator.submit_batch(batch)
+            submit_cpu += time.process_time() - started
+            del batch
+        if trace:
+            result["bytes_per_queued_event"] = round(
+                (tracemalloc.get_traced_memory()[0] - baseline) / events, 1
+            )
+            tracemalloc.stop()
+        else:
+            started = time.process_time()
+            await aggregator.start()
+            await aggregator.join()
+            drain_cpu = time.process_time() - started
+            result["submit_cpu_us_per_event"] = round(submit_cpu / events * 1e6, 2)
+            result["worker_cpu_us_per_event"] = round(drain_cpu / events * 1e6, 2)
+        await aggregator.stop()
+        dedup_store.close()
+    return result
+
+
+def bench_queue(args: argparse.Namespace) -> dict[str, object]:
+    """Memory held per queued event and CPU per event from admission to the store."""
+    import logging
+
+    logging.disable(logging.INFO)
+    memory = asyncio.run(_queue_run(args.events, args.chunk, trace=True))
+    cpu = asyncio.run(_queue_run(args.events, args.chunk, trace=False))
+    return {"events": args.events, **memory, **cpu}
+
+
+async def _subscribers_run(subscribers: int, args: argparse.Namespace) -> dict[str, object]:
+    """Ingest through the service while ``subscribers`` live subscriptions consume."""
+    from src.config import Settings
+    from src.models import Event
+    from src.service import create_service
+
+    topics = args.topics
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = Settings(
+            database_path=Path(tmp) / "dedup.sqlite",
+            worker_count=args.workers,
+            batch_max_size=args.batch_size,
+            ingest_log=False,
+            subscriber_buffer=args.buffer,
+        )
+        aggregator, dedup_store = create_service(settings)
+        await aggregator.start()
+        batches = [
+            [
+                Event(**dict(event, topic=f"topic-{idx % topics}", event_id=f"evt-{number}-{idx}"))
+                for idx, event in enumerate(_publish_events(args.batch_size))
+            ]
+            for number in range(args.batches)
+        ]
+        sent_at: list[float] = [0.0] * len(batches)
+        latencies: list[float] = []
+        received = [0] * subscribers
+        dropped = [0] * subscribers
+        publishing = True
+
+        async def consume(slot: int) -> None:
+            stream = aggregator.subscribe(f"topic-{slot % topics}", heartbeat=0.2)
+            async for items in stream:
+                if not items and not publishing:
+                    break
+                now = time.perf_counter()
+                for item in items:
+                    if hasattr(item, "key"):
+                        received[slot] += 1
+                        # Sample each topic's first event per batch to keep consumers cheap.
+                        _, number, idx = item.key[2].split("-")
+                        if int(idx) < topics:
+                            latencies.append(now - sent_at[int(number)])
+                    elif item.kind == "dropped":
+                        dropped[slot] += item.data["count"]
+            await stream.aclose()
+
+        consumers = [asyncio.create_task(consume(slot)) for slot in range(subscribers)]
+        while aggregator.hub.stats()["subscribers"] < subscribers:
+            await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        for number, batch in enumerate(batches):
+            sent_at[number] = time.perf_counter()
+            await aggregator.submit_batch(batch)
+            await asyncio.sleep(0)
+        await aggregator.join()
+        ingest_elapsed = time.perf_counter() - start
+        publishing = False
+        await asyncio.gather(*consumers)
+        elapsed = time.perf_counter() - start
+        await aggregator.stop()
+        dedup_store.close()
+    events = args.batches * args.batch_size
+    return {
+        "ingest_events_per_sec": round(events / ingest_elapsed, 1),
+        "deliveries": sum(received),
+        "deliveries_per_sec": round(sum(received) / elapsed, 1),
+        "dropped": sum(dropped),
+        "delivery_latency": _latency_summary(latencies),
+    }
+
+
+def bench_subscribers(args: argparse.Namespace) -> dict[str, object]:
+    """Ingest throughput and delivery latency vs number of live subscribers."""
+    import logging
+
+    logging.disable(logging.INFO)
+    return {
+        "events": args.batches * args.batch_size,
+        "topics": args.topics,
+        "buffer": args.buffer,
+        "runs": {
+            str(count): asyncio.run(_subscribers_run(count, args)) for count in args.subscribers
+        },
+    }
+
+
+def bench_snapshot(args: argparse.Namespace) -> dict[str, object]:
+    """Hot backup MB/s (with ingest running), NDJSON export and import rows/s."""
+    from src.snapshot import export_line, import_chunks, iter_export, read_export
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _populate(root / "source.sqlite", args.events, args.topics)
+        source = DedupStore(root / "source.sqlite")
+        size_mb = (root / "source.sqlite").stat().st_size / 1e6
+
+        # Ingest keeps committing while the backup holds its read snapshot.
+        stop = threading.Event()
+        ingested = [0]
+
+        def ingest() -> None:
+            offset = args.events
+            while not stop.is_set():
+                source.mark_processed_many(_records(500, topic="live", offset=offset))
+                offset += 500
+                ingested[0] += 500
+
+        writer = threading.Thread(target=ingest)
+        writer.start()
+        started = time.perf_counter()
+        source.backup(root / "backup" / "copy.sqlite")
+        backup_seconds = time.perf_counter() - started
+        stop.set()
+        writer.join()
+        report: dict[str, object] = {
+            "events": args.events,
+            "db_mb": round(size_mb, 1),
+            "backup": {
+                "seconds": round(backup_seconds, 3),
+                "mb_per_sec": round(size_mb / backup_seconds, 1),
+                "events_ingested_meanwhile": ingested[0],
+            },
+        }
+
+        export_path = root / "export.ndjson.gz"
+        started = time.perf_counter()
+        exported = 0
+        with gzip.open(export_path, "wb", compresslevel=args.gzip_level) as out:
+            for rows in iter_export(source, topic=None):
+                out.write(b"".join(export_line(row) for row in rows))
+                exported += len(rows)
+        elapsed = time.perf_counter() - started
+        report["export"] = {
+            "rows": exported,
+            "rows_per_sec": round(exported / elapsed, 1),
+            "file_mb": round(export_path.stat().st_size / 1e6, 1),
+        }
+        source.close()
+
+        for mode, defer in (("indexed", False), ("deferred_indexes", True)):
+            target = DedupStore(root / f"{mode}.sqlite")
+            started = time.perf_counter()
+            with gzip.open(export_path, "rb") as handle:
+                added = import_chunks(target, read_export(handle), defer_indexes=defer)
+            elapsed = time.perf_counter() - started
+            target.close()
+            report[f"import_{mode}"] = {
+                "rows": added,
+                "rows_per_sec": round(added / elapsed, 1),
+            }
+    return report
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _cpu_seconds(pid: int) -> float | None:
+    """utime + stime of ``pid`` from /proc (Linux only)."""
+    import os
+
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _child_pids(pid: int) -> list[int]:
+    try:
+        return [int(c) for c in Path(f"/proc/{pid}/task/{pid}/children").read_text().split()]
+    except OSError:
+        return []
+
+
+def _frontends_run(processes: int, args: argparse.Namespace) -> dict[str, object]:
+    """Start ``python -m src.main`` with ``processes`` front ends and load it."""
+    import os
+    import signal
+    import subprocess
+    import urllib.request
+
+    root = Path(__file__).resolve().parents[1]
+    with tempfile.TemporaryDirectory() as tmp:
+        port = _free_port()
+        env = {
+            **os.environ,
+            "DEDUP_DB_PATH": str(Path(tmp) / "dedup.sqlite"),
+            "PORT": str(port),
+            "HOST": "127.0.0.1",
+            "FRONTEND_PROCESSES": str(processes),
+        }
+        env.pop("WRITER_SOCKET", None)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "src.main"],
+            cwd=root,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    urllib.request.urlopen(f"{base_url}/stats", timeout=1).read()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline or server.poll() is not None:
+                        raise RuntimeError(f"server with {processes} front ends did not start")
+                    time.sleep(0.2)
+            children = _child_pids(server.pid)
+            cpu_before = [_cpu_seconds(pid) for pid in (server.pid, *children)]
+            report_path = Path(tmp) / "report.json"
+            subprocess.run(
+                [
+                    sys.executable,
+                    str(root / "scripts" / "loadtest.py"),
+                    "--base-url", base_url,
+                    "--batches", str(args.batches),
+                    "--batch-size", str(args.batch_size),
+                    "--concurrency", str(args.concurrency),
+                    "--report", str(report_path),
+                ],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            report = json.loads(report_path.read_text())
+            cpu_after = [_cpu_seconds(pid) for pid in (server.pid, *children)]
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait(timeout=60)
+    cpu_ms_per_1k: dict[str, float] = {}
+    if None not in cpu_before + cpu_after:
+        per_1k = 1_000_000 / (args.batches * args.batch_size)
+        used = [after - before for before, after in zip(cpu_before, cpu_after)]
+        # The supervisor process hosts the writer; with one process it is everything.
+        cpu_ms_per_1k["writer" if processes > 1 else "server"] = round(used[0] * per_1k, 1)
+        if processes > 1:
+            cpu_ms_per_1k["frontends"] = round(sum(used[1:]) * per_1k, 1)
+    return {
+        "cpu_ms_per_1k_events": cpu_ms_per_1k,
+        "publish_events_per_sec": report["publish_events_per_sec"],
+        "processed_events_per_sec": report["processed_events_per_sec"],
+        "publish_p50_ms": report["publish_latency"].get("p50_ms"),
+        "publish_p99_ms": report["publish_latency"].get("p99_ms"),
+        "errors": report["errors"],
+    }
+
+
+def bench_frontends(args: argparse.Namespace) -> dict[str, object]:
+    """End-to-end HTTP throughput as the number of front-end processes grows.
+
+    ``1`` is the plain single-process server; larger counts run the writer in
+    the uvicorn supervisor and that many front ends. The load generator is a
+    separate process competing for the same cores.
+    """
+    import os
+
+    results = {str(count): _frontends_run(count, args) for count in args.processes}
+    return {
+        "cpu_count": os.cpu_count(),
+        "events": args.batches * args.batch_size,
+        "concurrency": args.concurrency,
+        "by_processes": results,
+    }
+
+
+def _start_node(root: Path, tmp: Path, port: int, members: list[str]):
+    import os
+    import subprocess
+
+    env = {
+        **os.environ,
+        "DEDUP_DB_PATH": str(tmp / f"node-{port}.sqlite"),
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "FRONTEND_PROCESSES": "1",
+        "CLUSTER_PEERS": ",".join(members),
+        "CLUSTER_SELF": f"http://127.0.0.1:{port}",
+    }
+    env.pop("WRITER_SOCKET", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "src.main"],
+        cwd=root,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def _cluster_load(urls: list[str], args: argparse.Namespace) -> dict[str, float]:
+    """Spread /publish batches round-robin over the nodes, then wait for them to be stored."""
+    import httpx
+
+    events = _publish_events(args.batches * args.batch_size)
+    bodies = [
+        json.dumps(events[idx : idx + args.batch_size]).encode("utf-8")
+        for idx in range(0, len(events), args.batch_size)
+    ]
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for idx in range(len(bodies)):
+        queue.put_nowait(idx)
+    latencies: list[float] = []
+    limits = httpx.Limits(max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+
+        async def publisher() -> None:
+            while not queue.empty():
+                idx = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post(
+                    f"{urls[idx % len(urls)]}/publish",
+                    content=bodies[idx],
+                    headers={"Content-Type": "application/json"},
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(publisher() for _ in range(args.concurrency)))
+        published = time.perf_counter() - started
+        while True:
+            stats = (await client.get(f"{urls[0]}/stats")).json()
+            if stats["unique_processed"] >= len(events):
+                break
+            await asyncio.sleep(0.05)
+        stored = time.perf_counter() - started
+        # Routing counters in ``/stats`` are per node.
+        forwarded = 0.0
+        for url in urls:
+            forwarded += (await client.get(f"{url}/stats")).json()["cluster"]["forwarded_events"]
+    return {
+        "publish_events_per_sec": round(len(events) / published, 1),
+        "stored_events_per_sec": round(len(events) / stored, 1),
+        "publish_p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "publish_p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "forwarded_share": round(forwarded / len(events), 3),
+    }
+
+
+def _cluster_run(nodes: int, args: argparse.Namespace) -> dict[str, object]:
+    import signal
+    import urllib.request
+
+    root = Path(__file__).resolve().parents[1]
+    ports = [_free_port() for _ in range(nodes)]
+    urls = [f"http://127.0.0.1:{port}" for port in ports]
+    with tempfile.TemporaryDirectory() as tmp:
+        servers = [_start_node(root, Path(tmp), port, urls) for port in ports]
+        try:
+            deadline = time.monotonic() + 60
+            for url, server in zip(urls, servers):
+                while True:
+                    try:
+                        urllib.request.urlopen(f"{url}/cluster/ring", timeout=1).read()
+                        break
+                    except OSError:
+                        if time.monotonic() > deadline or server.poll() is not None:
+                            raise RuntimeError(f"cluster node {url} did not start")
+                        time.sleep(0.2)
+            cpu_before = [_cpu_seconds(server.pid) for server in servers]
+            result: dict[str, object] = asyncio.run(_cluster_load(urls, args))
+            cpu_after = [_cpu_seconds(server.pid) for server in servers]
+        finally:
+            for server in servers:
+                server.send_signal(signal.SIGINT)
+            for server in servers:
+                server.wait(timeout=60)
+    if None not in cpu_before + cpu_after:
+        per_1k = 1_000_000 / (args.batches * args.batch_size)
+        used = [after - before for before, after in zip(cpu_before, cpu_after)]
+        result["cpu_ms_per_1k_events"] = round(sum(used) * per_1k, 1)
+        result["busiest_node_cpu_ms_per_1k_events"] = round(max(used) * per_1k, 1)
+    return result
+
+
+def bench_cluster(args: argparse.Namespace) -> dict[str, object]:
+    """Ingest throughput of a local cluster as nodes are added.
+
+    Every node is a separate ``python -m src.main`` process on its own port
+    and SQLite file; the load generator spreads batches over all of them. With
+    fewer cores than nodes the processes share CPUs, so the busiest node's CPU
+    per event is the figure that predicts scaling on dedicated machines.
+    """
+    import os
+
+    return {
+        "cpu_count": os.cpu_count(),
+        "events": args.batches * args.batch_size,
+        "concurrency": args.concurrency,
+        "by_nodes": {str(count): _cluster_run(count, args) for count in args.nodes},
+    }
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Aggregator micro benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    store = sub.add_parser("store", help="DedupStore ingest throughput and read latency")
+    store.add_argument("--events", type=int, default=20000)
+    store.add_argument("--batch-size", type=int, default=256)
+    store.set_defaults(func=bench_store)
+
+    startup = sub.add_parser("startup", help="AggregatorService start-up cost vs history size")
+    startup.add_argument("--events", type=int, default=1_000_000)
+    startup.add_argument("--topics", type=int, default=50)
+    startup.add_argument("--db", help="Reuse an existing database instead of generating one")
+    startup.set_defaults(func=bench_startup)
+
+    query = sub.add_parser("query", help="Indexed /events query latency on a large store")
+    query.add_argument("--events", type=int, default=1_000_000)
+    query.add_argument("--topics", type=int, default=50)
+    query.add_argument("--repeat", type=int, default=5)
+    query.add_argument("--db", help="Reuse an existing database instead of generating one")
+    query.add_argument(
+        "--compare", action="store_true", help="Also run after dropping the secondary indexes"
+    )
+    query.set_defaults(func=bench_query)
+
+    rollups = sub.add_parser("rollups", help="Rollup ingest cost and /stats/rollups reads")
+    rollups.add_argument("--events", type=int, default=200_000)
+    rollups.add_argument("--topics", type=int, default=20)
+    rollups.add_argument("--batch-size", type=int, default=500)
+    rollups.add_argument("--repeat", type=int, default=5)
+    rollups.set_defaults(func=bench_rollups)
+
+    ingest = sub.add_parser("ingest", help="CPU per event of /publish parsing paths")
+    ingest.add_argument("--batch-size", type=int, default=5000)
+    ingest.add_argument("--rounds", type=int, default=10)
+    ingest.set_defaults(func=bench_ingest)
+
+    storage = sub.add_parser("storage", help="Payload compression / interning size and speed")
+    storage.add_argument("--events", type=int, default=200_000)
+    storage.add_argument("--batch-size", type=int, default=500)
+    storage.add_argument("--zdict-size", type=int, default=8192)
+    storage.set_defaults(func=bench_storage)
+
+    metrics = sub.add_parser("metrics", help="Throughput cost of the /metrics instruments")
+    metrics.add_argument("--batches", type=int, default=40)
+    metrics.add_argument("--batch-size", type=int, default=500)
+    metrics.add_argument("--repeat", type=int, default=5)
+    metrics.set_defaults(func=bench_metrics)
+
+    tracing = sub.add_parser("tracing", help="Throughput cost of sampled ingest tracing")
+    tracing.add_argument("--batches", type=int, default=200)
+    tracing.add_argument("--batch-size", type=int, default=100)
+    tracing.add_argument("--repeat", type=int, default=5)
+    tracing.add_argument("--rates", type=float, nargs="+", default=[0.0, 0.01, 1.0])
+    tracing.set_defaults(func=bench_tracing)
+
+    acks = sub.add_parser("acks", help="Ingest log cost per /publish ack mode")
+    acks.add_argument("--batches", type=int, default=400)
+    acks.add_argument("--batch-size", type=int, default=50)
+    acks.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    acks.set_defaults(func=bench_acks)
+
+    executor = sub.add_parser("executor", help="Store writer coalescing under mixed load")
+    executor.add_argument("--workers", type=int, default=8)
+    executor.add_argument("--batches", type=int, default=800)
+    executor.add_argument("--batch-size", type=int, default=25)
+    executor.add_argument("--readers", type=int, default=2)
+    executor.add_argument("--coalesce-max", type=int, default=2048)
+    executor.add_argument("--synchronous", default="NORMAL")
+    executor.set_defaults(func=bench_executor)
+
+    polling = sub.add_parser("polling", help="/events and /stats polling with caching and ETags")
+    polling.add_argument("--events", type=int, default=5000)
+    polling.add_argument("--polls", type=int, default=500)
+    polling.add_argument("--limit", type=int, default=500)
+    polling.set_defaults(func=bench_polling)
+
+    sync = sub.add_parser("sync", help="Synchronous per-event publish results vs ack=committed")
+    sync.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    sync.add_argument("--rounds", type=int, default=10)
+    sync.set_defaults(func=bench_sync)
+
+    queued = sub.add_parser("queue", help="Memory per queued event and CPU per event")
+    queued.add_argument("--events", type=int, default=100000)
+    queued.add_argument("--chunk", type=int, default=500)
+    queued.set_defaults(func=bench_queue)
+
+    subscribers = sub.add_parser("subscribers", help="Live fan-out to concurrent subscribers")
+    subscribers.add_argument("--subscribers", type=int, nargs="+", default=[0, 100, 500])
+    subscribers.add_argument("--batches", type=int, default=200)
+    subscribers.add_argument("--batch-size", type=int, default=50)
+    subscribers.add_argument("--topics", type=int, default=4)
+    subscribers.add_argument("--workers", type=int, default=4)
+    subscribers.add_argument("--buffer", type=int, default=1024)
+    subscribers.set_defaults(func=bench_subscribers)
+
+    snapshot = sub.add_parser("snapshot", help="Hot backup, NDJSON export and bulk import")
+    snapshot.add_argument("--events", type=int, default=200000)
+    snapshot.add_argument("--topics", type=int, default=8)
+    snapshot.add_argument("--gzip-level", type=int, default=1)
+    snapshot.set_defaults(func=bench_snapshot)
+
+    cluster = sub.add_parser("cluster", help="Ingest scaling across local cluster nodes")
+    cluster.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 3])
+    cluster.add_argument("--batches", type=int, default=400)
+    cluster.add_argument("--batch-size", type=int, default=100)
+    cluster.add_argument("--concurrency", type=int, default=16)
+    cluster.set_defaults(func=bench_cluster)
+
+    frontends = sub.add_parser("frontends", help="HTTP throughput vs front-end process count")
+    frontends.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    frontends.add_argument("--batches", type=int, default=400)
+    frontends.add_argument("--batch-size", type=int, default=100)
+    frontends.add_argument("--concurrency", type=int, default=16)
+    frontends.set_defaults(func=bench_frontends)
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    print(json.dumps(args.func(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
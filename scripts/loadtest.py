@@ -0,0 +1,273 @@
+"""Sustained load test for the aggregator, built on ``publisher.build_events``.
+
+Drives ``POST /publish`` from ``--concurrency`` clients, optionally paced to a
+target ``--rate`` (events/s), and reports publish latency and the time until
+accepted events are reflected in ``/stats`` as a JSON document.
+
+Examples::
+
+    # in-process, no network (ASGI transport + temporary database)
+    python scripts/loadtest.py --asgi --batches 200 --batch-size 200 --concurrency 8
+
+    # against a running service, paced to 20k events/s
+    python scripts/loadtest.py --base-url http://localhost:8080 --rate 20000 --duration 30
+
+Visibility latency is measured per batch as the time from its ``/publish``
+acknowledgement until ``received``-side processing (``unique_processed +
+duplicate_dropped``) has caught up with every event acknowledged so far. Workers
+drain partitions independently, so this is an upper bound for any single batch.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from publisher import build_events  # noqa: E402
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the aggregator /publish path")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument(
+        "--base-url",
+        default=os.environ.get("BASE_URL", "http://localhost:8080"),
+        help="URL dasar layanan aggregator (default: %(default)s)",
+    )
+    target.add_argument(
+        "--asgi",
+        action="store_true",
+        help="Jalankan aplikasi in-process lewat httpx.ASGITransport (tanpa jaringan).",
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Jumlah klien paralel.")
+    parser.add_argument(
+        "--rate", type=float, default=0.0, help="Target event/detik (0 = secepat mungkin)."
+    )
+    parser.add_argument("--batch-size", type=int, default=100, help="Event per request.")
+    parser.add_argument("--batches", type=int, default=100, help="Jumlah request total.")
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=0.0,
+        help="Batas waktu kirim dalam detik; jika diisi, --batches menjadi batas atas.",
+    )
+    parser.add_argument(
+        "--duplicates-ratio", type=float, default=0.2, help="Rasio duplikat per batch (0-1)."
+    )
+    parser.add_argument("--topics", type=int, default=10, help="Kardinalitas topik.")
+    parser.add_argument("--topic", default="load-test", help="Prefix nama topik.")
+    parser.add_argument(
+        "--poll-interval", type=float, default=0.01, help="Interval polling /stats (detik)."
+    )
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--report", type=Path, help="Tulis laporan JSON ke file ini.")
+    return parser.parse_args()
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(pct: float) -> float:
+        index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": pick(50),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+@asynccontextmanager
+async def _client(args: argparse.Namespace) -> AsyncIterator[httpx.AsyncClient]:
+    if not args.asgi:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0) as client:
+            yield client
+        return
+
+    import logging
+
+    from src.config import Settings
+    from src.main import create_app
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(Settings(database_path=Path(tmp) / "dedup.sqlite"))
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://loadtest", timeout=60.0
+            ) as client:
+                yield client
+        finally:
+            await app.router.shutdown()
+
+
+async def _processed(client: httpx.AsyncClient) -> int:
+    response = await client.get("/stats")
+    response.raise_for_status()
+    stats = response.json()
+    return stats["unique_processed"] + stats["duplicate_dropped"]
+
+
+class _Run:
+    """Shared state of one load-test run."""
+
+    def __init__(self, args: argparse.Namespace, baseline: int) -> None:
+        self.args = args
+        self.baseline = baseline
+        self.next_batch = 0
+        self.acked = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.errors: dict[str, int] = {}
+        self.publish_latency: list[float] = []
+        # (ack time, events acknowledged up to and including this batch)
+        self.pending_visibility: list[tuple[float, int]] = []
+        self.visibility_latency: list[float] = []
+        self.sending = True
+
+    def claim(self, started: float) -> int | None:
+        args = self.args
+        if self.next_batch >= args.batches:
+            return None
+        if args.duration and time.perf_counter() - started >= args.duration:
+            return None
+        batch = self.next_batch
+        self.next_batch += 1
+        return batch
+
+
+async def _publisher(client: httpx.AsyncClient, run: _Run, started: float) -> None:
+    args = run.args
+    while (batch := run.claim(started)) is not None:
+        if args.rate > 0:
+            # Open-loop pacing: batch N is due at N * batch_size / rate.
+            due = started + batch * args.batch_size / args.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        events = build_events(
+            args.batch_size,
+            args.duplicates_ratio,
+            args.topic,
+            topics=args.topics,
+            id_prefix=f"lt-{int(started)}-{batch}",
+            source="loadtest",
+        )
+        sent = time.perf_counter()
+        try:
+            response = await client.post("/publish", json=events)
+        except httpx.HTTPError as exc:
+            name = type(exc).__name__
+            run.errors[name] = run.errors.get(name, 0) + 1
+            continue
+        acked = time.perf_counter()
+        run.publish_latency.append(acked - sent)
+        if response.status_code == 429:
+            run.throttled += 1
+        elif response.status_code != 200:
+            key = f"http_{response.status_code}"
+            run.errors[key] = run.errors.get(key, 0) + 1
+            continue
+        body = response.json()
+        accepted = body.get("accepted", 0)
+        run.rejected += len(events) - accepted
+        if accepted:
+            run.acked += accepted
+            run.pending_visibility.append((acked, run.acked))
+
+
+async def _visibility_poller(client: httpx.AsyncClient, run: _Run) -> None:
+    deadline: float | None = None
+    while True:
+        processed = await _processed(client) - run.baseline
+        now = time.perf_counter()
+        pending = run.pending_visibility
+        visible = 0
+        while visible < len(pending) and pending[visible][1] <= processed:
+            run.visibility_latency.append(now - pending[visible][0])
+            visible += 1
+        del pending[:visible]
+        if not run.sending:
+            if processed >= run.acked:
+                return
+            deadline = deadline or now + run.args.drain_timeout
+            if now >= deadline:
+                return
+        await asyncio.sleep(run.args.poll_interval)
+
+
+async def run_load(args: argparse.Namespace) -> dict[str, object]:
+    async with _client(args) as client:
+        run = _Run(args, await _processed(client))
+        poller = asyncio.create_task(_visibility_poller(client, run))
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(_publisher(client, run, started) for _ in range(max(1, args.concurrency)))
+        )
+        send_elapsed = time.perf_counter() - started
+        run.sending = False
+        await poller
+        total_elapsed = time.perf_counter() - started
+        final_stats = (await client.get("/stats")).json()
+
+    sent_events = run.next_batch * args.batch_size
+    return {
+        "config": {
+            "mode": "asgi" if args.asgi else args.base_url,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "batch_size": args.batch_size,
+            "batches": run.next_batch,
+            "duplicates_ratio": args.duplicates_ratio,
+            "topics": args.topics,
+        },
+        "events_sent": sent_events,
+        "events_accepted": run.acked,
+        "events_rejected": run.rejected,
+        "throttled_requests": run.throttled,
+        "errors": run.errors,
+        "send_seconds": round(send_elapsed, 3),
+        "total_seconds": round(total_elapsed, 3),
+        "publish_events_per_sec": round(sent_events / send_elapsed, 1) if send_elapsed else 0.0,
+        "processed_events_per_sec": round(run.acked / total_elapsed, 1) if total_elapsed else 0.0,
+        "unprocessed_at_exit": len(run.pending_visibility),
+        "publish_latency": _percentiles(run.publish_latency),
+        "visibility_latency": _percentiles(run.visibility_latency),
+        "final_stats": {
+            key: final_stats.get(key)
+            for key in ("received", "unique_processed", "duplicate_dropped", "queue_depths")
+        },
+    }
+
+
+def main() -> None:
+    args = _parse_args()
+    report = asyncio.run(run_load(args))
+    text = json.dumps(report, indent=2)
+    if args.report:
+        args.report.write_text(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
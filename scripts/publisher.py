@@ -7,8 +7,6 @@ import asyncio
 import os
 import time
 from datetime import datetime, timezone
-from typing import Iterable
-
 import httpx
 
 
@@ -40,27 +38,45 @@ def _parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-async def publish_batch(
-    base_url: str,
+def build_events(
     count: int,
     duplicates_ratio: float,
     topic: str,
-) -> None:
+    *,
+    topics: int = 1,
+    id_prefix: str = "evt",
+    source: str = "publisher-script",
+) -> list[dict[str, object]]:
+    """Build ``count`` events where roughly ``duplicates_ratio`` repeat an earlier id.
+
+    With ``topics > 1`` events are spread round-robin over ``topic-0..N-1``
+    style names derived from ``topic``.
+    """
     unique = max(1, int(count * (1 - duplicates_ratio)))
-    ids = [f"evt-{i}" for i in range(unique)]
+    ids = [f"{id_prefix}-{i}" for i in range(unique)]
     now = datetime.now(timezone.utc).isoformat()
     events = []
     for idx in range(count):
-        event_id = ids[idx % unique]
+        slot = idx % unique
         events.append(
             {
-                "topic": topic,
-                "event_id": event_id,
+                "topic": topic if topics <= 1 else f"{topic}-{slot % topics}",
+                "event_id": ids[slot],
                 "timestamp": now,
-                "source": "publisher-script",
+                "source": source,
                 "payload": {"seq": idx},
             }
         )
+    return events
+
+
+async def publish_batch(
+    base_url: str,
+    count: int,
+    duplicates_ratio: float,
+    topic: str,
+) -> None:
+    events = build_events(count, duplicates_ratio, topic)
 
     async with httpx.AsyncClient(timeout=60.0) as client:
         start = time.perf_counter()
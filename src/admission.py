@@ -0,0 +1,111 @@
+"""Admission control for the publish path."""
+from __future__ import annotations
+
+import math
+import time
+
+ADMISSION_POLICIES = ("block", "reject", "partial")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a publish batch is (partly) refused; maps to HTTP 429."""
+
+    def __init__(self, reason: str, retry_after: int, accepted: int = 0) -> None:
+        super().__init__(f"publish rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+        self.accepted = accepted
+
+
+class AdmissionController:
+    """Decides how much of a batch may enter the queue and when to retry.
+
+    ``high_water`` caps the number of queued events (``0`` disables the check)
+    and ``latency_target`` (seconds) rejects new work while the smoothed
+    enqueue-to-commit latency is above it and there is a backlog; the
+    latency only changes on commits, so an idle service must not keep
+    rejecting on a stale sample. ``Retry-After`` hints are derived
+    from the measured drain rate of the workers.
+    """
+
+    def __init__(
+        self,
+        policy: str = "block",
+        high_water: int = 0,
+        latency_target: float = 0.0,
+        block_timeout: float = 5.0,
+        smoothing: float = 0.2,
+    ) -> None:
+        if policy not in ADMISSION_POLICIES:
+            raise ValueError(f"unknown admission policy: {policy}")
+        self.policy = policy
+        self.high_water = max(0, high_water)
+        self.latency_target = max(0.0, latency_target)
+        self.block_timeout = max(0.0, block_timeout)
+        self._alpha = smoothing
+        self.commit_latency = 0.0
+        self.drain_rate = 0.0
+        self._last_drain = time.monotonic()
+        self.admitted = 0
+        self.rejected = 0
+        self.partial = 0
+        self.rejected_by_reason: dict[str, int] = {}
+
+    def room(self, queued: int) -> int | None:
+        """Events that still fit under the high-water mark (None = unlimited)."""
+        if not self.high_water:
+            return None
+        return max(0, self.high_water - queued)
+
+    def over_latency_target(self, backlog: int) -> bool:
+        """Whether ``backlog`` queued or in-flight events wait behind slow commits."""
+        return (
+            bool(self.latency_target)
+            and backlog > 0
+            and self.commit_latency > self.latency_target
+        )
+
+    def retry_after(self, backlog: int) -> int:
+        """Seconds until roughly ``backlog`` events should have drained."""
+        if self.drain_rate > 0:
+            estimate = backlog / self.drain_rate
+        else:
+            estimate = 1.0
+        if self.over_latency_target(backlog):
+            estimate = max(estimate, self.commit_latency)
+        return int(min(60, max(1, math.ceil(estimate))))
+
+    def reject(self, reason: str, backlog: int, accepted: int = 0) -> AdmissionRejected:
+        self.rejected_by_reason[reason] = self.rejected_by_reason.get(reason, 0) + 1
+        self.rejected += 1
+        return AdmissionRejected(reason, self.retry_after(backlog), accepted)
+
+    def record_admitted(self, count: int, partial: bool = False) -> None:
+        self.admitted += count
+        if partial:
+            self.partial += 1
+
+    def record_commit(self, count: int, latency: float) -> None:
+        """Feed back a committed batch: its size and mean enqueue-to-commit latency."""
+        now = time.monotonic()
+        elapsed = max(now - self._last_drain, 1e-6)
+        self._last_drain = now
+        self.drain_rate = self._smooth(self.drain_rate, count / elapsed)
+        self.commit_latency = self._smooth(self.commit_latency, latency)
+
+    def _smooth(self, current: float, sample: float) -> float:
+        if not current:
+            return sample
+        return self._alpha * sample + (1 - self._alpha) * current
+
+    def stats(self) -> dict[str, float]:
+        data: dict[str, float] = {
+            "admitted": float(self.admitted),
+            "rejected": float(self.rejected),
+            "partial": float(self.partial),
+            "commit_latency_ms": round(self.commit_latency * 1000, 3),
+            "drain_rate_per_sec": round(self.drain_rate, 1),
+        }
+        for reason, count in self.rejected_by_reason.items():
+            data[f"rejected_{reason}"] = float(count)
+        return data
@@ -0,0 +1,893 @@
+"""Cluster mode: several aggregator nodes sharing the ``(topic, event_id)`` key space.
+
+One process and one SQLite file is the ceiling of a single node. In cluster
+mode every node in ``CLUSTER_PEERS`` owns the arcs of a consistent-hash ring
+(``CLUSTER_VNODES`` points per node) that land on it. A node receiving
+``/publish`` splits the batch by owner, keeps its own share and forwards the
+rest as one NDJSON request per owner over pooled keep-alive ``httpx``
+connections. ``/events`` and ``/stats`` are scatter-gathered from all nodes and
+merged. Every key is stored and deduplicated by exactly one node, so nodes never
+coordinate per event.
+
+Requests between nodes carry the ``X-Cluster-Forwarded`` header and are served
+from the receiving node's own store, so nodes that briefly disagree about the
+ring cannot bounce a batch back and forth.
+
+Membership changes are rolled out with ``PUT /cluster/ring`` on every node,
+then ``POST /cluster/rebalance`` once all of them route by the new ring. Each
+node then hands the keys it no longer owns to their owner in the background:
+rows are exported in chunks, imported by the owner (``POST /cluster/import``)
+and only then deleted locally, so an interrupted handoff is simply resumed.
+Dedup keys whose events were pruned move as key-only rows. Until a node of the
+previous ring announces that its handoff is done, the new owner of a key asks
+it (``POST /cluster/lookup``) before storing the key, and imports what it
+still holds, so a resend during the handoff is still seen as a duplicate.
+The ``add-node`` and ``remove-node`` commands do both steps::
+
+    python -m src.cluster add-node http://10.0.0.4:8080 --via http://10.0.0.1:8080 --wait
+    python -m src.cluster remove-node http://10.0.0.2:8080 --via http://10.0.0.1:8080 --wait
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import heapq
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Sequence
+
+import httpx
+
+from .admission import AdmissionRejected
+from .config import Settings
+from .dedup_store import EventKey, EventRecord, ExportRow, LazyEventRecord
+from .models import Event, Rollups, Stats, encode_payload, to_epoch_micros
+from .payload_codec import DecodedPayload
+from .service import (
+    AggregatorService,
+    EventQueries,
+    _event_json,
+    _row_key,
+    encode_cursor,
+    event_record,
+    rollups_from_rows,
+)
+from .sharding import key_hash
+from .snapshot import export_line, parse_export_line
+
+logger = logging.getLogger(__name__)
+
+FORWARDED_HEADER = "X-Cluster-Forwarded"
+# Answer header of /cluster/lookup: "done" once the node finished its handoff.
+HANDOFF_HEADER = "X-Cluster-Handoff"
+HANDOFF_CHUNK = 2000
+FORWARD_COALESCE_MAX = 5000
+HANDOFF_RETRY_SECONDS = 5.0
+
+
+class PeerUnavailable(ConnectionError):
+    """A peer node could not be reached or failed the request."""
+
+
+class HashRing:
+    """Consistent-hash ring mapping dedup keys to node URLs.
+
+    Each node is placed at ``vnodes`` points; a key belongs to the first point
+    at or after its hash. Adding a node therefore only moves keys onto the new
+    node, about ``1 / len(nodes)`` of them.
+    """
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 64) -> None:
+        self.nodes = tuple(sorted(set(nodes)))
+        if not self.nodes:
+            raise ValueError("a cluster ring needs at least one node")
+        self.vnodes = max(1, vnodes)
+        points = sorted(
+            (key_hash(node, str(idx)), node) for node in self.nodes for idx in range(self.vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, topic: str, event_id: str) -> str:
+        idx = bisect.bisect_left(self._hashes, key_hash(topic, event_id))
+        return self._owners[idx % len(self._owners)]
+
+    def split(self, records: Sequence[Sequence[Any]]) -> dict[str, list[int]]:
+        """Indices of ``records`` (rows starting with topic, event_id) per owning node."""
+        groups: dict[str, list[int]] = {}
+        for idx, record in enumerate(records):
+            groups.setdefault(self.owner(record[0], record[1]), []).append(idx)
+        return groups
+
+
+class _PeerChannel:
+    """Coalesces concurrent forwards to one peer into one request per ack mode.
+
+    One request per peer is in flight; batches arriving meanwhile are sent
+    together with the next one, so a busy node pays the HTTP round trip once
+    per group instead of once per client request. A peer accepts a prefix of
+    what fits, so its ``accepted`` count is handed back to the callers in order.
+    """
+
+    def __init__(self, send: Callable[[list[EventRecord], str], Awaitable[int]]) -> None:
+        self._send = send
+        self._pending: list[tuple[Sequence[EventRecord], str, asyncio.Future[int]]] = []
+        self._task: asyncio.Task[None] | None = None
+
+    async def forward(self, records: Sequence[EventRecord], ack: str) -> int:
+        future: asyncio.Future[int] = asyncio.get_running_loop().create_future()
+        self._pending.append((records, ack, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain(), name="cluster-forward")
+        return await future
+
+    async def _drain(self) -> None:
+        while self._pending:
+            ack = self._pending[0][1]
+            group: list[tuple[Sequence[EventRecord], str, asyncio.Future[int]]] = []
+            rest = []
+            size = 0
+            for item in self._pending:
+                if item[1] == ack and (not group or size + len(item[0]) <= FORWARD_COALESCE_MAX):
+                    group.append(item)
+                    size += len(item[0])
+                else:
+                    rest.append(item)
+            self._pending = rest
+            error: BaseException | None = None
+            try:
+                accepted = await self._send([record for item in group for record in item[0]], ack)
+            except AdmissionRejected as exc:
+                accepted, error = exc.accepted, exc
+            except BaseException as exc:
+                accepted, error = 0, exc
+            for records, _, future in group:
+                share = min(accepted, len(records))
+                accepted -= share
+                if future.done():
+                    continue
+                if share == len(records) or error is None:
+                    future.set_result(share)
+                elif isinstance(error, AdmissionRejected):
+                    future.set_exception(AdmissionRejected(error.reason, error.retry_after, share))
+                else:
+                    future.set_exception(error)
+            if isinstance(error, asyncio.CancelledError):
+                raise error
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for _, _, future in self._pending:
+            if not future.done():
+                future.set_exception(PeerUnavailable("cluster node shutting down"))
+        self._pending = []
+
+
+def _normalize(url: str) -> str:
+    return url.strip().rstrip("/")
+
+
+def _publish_body(records: Sequence[EventRecord]) -> bytes:
+    return "".join(_event_json(*record) + "\n" for record in records).encode("utf-8")
+
+
+def _parse_rows(body: bytes) -> list[LazyEventRecord]:
+    """Rows from a peer's ``/events?format=ndjson`` answer."""
+    rows: list[LazyEventRecord] = []
+    for line in body.splitlines():
+        if not line:
+            continue
+        data = json.loads(line)
+        rows.append(
+            (
+                data["topic"],
+                data["event_id"],
+                to_epoch_micros(datetime.fromisoformat(data["timestamp"])),
+                data["source"],
+                DecodedPayload(encode_payload(data["payload"])),
+            )
+        )
+    return rows
+
+
+class ClusterAggregator(EventQueries):
+    """Routes ingest to key owners and merges reads across all cluster nodes.
+
+    Wraps this node's :class:`AggregatorService` (``local``), which keeps
+    serving forwarded requests, live subscriptions and ``/metrics`` on its own.
+    """
+
+    def __init__(
+        self,
+        local: AggregatorService,
+        nodes: Iterable[str],
+        self_url: str,
+        *,
+        vnodes: int = 64,
+        ring_path: Path | None = None,
+        connections: int = 16,
+        timeout: float = 10.0,
+        versions_ttl: float = 0.25,
+    ) -> None:
+        self.local = local
+        self.metrics = local.metrics
+        self.hub = local.hub
+        self.self_url = _normalize(self_url)
+        self.ring_epoch = 0
+        self._ring_path = ring_path
+        self._handoff_pending = False
+        # The ring before the last change, and its nodes that may still hold
+        # keys owned elsewhere now (they have not announced a finished handoff).
+        self._previous_ring: HashRing | None = None
+        self._draining: set[str] = set()
+        nodes = [_normalize(node) for node in nodes]
+        if ring_path is not None and ring_path.exists():
+            # The ring last rolled out wins over the startup configuration.
+            saved = json.loads(ring_path.read_text())
+            nodes = saved["nodes"]
+            self.ring_epoch = saved["epoch"]
+            self._handoff_pending = saved.get("handoff_pending", False)
+            self._draining = set(saved.get("draining", ()))
+            if self._draining and saved.get("previous_nodes"):
+                self._previous_ring = HashRing(saved["previous_nodes"], vnodes)
+        elif self.self_url not in nodes:
+            raise ValueError(f"CLUSTER_SELF {self.self_url!r} is not listed in CLUSTER_PEERS")
+        self.ring = HashRing(nodes, vnodes)
+        # What requests forwarded by peers submit to: this node's share of a batch.
+        self.owner_scope = _OwnerScope(self)
+        # Transports per peer URL; tests point these at in-process apps.
+        self.peer_transports: dict[str, httpx.AsyncBaseTransport] = {}
+        self._limits = httpx.Limits(
+            max_connections=max(1, connections), max_keepalive_connections=max(1, connections)
+        )
+        self._timeout = timeout
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._channels: dict[str, _PeerChannel] = {}
+        # Peers' /cluster/versions answers per (topic, generation), reused for
+        # versions_ttl seconds; the generation moves on every write through
+        # this node, so its own clients never get a 304 for their change.
+        self._versions_ttl = max(0.0, versions_ttl)
+        self._versions_generation = 0
+        self._versions_cache: dict[tuple[str, int], tuple[float, list[dict[str, str]]]] = {}
+        self._versions_fetches: dict[tuple[str, int], asyncio.Task[list[dict[str, str]]]] = {}
+        self._retry_after = 1
+        self._forwarded_events = 0
+        self._forward_batches = 0
+        self._forward_failures = 0
+        self._lookup_failures = 0
+        self._handed_off = 0
+        self._handoff_task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        await self.local.start()
+        if self._handoff_pending:
+            self.rebalance()
+
+    async def stop(self) -> None:
+        if self._handoff_task is not None:
+            self._handoff_task.cancel()
+            await asyncio.gather(self._handoff_task, return_exceptions=True)
+            self._handoff_task = None
+        channels, self._channels = self._channels, {}
+        for channel in channels.values():
+            await channel.close()
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+        await self.local.stop()
+
+    def _peers(self) -> list[str]:
+        return [node for node in self.ring.nodes if node != self.self_url]
+
+    def _client(self, node: str) -> httpx.AsyncClient:
+        client = self._clients.get(node)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=node,
+                transport=self.peer_transports.get(node),
+                limits=self._limits,
+                timeout=self._timeout,
+                headers={FORWARDED_HEADER: self.self_url},
+            )
+            self._clients[node] = client
+        return client
+
+    async def _request(self, node: str, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        try:
+            response = await self._client(node).request(method, path, **kwargs)
+        except httpx.HTTPError as exc:
+            raise PeerUnavailable(f"{node} unreachable: {exc!r}") from exc
+        if response.status_code >= 500:
+            raise PeerUnavailable(f"{node}{path} answered {response.status_code}")
+        return response
+
+    async def _get_json(self, node: str, path: str, **kwargs: Any) -> Any:
+        """``GET`` a peer endpoint that must answer 200 with JSON."""
+        response = await self._request(node, "GET", path, **kwargs)
+        if response.status_code != 200:
+            raise PeerUnavailable(f"{node}{path} answered {response.status_code}")
+        return response.json()
+
+    # -- ingest ---------------------------------------------------------------
+
+    async def submit_batch(self, events: Iterable[Event], ack: str = "accepted") -> int:
+        return await self.submit_records([event_record(event) for event in events], ack)
+
+    async def submit_records(self, records: Sequence[EventRecord], ack: str = "accepted") -> int:
+        """Store each record on its owner; return how many were accepted.
+
+        Owners answer independently, so a batch can be partially accepted
+        when one of them rejects or is down. Only if nothing was accepted is
+        the rejection (or the peer failure) raised.
+        """
+        if not records:
+            return 0
+        self._versions_changed()
+        calls = []
+        for node, indices in self.ring.split(records).items():
+            group = [records[idx] for idx in indices]
+            if node == self.self_url:
+                calls.append(self.submit_owned(group, ack))
+            else:
+                calls.append(self._channel(node).forward(group, ack))
+        outcomes = await asyncio.gather(*calls, return_exceptions=True)
+        accepted = 0
+        failure: BaseException | None = None
+        for outcome in outcomes:
+            if isinstance(outcome, AdmissionRejected):
+                self._retry_after = max(self._retry_after, outcome.retry_after)
+                accepted += outcome.accepted
+                failure = failure or outcome
+            elif isinstance(outcome, PeerUnavailable):
+                logger.warning("Forwarding failed: %s", outcome)
+                self._forward_failures += 1
+                failure = failure or outcome
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                accepted += outcome
+        if failure is not None and not accepted:
+            raise failure
+        return accepted
+
+    async def submit_owned(self, records: Sequence[EventRecord], ack: str = "accepted") -> int:
+        """Queue records this node owns, after the handoff read-through."""
+        await self._read_through(records)
+        return await self.local.submit_records(records, ack)
+
+    async def submit_owned_sync(self, records: Sequence[EventRecord]) -> list[bool]:
+        await self._read_through(records)
+        return await self.local.submit_records_sync(records)
+
+    async def _read_through(self, records: Sequence[EventRecord]) -> None:
+        """Import keys of ``records`` that their previous owner has not handed off yet.
+
+        Only keys that moved to this node and whose previous owner is still
+        draining are looked up. A previous owner that cannot be reached is
+        skipped with a warning, so ingest does not stall on a dead node; its
+        keys may then be stored as new once more.
+        """
+        previous = self._previous_ring
+        if previous is None:
+            return
+        groups: dict[str, set[tuple[str, str]]] = {}
+        for record in records:
+            owner = previous.owner(record[0], record[1])
+            if owner != self.self_url and owner in self._draining:
+                groups.setdefault(owner, set()).add((record[0], record[1]))
+        if groups:
+            await asyncio.gather(*(self._lookup(node, keys) for node, keys in groups.items()))
+
+    async def _lookup(self, node: str, keys: set[tuple[str, str]]) -> None:
+        try:
+            response = await self._request(
+                node,
+                "POST",
+                "/cluster/lookup",
+                params={"epoch": self.ring_epoch},
+                json=sorted(keys),
+            )
+            if response.status_code != 200:
+                raise PeerUnavailable(f"{node}/cluster/lookup answered {response.status_code}")
+            rows = [parse_export_line(line) for line in response.content.splitlines() if line]
+        except (PeerUnavailable, ValueError) as exc:
+            logger.warning("Handoff read-through skipped: %s", exc)
+            self._lookup_failures += 1
+            return
+        if rows:
+            await self.local.import_rows(rows)
+        if response.headers.get(HANDOFF_HEADER) == "done":
+            self.peer_handed_off(node, self.ring_epoch)
+
+    def _channel(self, node: str) -> _PeerChannel:
+        channel = self._channels.get(node)
+        if channel is None:
+            channel = self._channels[node] = _PeerChannel(
+                lambda records, ack: self._forward(node, records, ack)
+            )
+        return channel
+
+    async def _forward(self, node: str, records: Sequence[EventRecord], ack: str) -> int:
+        response = await self._request(
+            node,
+            "POST",
+            "/publish/ndjson",
+            params={"ack": ack},
+            content=_publish_body(records),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        self._forward_batches += 1
+        if response.status_code == 429:
+            data = response.json()
+            raise AdmissionRejected(
+                data.get("reason", "capacity"),
+                int(response.headers.get("Retry-After", 1)),
+                data.get("accepted", 0),
+            )
+        if response.status_code != 200:
+            raise PeerUnavailable(f"{node} refused a forwarded batch: {response.text}")
+        data = response.json()
+        self._forwarded_events += data["accepted"]
+        return data["accepted"]
+
+    async def submit_sync(self, events: Iterable[Event]) -> list[bool]:
+        """Per-event verdicts from every owner, in request order.
+
+        Owners commit independently: if one fails the whole call fails, and a
+        retry reports the parts that did commit as duplicates.
+        """
+        records = [event_record(event) for event in events]
+        if not records:
+            return []
+        self._versions_changed()
+        parts = list(self.ring.split(records).items())
+        calls = []
+        for node, indices in parts:
+            group = [records[idx] for idx in indices]
+            if node == self.self_url:
+                calls.append(self.submit_owned_sync(group))
+            else:
+                calls.append(self._forward_sync(node, group))
+        results: list[bool] = [False] * len(records)
+        for (_, indices), verdicts in zip(parts, await asyncio.gather(*calls)):
+            for idx, is_new in zip(indices, verdicts):
+                results[idx] = is_new
+        return results
+
+    async def _forward_sync(self, node: str, records: Sequence[EventRecord]) -> list[bool]:
+        body = "[" + ",".join(_event_json(*record) for record in records) + "]"
+        response = await self._request(
+            node,
+            "POST",
+            "/publish",
+            params={"sync": "true"},
+            content=body.encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        if response.status_code == 429:
+            data = response.json()
+            raise AdmissionRejected(
+                data.get("reason", "latency"), int(response.headers.get("Retry-After", 1)), 0
+            )
+        if response.status_code != 200:
+            raise PeerUnavailable(f"{node} refused a forwarded batch: {response.text}")
+        data = response.json()
+        self._forward_batches += 1
+        self._forwarded_events += len(records)
+        return [verdict == "new" for verdict in data["results"]]
+
+    def retry_after(self) -> int:
+        return max(self._retry_after, self.local.retry_after())
+
+    # -- reads ----------------------------------------------------------------
+
+    async def load_events(
+        self,
+        topic: Optional[str] = None,
+        after: Optional[EventKey] = None,
+        limit: Optional[int] = None,
+        *,
+        source: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[LazyEventRecord]:
+        """Every node's rows after ``after``, merged into ``(ts_us, topic, event_id)`` order."""
+        params: dict[str, Any] = {"format": "ndjson"}
+        for name, value in (("topic", topic), ("limit", limit), ("source", source)):
+            if value is not None:
+                params[name] = value
+        if after is not None:
+            params["cursor"] = encode_cursor(after)
+        if since is not None:
+            params["since"] = since.isoformat()
+        if until is not None:
+            params["until"] = until.isoformat()
+        parts = await asyncio.gather(
+            self.local.load_events(
+                topic, after, limit, source=source, since=since, until=until
+            ),
+            *(self._load_remote(node, params) for node in self._peers()),
+        )
+        rows: List[LazyEventRecord] = []
+        last: EventKey | None = None
+        for row in heapq.merge(*parts, key=_row_key):
+            key = _row_key(row)
+            # Mid-handoff a row can briefly exist on its old and new owner.
+            if key == last:
+                continue
+            last = key
+            rows.append(row)
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    async def _load_remote(self, node: str, params: dict[str, Any]) -> list[LazyEventRecord]:
+        response = await self._request(node, "GET", "/events", params=params)
+        if response.status_code != 200:
+            raise PeerUnavailable(f"{node}/events answered {response.status_code}")
+        return _parse_rows(response.content)
+
+    async def _versions(self, topic: Optional[str] = None) -> list[dict[str, str]]:
+        # Each node's versions start with its own boot nonce, so a restart of
+        # any node changes the merged version as well.
+        local = {
+            "events": await self.local.events_version(topic),
+            "stats": await self.local.stats_version(),
+        }
+        return [local, *await self._peer_versions(topic)]
+
+    async def _peer_versions(self, topic: Optional[str]) -> list[dict[str, str]]:
+        """Peers' versions; concurrent callers share one fan-out, reused for a short TTL.
+
+        A change that reached the cluster through another node can therefore
+        take up to ``versions_ttl`` to show in this node's ETags.
+        """
+        key = (topic or "", self._versions_generation)
+        cached = self._versions_cache.get(key)
+        if cached is not None and cached[0] > asyncio.get_running_loop().time():
+            return cached[1]
+        fetch = self._versions_fetches.get(key)
+        if fetch is None:
+            fetch = asyncio.create_task(self._fetch_peer_versions(topic, key))
+            self._versions_fetches[key] = fetch
+            fetch.add_done_callback(lambda _: self._versions_fetches.pop(key, None))
+        return await asyncio.shield(fetch)
+
+    async def _fetch_peer_versions(
+        self, topic: Optional[str], key: tuple[str, int]
+    ) -> list[dict[str, str]]:
+        params = {"topic": topic} if topic else {}
+        versions = list(
+            await asyncio.gather(
+                *(
+                    self._get_json(node, "/cluster/versions", params=params)
+                    for node in self._peers()
+                )
+            )
+        )
+        if key[1] == self._versions_generation:
+            if len(self._versions_cache) >= 1024:
+                self._versions_cache.clear()
+            expires = asyncio.get_running_loop().time() + self._versions_ttl
+            self._versions_cache[key] = (expires, versions)
+        return versions
+
+    def _versions_changed(self) -> None:
+        self._versions_generation += 1
+        self._versions_cache.clear()
+
+    async def events_version(self, topic: Optional[str] = None) -> str:
+        versions = await self._versions(topic)
+        return f"{self.ring_epoch}:" + "|".join(version["events"] for version in versions)
+
+    async def stats_version(self) -> str:
+        versions = await self._versions()
+        return f"{self.ring_epoch}:" + "|".join(version["stats"] for version in versions)
+
+    async def get_stats(self) -> Stats:
+        """Cluster-wide counters and topics; queue and cache details stay per node."""
+        local, *peers = await asyncio.gather(
+            self.local.get_stats(),
+            *(self._get_json(node, "/stats") for node in self._peers()),
+        )
+        topics = set(local.topics)
+        for peer in peers:
+            topics.update(peer["topics"])
+        return local.model_copy(
+            update={
+                "received": local.received + sum(peer["received"] for peer in peers),
+                "unique_processed": local.unique_processed
+                + sum(peer["unique_processed"] for peer in peers),
+                "duplicate_dropped": local.duplicate_dropped
+                + sum(peer["duplicate_dropped"] for peer in peers),
+                "topics": sorted(topics),
+                "cluster": self.cluster_stats(),
+            }
+        )
+
+    async def get_rollups(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        series: bool = True,
+    ) -> Rollups:
+        """Every node's rollups, summed per topic, source and bucket."""
+        params: dict[str, Any] = {"series": "true"}
+        if topic is not None:
+            params["topic"] = topic
+        if since is not None:
+            params["since"] = since.isoformat()
+        if until is not None:
+            params["until"] = until.isoformat()
+        # Buckets are always fetched: topic totals are summed from distinct buckets.
+        local, *remote = await asyncio.gather(
+            self.local.get_rollups(topic, since, until, True),
+            *(self._get_json(node, "/stats/rollups", params=params) for node in self._peers()),
+        )
+        parts = [local, *(Rollups(**data) for data in remote)]
+        buckets = [
+            (
+                bucket.topic,
+                to_epoch_micros(bucket.bucket),
+                bucket.width_seconds * 1_000_000,
+                bucket.events,
+                bucket.duplicates,
+            )
+            for part in parts
+            for bucket in part.series
+        ]
+        sources = [
+            (source.topic, source.source, source.events, source.duplicates)
+            for part in parts
+            for source in part.sources
+        ]
+        return rollups_from_rows(buckets, sources, series)
+
+    def cluster_stats(self) -> dict[str, float]:
+        return {
+            "nodes": float(len(self.ring.nodes)),
+            "ring_epoch": float(self.ring_epoch),
+            "forwarded_events": float(self._forwarded_events),
+            "forward_batches": float(self._forward_batches),
+            "forward_failures": float(self._forward_failures),
+            "lookup_failures": float(self._lookup_failures),
+            "draining_nodes": float(len(self._draining)),
+            "handed_off": float(self._handed_off),
+            "handoff_running": float(self.handoff_running),
+        }
+
+    async def render_metrics(self) -> str:
+        """This node's instruments; scrape every node."""
+        return await self.local.render_metrics()
+
+    def subscribe(self, topic: Optional[str] = None, cursor: Optional[str] = None, **options: Any):
+        """Live events committed on this node; subscribe to every node for the whole stream."""
+        return self.local.subscribe(topic, cursor, **options)
+
+    # -- membership -----------------------------------------------------------
+
+    def ring_info(self) -> dict[str, Any]:
+        return {
+            "self": self.self_url,
+            "nodes": list(self.ring.nodes),
+            "epoch": self.ring_epoch,
+            "vnodes": self.ring.vnodes,
+            "handoff_running": self.handoff_running,
+            "handed_off": self._handed_off,
+            "draining": sorted(self._draining),
+        }
+
+    @property
+    def handoff_running(self) -> bool:
+        return self._handoff_task is not None and not self._handoff_task.done()
+
+    def set_ring(
+        self, nodes: Iterable[str], epoch: int, previous: Iterable[str] | None = None
+    ) -> bool:
+        """Route by a new membership from now on; return False if it was already set.
+
+        Keys this node no longer owns stay here until :meth:`rebalance`. The
+        node itself may be missing from ``nodes``: it then owns nothing and a
+        rebalance drains it. ``previous`` is the membership being replaced and
+        defaults to this node's current ring; a node that is joining should be
+        told, since its own startup ring already lists itself.
+        """
+        ring = HashRing((_normalize(node) for node in nodes), self.ring.vnodes)
+        if epoch < self.ring_epoch or (epoch == self.ring_epoch and ring.nodes != self.ring.nodes):
+            raise ValueError(f"ring epoch {epoch} is stale (current {self.ring_epoch})")
+        if epoch == self.ring_epoch:
+            return False
+        old = self.ring
+        if previous is not None:
+            old = HashRing((_normalize(node) for node in previous), self.ring.vnodes)
+        self.ring, self.ring_epoch = ring, epoch
+        self._versions_changed()
+        self._previous_ring = old
+        self._draining = set(old.nodes) - {self.self_url}
+        self._handoff_pending = True
+        self._save_ring()
+        logger.info("Cluster ring epoch %d: %s", epoch, ", ".join(ring.nodes))
+        return True
+
+    def handoff_finished(self, epoch: int) -> bool:
+        """Whether this node holds no keys it does not own under ring ``epoch``."""
+        return self.ring_epoch >= epoch and not self._handoff_pending
+
+    def peer_handed_off(self, node: str, epoch: int) -> None:
+        """``node`` finished handing off for ``epoch``: stop asking it about moved keys."""
+        node = _normalize(node)
+        if epoch < self.ring_epoch or node not in self._draining:
+            return
+        self._draining.discard(node)
+        if not self._draining:
+            self._previous_ring = None
+        self._save_ring()
+
+    def rebalance(self) -> None:
+        """(Re)start handing off keys owned elsewhere under the current ring."""
+        if self._handoff_task is not None:
+            self._handoff_task.cancel()
+        self._handoff_task = asyncio.create_task(self._run_handoff(), name="cluster-handoff")
+
+    def _save_ring(self) -> None:
+        if self._ring_path is None:
+            return
+        state = {
+            "nodes": list(self.ring.nodes),
+            "epoch": self.ring_epoch,
+            "handoff_pending": self._handoff_pending,
+            "previous_nodes": list(self._previous_ring.nodes) if self._previous_ring else [],
+            "draining": sorted(self._draining),
+        }
+        partial = self._ring_path.with_name(self._ring_path.name + ".partial")
+        partial.write_text(json.dumps(state))
+        os.replace(partial, self._ring_path)
+
+    async def _run_handoff(self) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                moved = await self._handoff_pass()
+            except PeerUnavailable as exc:
+                logger.warning(
+                    "Key handoff paused (%s); retrying in %.0fs", exc, HANDOFF_RETRY_SECONDS
+                )
+                await asyncio.sleep(HANDOFF_RETRY_SECONDS)
+                continue
+            break
+        self._handoff_pending = False
+        self._save_ring()
+        logger.info("Handed off %d keys in %.1fs", moved, time.perf_counter() - started)
+        await self._announce_handoff()
+
+    async def _announce_handoff(self) -> None:
+        """Tell every node that this one no longer holds keys owned elsewhere."""
+        nodes = set(self.ring.nodes)
+        if self._previous_ring is not None:
+            nodes.update(self._previous_ring.nodes)
+        nodes.discard(self.self_url)
+        body = {"node": self.self_url, "epoch": self.ring_epoch}
+        for node in sorted(nodes):
+            try:
+                await self._request(node, "POST", "/cluster/handoff-done", json=body)
+            except PeerUnavailable as exc:
+                # The node learns it from its next /cluster/lookup instead.
+                logger.warning("Could not announce the finished handoff: %s", exc)
+
+    async def _handoff_pass(self) -> int:
+        """Send every stored row owned elsewhere to its owner, then delete it here."""
+        ring = self.ring
+        moved = 0
+        async for rows in self.local.export_chunks(chunk_size=HANDOFF_CHUNK):
+            groups: dict[str, list[ExportRow]] = {}
+            for row in rows:
+                owner = ring.owner(row[0], row[1])
+                if owner != self.self_url:
+                    groups.setdefault(owner, []).append(row)
+            for owner, group in groups.items():
+                response = await self._request(
+                    owner,
+                    "POST",
+                    "/cluster/import",
+                    content=b"".join(export_line(row) for row in group),
+                    headers={"Content-Type": "application/x-ndjson"},
+                )
+                if response.status_code != 200:
+                    raise PeerUnavailable(f"{owner} refused handed-off rows: {response.text}")
+                released = await self.local.release_keys([(row[0], row[1]) for row in group])
+                self._handed_off += released
+                moved += released
+        return moved
+
+
+class _OwnerScope:
+    """Ingest for requests forwarded by peers: stored here, after the read-through."""
+
+    def __init__(self, cluster: ClusterAggregator) -> None:
+        self._cluster = cluster
+
+    async def submit_batch(self, events: Iterable[Event], ack: str = "accepted") -> int:
+        return await self._cluster.submit_owned([event_record(event) for event in events], ack)
+
+    async def submit_sync(self, events: Iterable[Event]) -> list[bool]:
+        return await self._cluster.submit_owned_sync([event_record(event) for event in events])
+
+    def retry_after(self) -> int:
+        return self._cluster.local.retry_after()
+
+
+def create_cluster(local: AggregatorService, settings: Settings) -> ClusterAggregator:
+    """Wrap this node's service for ``CLUSTER_PEERS`` / ``CLUSTER_SELF``."""
+    if not settings.cluster_self:
+        raise ValueError("CLUSTER_SELF must be set to this node's base URL in cluster mode")
+    return ClusterAggregator(
+        local,
+        [peer for peer in settings.cluster_peers.split(",") if peer.strip()],
+        settings.cluster_self,
+        vnodes=settings.cluster_vnodes,
+        ring_path=settings.resolved_ring_path(),
+        connections=settings.cluster_connections,
+        timeout=settings.cluster_timeout_seconds,
+        versions_ttl=settings.cluster_versions_ttl_ms / 1000,
+    )
+
+
+def _change_membership(via: str, node: str, add: bool, wait: bool, timeout: float) -> None:
+    node = _normalize(node)
+    with httpx.Client(timeout=timeout) as client:
+        current = client.get(f"{_normalize(via)}/cluster/ring").raise_for_status().json()
+        nodes = set(current["nodes"])
+        if add:
+            nodes.add(node)
+        else:
+            nodes.discard(node)
+        everyone = sorted(set(current["nodes"]) | {node})
+        rings = {
+            peer: client.get(f"{peer}/cluster/ring").raise_for_status().json() for peer in everyone
+        }
+        epoch = max(ring["epoch"] for ring in rings.values()) + 1
+        # Switch routing everywhere first, so no node still forwards by the
+        # old ring while the others hand keys off.
+        update = {"nodes": sorted(nodes), "epoch": epoch, "previous": current["nodes"]}
+        for peer in everyone:
+            client.put(f"{peer}/cluster/ring", json=update).raise_for_status()
+        for peer in everyone:
+            client.post(f"{peer}/cluster/rebalance").raise_for_status()
+        print(f"Ring epoch {epoch}: {', '.join(sorted(nodes))}")
+        while wait:
+            states = [
+                client.get(f"{peer}/cluster/ring").raise_for_status().json() for peer in everyone
+            ]
+            if not any(state["handoff_running"] for state in states):
+                moved = sum(state["handed_off"] for state in states)
+                print(f"Handoff finished ({moved} keys moved since the nodes started)")
+                break
+            time.sleep(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cluster ring membership")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("add-node", "Add a node (already running with CLUSTER_SELF set) to the ring"),
+        ("remove-node", "Drain a node's keys to the others and drop it from the ring"),
+    ):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("node", help="Base URL of the node, e.g. http://10.0.0.4:8080")
+        cmd.add_argument("--via", required=True, help="Base URL of any current member")
+        cmd.add_argument("--wait", action="store_true", help="Wait until the handoff finished")
+        cmd.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    _change_membership(args.via, args.node, args.command == "add-node", args.wait, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
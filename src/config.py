@@ -17,6 +17,25 @@ def _read_int(name: str, default: int) -> int:
         return default
 
 
+def _read_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag (1/true/yes/on) from the environment."""
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _read_float(name: str, default: float) -> float:
+    """Read a float from the environment, falling back to the default."""
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
 @dataclass(slots=True)
 class Settings:
     """Container for runtime settings with sensible defaults."""
@@ -24,7 +43,81 @@ class Settings:
     database_path: Path = Path(os.environ.get("DEDUP_DB_PATH", "data/dedup.sqlite"))
     worker_count: int = _read_int("WORKER_COUNT", 2)
     queue_maxsize: int = _read_int("QUEUE_MAXSIZE", 0)
+    partition_key: str = os.environ.get("PARTITION_KEY", "topic")
+    partition_fair: bool = _read_bool("PARTITION_FAIR", False)
+    partition_quantum: int = _read_int("PARTITION_QUANTUM", 32)
+    admission_policy: str = os.environ.get("ADMISSION_POLICY", "block")
+    admission_high_water: int = _read_int("ADMISSION_HIGH_WATER", 0)
+    admission_latency_target_ms: int = _read_int("ADMISSION_LATENCY_TARGET_MS", 0)
+    admission_block_timeout_ms: int = _read_int("ADMISSION_BLOCK_TIMEOUT_MS", 5000)
+    batch_max_size: int = _read_int("BATCH_MAX_SIZE", 256)
+    batch_linger_ms: int = _read_int("BATCH_LINGER_MS", 5)
+    shard_count: int = _read_int("DEDUP_SHARDS", 1)
+    sqlite_readers: int = _read_int("SQLITE_READERS", 4)
+    sqlite_synchronous: str = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    sqlite_cache_size: int = _read_int("SQLITE_CACHE_SIZE", -16000)
+    sqlite_mmap_size: int = _read_int("SQLITE_MMAP_SIZE", 0)
+    store_coalesce_max: int = _read_int("STORE_COALESCE_MAX", 2048)
+    payload_compression: str = os.environ.get("PAYLOAD_COMPRESSION", "zlib")
+    payload_zdict_size: int = _read_int("PAYLOAD_ZDICT_SIZE", 8192)
+    prefilter_bloom_bytes: int = _read_int("PREFILTER_BLOOM_BYTES", 4 * 1024 * 1024)
+    prefilter_fp_rate: float = _read_float("PREFILTER_FP_RATE", 0.01)
+    prefilter_lru_size: int = _read_int("PREFILTER_LRU_SIZE", 50000)
+    metrics_enabled: bool = _read_bool("METRICS_ENABLED", True)
+    loop_lag_interval_ms: int = _read_int("LOOP_LAG_INTERVAL_MS", 500)
+    response_cache_size: int = _read_int("RESPONSE_CACHE_SIZE", 256)
+    response_cache_max_bytes: int = _read_int("RESPONSE_CACHE_MAX_BYTES", 1024 * 1024)
+    subscriber_buffer: int = _read_int("SUBSCRIBER_BUFFER", 1024)
+    slow_consumer_policy: str = os.environ.get("SLOW_CONSUMER_POLICY", "drop")
+    subscribe_backfill_max: int = _read_int("SUBSCRIBE_BACKFILL_MAX", 10000)
+    subscribe_heartbeat_seconds: float = _read_float("SUBSCRIBE_HEARTBEAT_SECONDS", 15.0)
+    dedup_retention_days: float = _read_float("DEDUP_RETENTION_DAYS", 0.0)
+    event_retention_days: float = _read_float("EVENT_RETENTION_DAYS", 0.0)
+    retention_interval_seconds: float = _read_float("RETENTION_INTERVAL_SECONDS", 300.0)
+    retention_chunk_size: int = _read_int("RETENTION_CHUNK_SIZE", 1000)
+    retention_vacuum_pages: int = _read_int("RETENTION_VACUUM_PAGES", 2000)
+    rollups: bool = _read_bool("ROLLUPS", True)
+    rollup_minute_hours: float = _read_float("ROLLUP_MINUTE_HOURS", 48.0)
+    rollup_hour_days: float = _read_float("ROLLUP_HOUR_DAYS", 30.0)
+    ingest_log: bool = _read_bool("INGEST_LOG", True)
+    ingest_log_dir: str = os.environ.get("INGEST_LOG_DIR", "")
+    ingest_log_segment_bytes: int = _read_int("INGEST_LOG_SEGMENT_BYTES", 16 * 1024 * 1024)
+    ingest_log_group_commit_ms: float = _read_float("INGEST_LOG_GROUP_COMMIT_MS", 0.0)
+    ingest_log_checkpoint_ms: float = _read_float("INGEST_LOG_CHECKPOINT_MS", 1000.0)
+    ingest_log_fsync: bool = _read_bool("INGEST_LOG_FSYNC", True)
+    publish_ack: str = os.environ.get("PUBLISH_ACK", "accepted")
+    admin_endpoints: bool = _read_bool("ADMIN_ENDPOINTS", False)
+    snapshot_dir: str = os.environ.get("SNAPSHOT_DIR", "")
+    debug_endpoints: bool = _read_bool("DEBUG_ENDPOINTS", False)
+    trace_sample_rate: float = _read_float("TRACE_SAMPLE_RATE", 0.0)
+    trace_keep: int = _read_int("TRACE_KEEP", 50)
+    http_host: str = os.environ.get("HOST", "0.0.0.0")
+    http_port: int = _read_int("PORT", 8080)
+    frontend_processes: int = _read_int("FRONTEND_PROCESSES", 1)
+    writer_socket: str = os.environ.get("WRITER_SOCKET", "")
+    cluster_peers: str = os.environ.get("CLUSTER_PEERS", "")
+    cluster_self: str = os.environ.get("CLUSTER_SELF", "")
+    cluster_vnodes: int = _read_int("CLUSTER_VNODES", 64)
+    cluster_connections: int = _read_int("CLUSTER_CONNECTIONS", 16)
+    cluster_timeout_seconds: float = _read_float("CLUSTER_TIMEOUT_SECONDS", 10.0)
+    cluster_versions_ttl_ms: float = _read_float("CLUSTER_VERSIONS_TTL_MS", 250.0)
 
     def resolved_database_path(self) -> Path:
         """Return an absolute path to the SQLite database file."""
         return self.database_path.expanduser().resolve()
+
+    def resolved_ingest_log_dir(self) -> Path:
+        """Ingest log directory; defaults to ``<database>.ingest`` next to the database."""
+        if self.ingest_log_dir:
+            return Path(self.ingest_log_dir).expanduser().resolve()
+        return self.resolved_database_path().with_suffix(".ingest")
+
+    def resolved_snapshot_dir(self) -> Path:
+        """Where ``POST /admin/snapshot`` writes; defaults to ``<database>.snapshots``."""
+        if self.snapshot_dir:
+            return Path(self.snapshot_dir).expanduser().resolve()
+        return self.resolved_database_path().with_suffix(".snapshots")
+
+    def resolved_ring_path(self) -> Path:
+        """Cluster ring membership as last set; ``<database>.ring.json``."""
+        return self.resolved_database_path().with_suffix(".ring.json")
@@ -1,100 +1,1288 @@
 """Persistent deduplication store built on SQLite."""
 from __future__ import annotations
 
+import logging
+import os
+import queue
 import sqlite3
 import threading
 from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from .models import to_epoch_micros
+from .payload_codec import DecodedPayload, LazyPayload, PayloadCodec, train_dictionary
+
+
+logger = logging.getLogger(__name__)
+
+
+def _iso_to_micros(value: str) -> int:
+    return to_epoch_micros(datetime.fromisoformat(value))
 
 
 _SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY,
+    topic TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE
+);
+
 CREATE TABLE IF NOT EXISTS dedup (
-    topic TEXT NOT NULL,
+    topic_id INTEGER NOT NULL,
     event_id TEXT NOT NULL,
     processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    PRIMARY KEY (topic, event_id)
+    PRIMARY KEY (topic_id, event_id)
 );
 
+CREATE INDEX IF NOT EXISTS dedup_processed_at ON dedup (processed_at);
+
 CREATE TABLE IF NOT EXISTS processed_events (
+    topic_id INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    ts_us INTEGER NOT NULL,
+    source_id INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (topic_id, event_id)
+);
+
+CREATE INDEX IF NOT EXISTS processed_events_ts ON processed_events (ts_us);
+CREATE INDEX IF NOT EXISTS processed_events_topic_ts ON processed_events (topic_id, ts_us, event_id);
+CREATE INDEX IF NOT EXISTS processed_events_source_ts ON processed_events (source_id, ts_us);
+
+CREATE TABLE IF NOT EXISTS payload_dicts (
+    id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO counters (name, value) VALUES
+    ('unique_processed', 0), ('dedup_pruned', 0), ('events_pruned', 0);
+"""
+
+# Rollups: committed events and duplicate deliveries counted per (topic,
+# minute) and per (topic, source, hour) of the event timestamp, updated in
+# the ingest transaction. Old buckets are merged into coarser ones in place:
+# a coarse bucket is the row at the aligned start, see downsample_rollups.
+_ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup_topics (
+    topic_id INTEGER NOT NULL,
+    bucket_us INTEGER NOT NULL,
+    events INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic_id, bucket_us)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_sources (
+    topic_id INTEGER NOT NULL,
+    source_id INTEGER NOT NULL,
+    bucket_us INTEGER NOT NULL,
+    events INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (topic_id, source_id, bucket_us)
+) WITHOUT ROWID;
+"""
+
+# v1: persist counters and the topic set instead of deriving them at startup.
+_MIGRATE_COUNTERS = """
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS topics (
+    topic TEXT PRIMARY KEY
+);
+INSERT OR REPLACE INTO counters (name, value)
+    VALUES ('unique_processed', (SELECT COUNT(*) FROM dedup));
+INSERT OR IGNORE INTO topics (topic) SELECT DISTINCT topic FROM dedup;
+"""
+
+# v2: store event timestamps as epoch microseconds and index range scans.
+_MIGRATE_EPOCH_TIMESTAMPS = """
+CREATE TABLE processed_events_v2 (
     topic TEXT NOT NULL,
     event_id TEXT NOT NULL,
-    timestamp TEXT NOT NULL,
+    ts_us INTEGER NOT NULL,
     source TEXT NOT NULL,
     payload TEXT NOT NULL,
     PRIMARY KEY (topic, event_id)
 );
+INSERT INTO processed_events_v2 (topic, event_id, ts_us, source, payload)
+    SELECT topic, event_id, iso_to_micros(timestamp), source, payload FROM processed_events;
+DROP TABLE processed_events;
+ALTER TABLE processed_events_v2 RENAME TO processed_events;
+CREATE INDEX processed_events_ts ON processed_events (ts_us, topic, event_id);
+CREATE INDEX processed_events_topic_ts ON processed_events (topic, ts_us, event_id);
+CREATE INDEX processed_events_source_ts ON processed_events (source, ts_us, topic, event_id);
+"""
+
+# v3: index dedup keys by age for retention pruning and count pruned rows.
+_MIGRATE_RETENTION = """
+CREATE INDEX IF NOT EXISTS dedup_processed_at ON dedup (processed_at);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('dedup_pruned', 0), ('events_pruned', 0);
+"""
+
+# v4: intern topic/source strings into integer-keyed tables and store payloads
+# as header-tagged (optionally zlib-compressed) BLOBs; see payload_codec.
+_MIGRATE_COMPACT_STORAGE = """
+CREATE TABLE topics_v4 (
+    id INTEGER PRIMARY KEY,
+    topic TEXT NOT NULL UNIQUE
+);
+INSERT INTO topics_v4 (topic)
+    SELECT topic FROM topics UNION SELECT topic FROM dedup UNION SELECT topic FROM processed_events;
+CREATE TABLE sources (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE
+);
+INSERT INTO sources (source) SELECT DISTINCT source FROM processed_events;
+CREATE TABLE dedup_v4 (
+    topic_id INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (topic_id, event_id)
+);
+INSERT INTO dedup_v4 (rowid, topic_id, event_id, processed_at)
+    SELECT d.rowid, t.id, d.event_id, d.processed_at
+    FROM dedup AS d JOIN topics_v4 AS t ON t.topic = d.topic ORDER BY d.rowid;
+CREATE TABLE processed_events_v4 (
+    topic_id INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    ts_us INTEGER NOT NULL,
+    source_id INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (topic_id, event_id)
+);
+INSERT INTO processed_events_v4 (topic_id, event_id, ts_us, source_id, payload)
+    SELECT t.id, e.event_id, e.ts_us, s.id, encode_payload(e.payload)
+    FROM processed_events AS e
+    JOIN topics_v4 AS t ON t.topic = e.topic
+    JOIN sources AS s ON s.source = e.source;
+DROP TABLE processed_events;
+DROP TABLE dedup;
+DROP TABLE topics;
+ALTER TABLE topics_v4 RENAME TO topics;
+ALTER TABLE dedup_v4 RENAME TO dedup;
+ALTER TABLE processed_events_v4 RENAME TO processed_events;
+CREATE INDEX dedup_processed_at ON dedup (processed_at);
+CREATE INDEX processed_events_ts ON processed_events (ts_us);
+CREATE INDEX processed_events_topic_ts ON processed_events (topic_id, ts_us, event_id);
+CREATE INDEX processed_events_source_ts ON processed_events (source_id, ts_us);
+CREATE TABLE payload_dicts (
+    id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
 """
 
+# v5: rollup tables, backfilled from the stored events (duplicates start at 0).
+_MIGRATE_ROLLUPS = _ROLLUP_SCHEMA + """
+INSERT INTO rollup_topics (topic_id, bucket_us, events)
+    SELECT topic_id, ts_us - ts_us % 60000000, COUNT(*) FROM processed_events GROUP BY 1, 2;
+INSERT INTO rollup_sources (topic_id, source_id, bucket_us, events)
+    SELECT topic_id, source_id, ts_us - ts_us % 3600000000, COUNT(*)
+    FROM processed_events GROUP BY 1, 2, 3;
+"""
+
+# Ordered ``(version, script)`` steps applied to databases created by older
+# releases; each runs in its own transaction together with the version bump.
+# Fresh databases get ``_SCHEMA`` directly and start at the last version.
+_MIGRATIONS: list[tuple[int, str]] = [
+    (1, _MIGRATE_COUNTERS),
+    (2, _MIGRATE_EPOCH_TIMESTAMPS),
+    (3, _MIGRATE_RETENTION),
+    (4, _MIGRATE_COMPACT_STORAGE),
+    (5, _MIGRATE_ROLLUPS),
+]
+_SCHEMA_VERSION = _MIGRATIONS[-1][0]
+
+EventRecord = Tuple[str, str, int, str, str]
+"""Row shape ``(topic, event_id, ts_us, source, payload_json)``."""
+
+ExportRow = Tuple[str, str, Optional[int], Optional[str], Optional[str], Optional[str]]
+"""Row shape ``(topic, event_id, ts_us, source, payload_json, processed_at)``.
+
+A dedup key whose event was pruned exports with ``ts_us``, ``source`` and
+``payload_json`` set to None; importing it restores only the key.
+"""
+
+EventKey = Tuple[int, str, str]
+"""Keyset position ``(ts_us, topic, event_id)`` used for pagination."""
+
+LazyEventRecord = Tuple[str, str, int, str, Union[LazyPayload, DecodedPayload]]
+"""``EventRecord`` whose payload text is produced on demand by ``.decode()``."""
+
+RollupBucketRow = Tuple[str, int, int, int, int]
+"""Row shape ``(topic, bucket_us, width_us, events, duplicates)``."""
+
+RollupSourceRow = Tuple[str, str, int, int]
+"""Row shape ``(topic, source, events, duplicates)`` summed over a range."""
+
+StoredTopicRollup = Tuple[str, int, int, int]
+"""Stored ``rollup_topics`` row ``(topic, bucket_us, events, duplicates)``."""
+
+StoredSourceRollup = Tuple[str, str, int, int, int]
+"""Stored ``rollup_sources`` row ``(topic, source, bucket_us, events, duplicates)``."""
+
+MINUTE_US = 60_000_000
+HOUR_US = 3_600_000_000
+DAY_US = 86_400_000_000
+
+_INSERT_DEDUP = "INSERT OR IGNORE INTO dedup (topic_id, event_id) VALUES (?, ?)"
+_INSERT_DEDUP_NEW = "INSERT INTO dedup (topic_id, event_id) VALUES (?, ?)"
+_INSERT_EVENT = (
+    "INSERT OR REPLACE INTO processed_events "
+    "(topic_id, event_id, ts_us, source_id, payload) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+_BUMP_COUNTER = "UPDATE counters SET value = value + ? WHERE name = ?"
+# Scratch table for set-based key lookups; TEMP keeps it out of the database file.
+_CREATE_PROBE = (
+    "CREATE TEMP TABLE IF NOT EXISTS probe_keys "
+    "(topic_id INTEGER NOT NULL, event_id TEXT NOT NULL, processed_at TIMESTAMP)"
+)
+_INSERT_PROBE = "INSERT INTO probe_keys (topic_id, event_id, processed_at) VALUES (?, ?, ?)"
+# Set-based probe and insert in one statement: only keys that were not yet
+# stored come back. Imports carry their original processed_at.
+_INSERT_FROM_PROBE = (
+    "INSERT OR IGNORE INTO dedup (topic_id, event_id, processed_at) "
+    "SELECT topic_id, event_id, COALESCE(processed_at, CURRENT_TIMESTAMP) FROM probe_keys "
+    "RETURNING topic_id, event_id"
+)
+# Every dedup key with its event, if still stored; key-only rows have NULL columns.
+_EXPORT_ROWS = (
+    "SELECT t.topic, d.event_id, e.ts_us, s.source, e.payload, d.processed_at "
+    "FROM topics AS t "
+    "CROSS JOIN dedup AS d ON d.topic_id = t.id "
+    "LEFT JOIN processed_events AS e "
+    "ON e.topic_id = d.topic_id AND e.event_id = d.event_id "
+    "LEFT JOIN sources AS s ON s.id = e.source_id"
+)
+# Indexes that only serve reads; bulk imports may drop and rebuild them.
+_SECONDARY_INDEXES = (
+    "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+    "AND tbl_name IN ('dedup', 'processed_events') ORDER BY name"
+)
+_PRUNE_DEDUP = (
+    "DELETE FROM dedup WHERE rowid IN ("
+    "SELECT rowid FROM dedup WHERE processed_at < ? ORDER BY processed_at LIMIT ?"
+    ") RETURNING topic_id, event_id"
+)
+_PRUNE_EVENTS = (
+    "DELETE FROM processed_events WHERE rowid IN ("
+    "SELECT rowid FROM processed_events WHERE ts_us < ? ORDER BY ts_us LIMIT ?"
+    ")"
+)
+# processed_events drives the join (CROSS JOIN pins the order) so filters and
+# keyset seeks use its indexes; names are resolved per returned row.
+_RELEASE_EVENT = (
+    "DELETE FROM processed_events WHERE topic_id = ? AND event_id = ? RETURNING ts_us, source_id"
+)
+_RELEASE_DEDUP = "DELETE FROM dedup WHERE topic_id = ? AND event_id = ?"
+_UPSERT_TOPIC_ROLLUP = (
+    "INSERT INTO rollup_topics (topic_id, bucket_us, events, duplicates) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (topic_id, bucket_us) DO UPDATE SET "
+    "events = events + excluded.events, duplicates = duplicates + excluded.duplicates"
+)
+_UPSERT_SOURCE_ROLLUP = (
+    "INSERT INTO rollup_sources (topic_id, source_id, bucket_us, events, duplicates) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (topic_id, source_id, bucket_us) DO UPDATE SET "
+    "events = events + excluded.events, duplicates = duplicates + excluded.duplicates"
+)
+# (table, key columns, coarse width, window) per downsampling step, finest first.
+_ROLLUP_STEPS = (
+    ("rollup_topics", "topic_id", HOUR_US, "minute"),
+    ("rollup_topics", "topic_id", DAY_US, "hour"),
+    ("rollup_sources", "topic_id, source_id", DAY_US, "hour"),
+)
+_SELECT_EVENTS = (
+    "SELECT t.topic, e.event_id, e.ts_us, s.source, e.payload "
+    "FROM processed_events AS e "
+    "CROSS JOIN topics AS t ON t.id = e.topic_id "
+    "CROSS JOIN sources AS s ON s.id = e.source_id"
+)
+
+# Fresh dictionaries are trained from this many recent payloads.
+_ZDICT_TRAIN_SAMPLES = 1000
+
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
 
 class DedupStore:
-    """SQLite-backed idempotency tracker."""
+    """SQLite-backed idempotency tracker.
+
+    The store keeps one long-lived writer connection and a small pool of
+    read-only connections, all running in WAL mode so that readers never wait
+    for an in-flight ingest transaction. Statements are issued with constant
+    SQL text so that ``sqlite3``'s per-connection statement cache reuses the
+    prepared statements.
+
+    Topic and source strings are interned into integer-keyed tables and
+    payloads are stored as compressed BLOBs (see :mod:`src.payload_codec`).
+    With ``zdict_size`` set, a preset dictionary is trained from the first
+    payloads written and used for every later one.
+
+    With ``rollups`` on, every write transaction also adds its new events and
+    duplicate deliveries to the rollup tables, so per-minute and per-source
+    counts never need a scan of ``processed_events``.
+    """
 
-    def __init__(self, db_path: Path) -> None:
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        reader_count: int = 4,
+        synchronous: str = "NORMAL",
+        cache_size: int = -16000,
+        mmap_size: int = 0,
+        compression: str = "zlib",
+        zdict_size: int = 0,
+        rollups: bool = True,
+    ) -> None:
         self._db_path = db_path
+        self._rollups = rollups
         self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        synchronous = synchronous.upper()
+        if synchronous not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"unsupported synchronous mode: {synchronous}")
+        self._pragmas = (
+            f"PRAGMA synchronous={synchronous}",
+            f"PRAGMA cache_size={int(cache_size)}",
+            f"PRAGMA mmap_size={int(mmap_size)}",
+        )
+        self._codec = PayloadCodec(compression)
+        self._zdict_size = max(0, zdict_size) if compression == "zlib" else 0
         self._lock = threading.RLock()
+        self._writer = self._open_connection()
+        # Only takes effect on a brand-new file (before WAL writes the header);
+        # lets retention hand freed pages back with incremental_vacuum.
+        self._writer.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._writer.execute("PRAGMA journal_mode=WAL")
         self._initialize()
+        # Writer-side caches of interned names; only touched under self._lock.
+        self._topic_ids: dict[str, int] = {}
+        self._topic_names: dict[int, str] = {}
+        self._source_ids: dict[str, int] = {}
+        # Downsampling watermarks, so late deltas go straight to the coarse bucket.
+        self._rollup_until: dict[str, int] = {}
+        with self._connect() as conn:
+            self._load_name_caches(conn)
+            self._rollup_until.update(
+                conn.execute("SELECT name, value FROM counters WHERE name LIKE 'rollup_%'")
+            )
+            for dict_id, data in conn.execute("SELECT id, data FROM payload_dicts ORDER BY id"):
+                self._codec.add_dictionary(dict_id, data)
+        self._reader_count = max(1, reader_count)
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._reader_total = 0
+        self._reader_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def rollups_enabled(self) -> bool:
+        return self._rollups
+
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._db_path,
+            check_same_thread=False,
+            isolation_level="DEFERRED",
+            cached_statements=256,
+        )
+        for pragma in self._pragmas:
+            conn.execute(pragma)
+        return conn
 
     def _initialize(self) -> None:
         with self._connect() as conn:
-            conn.executescript(_SCHEMA)
-            conn.commit()
+            conn.create_function("iso_to_micros", 1, _iso_to_micros, deterministic=True)
+            conn.create_function("encode_payload", 1, self._codec.encode, deterministic=True)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            existing = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dedup'"
+            ).fetchone()
+            if version == 0 and existing is None:
+                self._apply(conn, _SCHEMA + _ROLLUP_SCHEMA, _SCHEMA_VERSION)
+                return
+            for target, script in _MIGRATIONS:
+                if version < target:
+                    logger.info("Migrating dedup store %s to schema v%s", self._db_path, target)
+                    self._apply(conn, script, target)
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, script: str, version: int) -> None:
+        """Run a schema script and its version bump atomically."""
+        try:
+            conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version={version};\nCOMMIT;")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yield the shared writer connection, serialising writers."""
+        with self._lock:
+            yield self._writer
 
     @contextmanager
-    def _connect(self) -> Iterable[sqlite3.Connection]:
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled read-only connection."""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._reader_lock:
+            if self._reader_total < self._reader_count:
+                self._reader_total += 1
+                conn = self._open_connection()
+                conn.execute("PRAGMA query_only=ON")
+                return conn
+        return self._readers.get()
+
+    def close(self) -> None:
+        """Close the writer and every pooled reader connection."""
+        if self._closed:
+            return
+        self._closed = True
         with self._lock:
-            conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._writer.close()
+        while True:
             try:
-                yield conn
-            finally:
-                conn.close()
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
 
     def mark_processed(
         self,
         topic: str,
         event_id: str,
-        timestamp: str,
+        ts_us: int,
         source: str,
         payload_json: str,
     ) -> bool:
         """Attempt to record an event as processed; return True if new."""
+        return self.mark_processed_many([(topic, event_id, ts_us, source, payload_json)])[0]
+
+    def mark_processed_many(
+        self,
+        records: Sequence[EventRecord],
+        known_new: Sequence[bool] | None = None,
+        duplicates: Sequence[EventRecord] = (),
+    ) -> list[bool]:
+        """Record a batch of events in a single transaction.
+
+        Returns one flag per input record, True when the event was new. Duplicates
+        inside the batch itself are reported as duplicates after their first
+        occurrence. ``known_new`` may flag records that a pre-filter has proven
+        unseen; those skip the per-row uniqueness probe and are bulk inserted. If
+        such a hint turns out to be wrong the batch is retried without hints.
+        ``duplicates`` are deliveries the caller already knows to be repeats;
+        they are only counted in the rollups.
+        """
+        if not self._rollups:
+            duplicates = ()
+        if not records and not duplicates:
+            return []
+        if known_new is not None and any(known_new):
+            try:
+                return self._insert_batch(records, known_new, duplicates)
+            except sqlite3.IntegrityError:
+                logger.warning("Pre-filter hint contradicted the dedup table; re-probing batch")
+        return self._insert_batch(records, None, duplicates)
+
+    def mark_processed_set(self, records: Sequence[EventRecord]) -> list[bool]:
+        """Resolve a whole batch with one set-based statement, in one transaction.
+
+        The batch's keys go into a temporary table. A single
+        ``INSERT OR IGNORE ... SELECT ... RETURNING`` then adds the unseen ones
+        to ``dedup`` and reports which they were, instead of probing row by
+        row. Repeats inside the batch are duplicates after their first
+        occurrence, as in :meth:`mark_processed_many`.
+        """
+        if not records:
+            return []
         with self._connect() as conn:
             try:
-                conn.execute(
-                    "INSERT INTO dedup (topic, event_id) VALUES (?, ?)",
-                    (topic, event_id),
+                topic_ids = [self._topic_id(conn, record[0]) for record in records]
+                fresh = self._claim_keys(
+                    conn,
+                    [(topic_id, record[1], None) for topic_id, record in zip(topic_ids, records)],
                 )
-                conn.execute(
-                    (
-                        "INSERT OR REPLACE INTO processed_events "
-                        "(topic, event_id, timestamp, source, payload) "
-                        "VALUES (?, ?, ?, ?, ?)"
-                    ),
-                    (topic, event_id, timestamp, source, payload_json),
+                self._write_events(conn, topic_ids, records, fresh)
+                fresh_set = set(fresh)
+                results = [idx in fresh_set for idx in range(len(records))]
+                if self._rollups:
+                    self._count_deliveries(conn, topic_ids, records, results)
+                conn.commit()
+            except BaseException:
+                self._rollback(conn)
+                raise
+            if fresh and self._zdict_size and self._codec.active_dictionary is None:
+                self._maybe_train_dictionary(conn)
+        return results
+
+    @staticmethod
+    def _claim_keys(
+        conn: sqlite3.Connection, keys: Sequence[Tuple[int, str, str | None]]
+    ) -> list[int]:
+        """Insert the unseen ``(topic_id, event_id, processed_at)`` keys; return their indices.
+
+        Only the first occurrence of a key within ``keys`` can be new.
+        """
+        conn.execute(_CREATE_PROBE)
+        conn.executemany(_INSERT_PROBE, keys)
+        inserted = set(conn.execute(_INSERT_FROM_PROBE))
+        conn.execute("DELETE FROM probe_keys")
+        fresh: list[int] = []
+        for idx, (topic_id, event_id, _) in enumerate(keys):
+            key = (topic_id, event_id)
+            if key in inserted:
+                inserted.discard(key)
+                fresh.append(idx)
+        return fresh
+
+    def _load_name_caches(self, conn: sqlite3.Connection) -> None:
+        self._topic_names = dict(conn.execute("SELECT id, topic FROM topics"))
+        self._topic_ids = {name: ident for ident, name in self._topic_names.items()}
+        self._source_ids = {name: ident for ident, name in conn.execute("SELECT id, source FROM sources")}
+
+    def _topic_id(self, conn: sqlite3.Connection, topic: str) -> int:
+        ident = self._topic_ids.get(topic)
+        if ident is None:
+            conn.execute("INSERT OR IGNORE INTO topics (topic) VALUES (?)", (topic,))
+            ident = conn.execute("SELECT id FROM topics WHERE topic = ?", (topic,)).fetchone()[0]
+            self._topic_ids[topic] = ident
+            self._topic_names[ident] = topic
+        return ident
+
+    def _source_id(self, conn: sqlite3.Connection, source: str) -> int:
+        ident = self._source_ids.get(source)
+        if ident is None:
+            conn.execute("INSERT OR IGNORE INTO sources (source) VALUES (?)", (source,))
+            ident = conn.execute("SELECT id FROM sources WHERE source = ?", (source,)).fetchone()[0]
+            self._source_ids[source] = ident
+        return ident
+
+    def _rollback(self, conn: sqlite3.Connection) -> None:
+        conn.rollback()
+        # Ids interned inside the failed transaction are gone again.
+        self._load_name_caches(conn)
+
+    def _insert_batch(
+        self,
+        records: Sequence[EventRecord],
+        known_new: Sequence[bool] | None,
+        duplicates: Sequence[EventRecord] = (),
+    ) -> list[bool]:
+        results: list[bool] = []
+        fresh: list[int] = []
+        with self._connect() as conn:
+            try:
+                topic_ids = [self._topic_id(conn, record[0]) for record in records]
+                if known_new is not None:
+                    conn.executemany(
+                        _INSERT_DEDUP_NEW,
+                        [
+                            (topic_ids[idx], records[idx][1])
+                            for idx, hint in enumerate(known_new)
+                            if hint
+                        ],
+                    )
+                for idx, record in enumerate(records):
+                    if known_new is not None and known_new[idx]:
+                        is_new = True
+                    else:
+                        cursor = conn.execute(_INSERT_DEDUP, (topic_ids[idx], record[1]))
+                        is_new = cursor.rowcount == 1
+                    results.append(is_new)
+                    if is_new:
+                        fresh.append(idx)
+                self._write_events(conn, topic_ids, records, fresh)
+                if self._rollups:
+                    self._count_deliveries(conn, topic_ids, records, results, duplicates)
+                conn.commit()
+            except BaseException:
+                self._rollback(conn)
+                raise
+            if fresh and self._zdict_size and self._codec.active_dictionary is None:
+                self._maybe_train_dictionary(conn)
+        return results
+
+    def _write_events(
+        self,
+        conn: sqlite3.Connection,
+        topic_ids: Sequence[int],
+        records: Sequence[EventRecord],
+        fresh: Sequence[int],
+    ) -> None:
+        """Store the payload rows of the new records (inside the caller's transaction)."""
+        if not fresh:
+            return
+        encode = self._codec.encode
+        conn.executemany(
+            _INSERT_EVENT,
+            [
+                (
+                    topic_ids[idx],
+                    records[idx][1],
+                    records[idx][2],
+                    self._source_id(conn, records[idx][3]),
+                    encode(records[idx][4]),
                 )
+                for idx in fresh
+            ],
+        )
+        conn.execute(_BUMP_COUNTER, (len(fresh), "unique_processed"))
+
+    def _count_deliveries(
+        self,
+        conn: sqlite3.Connection,
+        topic_ids: Sequence[int],
+        records: Sequence[EventRecord],
+        results: Sequence[bool],
+        duplicates: Sequence[EventRecord] = (),
+    ) -> None:
+        """Rollup deltas for a resolved batch plus the caller's known duplicates."""
+        # Sources of new records were interned by _write_events already.
+        source_ids = self._source_ids
+        entries = [
+            (
+                topic_id,
+                record[2],
+                source_ids.get(record[3]) or self._source_id(conn, record[3]),
+                is_new,
+                not is_new,
+            )
+            for topic_id, record, is_new in zip(topic_ids, records, results)
+        ]
+        entries.extend(
+            (
+                self._topic_id(conn, record[0]),
+                record[2],
+                source_ids.get(record[3]) or self._source_id(conn, record[3]),
+                0,
+                1,
+            )
+            for record in duplicates
+        )
+        self._bump_rollups(conn, entries)
+
+    def _bump_rollups(
+        self, conn: sqlite3.Connection, entries: Iterable[Tuple[int, int, int, int, int]]
+    ) -> None:
+        """Add ``(topic_id, ts_us, source_id, events, duplicates)`` deltas to the rollups.
+
+        Deltas are summed per bucket first, so a batch costs one upsert per
+        distinct (topic, minute) and (topic, source, hour) it touches. Events
+        older than a downsampling watermark go to the hour or day bucket that
+        already holds their minute.
+        """
+        # One pass per delta into (topic, source, minute); the coarser keys
+        # are derived from those few groups.
+        groups: dict[Tuple[int, int, int], list[int]] = {}
+        for topic_id, ts_us, source_id, events, duplicates in entries:
+            key = (topic_id, source_id, ts_us - ts_us % MINUTE_US)
+            counts = groups.get(key)
+            if counts is None:
+                groups[key] = [events, duplicates]
+            else:
+                counts[0] += events
+                counts[1] += duplicates
+        until = self._rollup_until
+        topic_hours = until.get(f"rollup_topics_{HOUR_US}_until", 0)
+        topic_days = until.get(f"rollup_topics_{DAY_US}_until", 0)
+        source_days = until.get(f"rollup_sources_{DAY_US}_until", 0)
+        minutes: dict[Tuple[int, int], list[int]] = {}
+        hours: dict[Tuple[int, int, int], list[int]] = {}
+        for (topic_id, source_id, minute_us), (events, duplicates) in groups.items():
+            width = (
+                DAY_US
+                if minute_us < topic_days
+                else HOUR_US if minute_us < topic_hours else MINUTE_US
+            )
+            counts = minutes.setdefault((topic_id, minute_us - minute_us % width), [0, 0])
+            counts[0] += events
+            counts[1] += duplicates
+            width = DAY_US if minute_us < source_days else HOUR_US
+            counts = hours.setdefault((topic_id, source_id, minute_us - minute_us % width), [0, 0])
+            counts[0] += events
+            counts[1] += duplicates
+        if minutes:
+            conn.executemany(
+                _UPSERT_TOPIC_ROLLUP, [(*key, *counts) for key, counts in minutes.items()]
+            )
+            conn.executemany(
+                _UPSERT_SOURCE_ROLLUP, [(*key, *counts) for key, counts in hours.items()]
+            )
+
+    def _maybe_train_dictionary(self, conn: sqlite3.Connection) -> None:
+        """Train and activate a payload dictionary once enough samples exist."""
+        rows = conn.execute(
+            "SELECT payload FROM processed_events ORDER BY rowid DESC LIMIT ?",
+            (_ZDICT_TRAIN_SAMPLES,),
+        ).fetchall()
+        if len(rows) < _ZDICT_TRAIN_SAMPLES:
+            return
+        samples = [self._codec.decode(row[0]) for row in reversed(rows)]
+        data = train_dictionary(samples, self._zdict_size)
+        if not data:
+            return
+        try:
+            dict_id = conn.execute(
+                "INSERT INTO payload_dicts (data) VALUES (?)", (data,)
+            ).lastrowid
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        self._codec.add_dictionary(dict_id, data)
+        logger.info("Trained %s-byte payload dictionary %s for %s", len(data), dict_id, self._db_path)
+
+    def load_dedup_keys(self, after: int = 0, limit: int = 10000) -> list[Tuple[int, str, str]]:
+        """Return ``(rowid, topic, event_id)`` dedup keys after ``after`` in rowid order."""
+        with self._read() as conn:
+            return conn.execute(
+                "SELECT d.rowid, t.topic, d.event_id FROM dedup AS d "
+                "CROSS JOIN topics AS t ON t.id = d.topic_id "
+                "WHERE d.rowid > ? ORDER BY d.rowid LIMIT ?",
+                (after, limit),
+            ).fetchall()
+
+    def _select_keys(self, select: str, keys: Sequence[Tuple[str, str]]) -> list[tuple]:
+        """Run ``select`` (filtering on ``d.topic_id`` / ``d.event_id``) for the given keys."""
+        by_topic: dict[int, list[str]] = {}
+        for topic, event_id in keys:
+            topic_id = self._topic_ids.get(topic)
+            if topic_id is not None:
+                by_topic.setdefault(topic_id, []).append(event_id)
+        rows: list[tuple] = []
+        with self._read() as conn:
+            for topic_id, event_ids in by_topic.items():
+                for start in range(0, len(event_ids), 500):
+                    part = event_ids[start : start + 500]
+                    rows.extend(
+                        conn.execute(
+                            f"{select} WHERE d.topic_id = ? AND d.event_id IN "
+                            f"({','.join('?' * len(part))})",
+                            (topic_id, *part),
+                        )
+                    )
+        return rows
+
+    def stored_keys(self, keys: Sequence[Tuple[str, str]]) -> set[Tuple[str, str]]:
+        """Return the subset of ``keys`` that the dedup table already holds."""
+        names = self._topic_names
+        return {
+            (names[topic_id], event_id)
+            for topic_id, event_id in self._select_keys(
+                "SELECT d.topic_id, d.event_id FROM dedup AS d", keys
+            )
+        }
+
+    def export_keys(self, keys: Sequence[Tuple[str, str]]) -> list[ExportRow]:
+        """Return :meth:`export_rows` rows for those of ``keys`` that are stored here."""
+        return self._decode_export(self._select_keys(_EXPORT_ROWS, keys))
+
+    def _decode_export(self, rows: Iterable[tuple]) -> list[ExportRow]:
+        decode = self._codec.decode
+        return [
+            (row[0], row[1], row[2], row[3], None if row[4] is None else decode(row[4]), row[5])
+            for row in rows
+        ]
+
+    def iter_dedup_keys(self, chunk_size: int = 10000) -> Iterator[list[Tuple[str, str]]]:
+        """Yield every dedup key in chunks without holding a connection between chunks."""
+        after = 0
+        while True:
+            rows = self.load_dedup_keys(after, chunk_size)
+            if not rows:
+                return
+            after = rows[-1][0]
+            yield [(topic, event_id) for _, topic, event_id in rows]
+
+    def export_rows(
+        self,
+        after: Tuple[str, str] | None = None,
+        limit: int = 10000,
+        *,
+        topic: str | None = None,
+        since_us: int | None = None,
+        until_us: int | None = None,
+    ) -> list[ExportRow]:
+        """Return dedup keys with their events in ``(topic, event_id)`` order.
+
+        Every dedup key is exported, so a copy rejects the same duplicates:
+        keys whose event was already pruned come back as key-only rows (see
+        ``ExportRow``). Payloads are decoded so the rows can be imported into
+        any store. ``topic``, ``since_us`` (inclusive) and ``until_us``
+        (exclusive) narrow the export like the ``/events`` filters do; a time
+        range leaves out the key-only rows, which have no timestamp.
+        """
+        query = _EXPORT_ROWS
+        clauses: list[str] = []
+        params: list[object] = []
+        if topic:
+            clauses.append("t.topic = ?")
+            params.append(topic)
+        if since_us is not None:
+            clauses.append("e.ts_us >= ?")
+            params.append(since_us)
+        if until_us is not None:
+            clauses.append("e.ts_us < ?")
+            params.append(until_us)
+        if after is not None:
+            clauses.append("(t.topic, d.event_id) > (?, ?)")
+            params.extend(after)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY t.topic, d.event_id LIMIT ?"
+        params.append(limit)
+        with self._read() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return self._decode_export(rows)
+
+    def import_rows(self, rows: Sequence[ExportRow]) -> int:
+        """Insert exported rows in one transaction, keeping ``processed_at``; return rows added.
+
+        Keys that are already stored are skipped, so importing overlapping
+        exports is idempotent. Key-only rows claim their dedup key (and count
+        in ``unique_processed``) without storing an event.
+        """
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            try:
+                topic_ids = [self._topic_id(conn, row[0]) for row in rows]
+                fresh = self._claim_keys(
+                    conn, [(topic_id, row[1], row[5]) for topic_id, row in zip(topic_ids, rows)]
+                )
+                events = [idx for idx in fresh if rows[idx][4] is not None]
+                self._write_events(conn, topic_ids, rows, events)
+                if len(events) < len(fresh):
+                    conn.execute(_BUMP_COUNTER, (len(fresh) - len(events), "unique_processed"))
+                if self._rollups:
+                    # Skipped rows were already counted; they are not redeliveries.
+                    # Key-only rows were counted when their event was stored.
+                    source_id = self._source_id
+                    self._bump_rollups(
+                        conn,
+                        [
+                            (topic_ids[idx], rows[idx][2], source_id(conn, rows[idx][3]), 1, 0)
+                            for idx in events
+                        ],
+                    )
                 conn.commit()
-                return True
-            except sqlite3.IntegrityError:
-                return False
+            except BaseException:
+                self._rollback(conn)
+                raise
+        return len(fresh)
+
+    @contextmanager
+    def deferred_indexes(self) -> Iterator[None]:
+        """Drop the read-only secondary indexes for a bulk load and rebuild them after.
+
+        Only for stores nobody is querying meanwhile (a node being bootstrapped):
+        without the indexes ``/events`` filters and retention fall back to scans.
+        """
+        with self._connect() as conn:
+            indexes = conn.execute(_SECONDARY_INDEXES).fetchall()
+            for name, _ in indexes:
+                conn.execute(f'DROP INDEX "{name}"')
+        try:
+            yield
+        finally:
+            with self._connect() as conn:
+                for _, sql in indexes:
+                    conn.execute(sql)
+                conn.commit()
+
+    def backup(self, target: Path) -> int:
+        """Write a consistent copy of the database to ``target``; return its page count.
+
+        The copy runs on a dedicated connection as a single backup step, i.e.
+        inside one read transaction. In WAL mode that pins one snapshot while
+        ingest keeps committing. Copying a few pages per step would instead
+        restart every time the writer commits. The copy is written beside
+        ``target`` and renamed into place.
+        """
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(f"{target.name}.partial")
+        partial.unlink(missing_ok=True)
+        source = self._open_connection()
+        try:
+            destination = sqlite3.connect(partial)
+            try:
+                source.backup(destination)
+                pages = destination.execute("PRAGMA page_count").fetchone()[0]
+            finally:
+                destination.close()
+        finally:
+            source.close()
+        # A stale WAL next to an older copy would be replayed over the new one.
+        for suffix in ("-wal", "-shm"):
+            target.with_name(target.name + suffix).unlink(missing_ok=True)
+        os.replace(partial, target)
+        return pages
+
+    def recent_dedup_keys(self, limit: int) -> list[Tuple[str, str]]:
+        """Return the ``limit`` most recently recorded keys, oldest first."""
+        with self._read() as conn:
+            rows = conn.execute(
+                "SELECT t.topic, d.event_id FROM dedup AS d "
+                "CROSS JOIN topics AS t ON t.id = d.topic_id "
+                "ORDER BY d.rowid DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def load_events(
+        self,
+        topic: str | None = None,
+        after: EventKey | None = None,
+        limit: int | None = None,
+        *,
+        source: str | None = None,
+        since_us: int | None = None,
+        until_us: int | None = None,
+        lazy: bool = False,
+    ) -> list[EventRecord] | list[LazyEventRecord]:
+        """Return stored events ordered by ``(ts_us, topic, event_id)``.
 
-    def load_events(self, topic: str | None = None) -> list[Tuple[str, str, str, str, str]]:
-        """Return list of stored events, optionally filtered by topic."""
-        query = "SELECT topic, event_id, timestamp, source, payload FROM processed_events"
-        params: tuple[str, ...] = ()
+        ``after`` is an exclusive keyset position from a previous page and
+        ``limit`` caps the number of rows returned. ``since_us`` (inclusive) and
+        ``until_us`` (exclusive) bound the event timestamp in epoch microseconds;
+        together with the topic/source filters they map onto index range scans.
+        With ``lazy`` the payload column is returned as :class:`LazyPayload` and
+        only decompressed when the caller renders it.
+        """
+        query = _SELECT_EVENTS
+        clauses: list[str] = []
+        params: list[object] = []
         if topic:
-            query += " WHERE topic = ?"
-            params = (topic,)
-        query += " ORDER BY timestamp"
+            clauses.append("e.topic_id = (SELECT id FROM topics WHERE topic = ?)")
+            params.append(topic)
+        if source:
+            clauses.append("e.source_id = (SELECT id FROM sources WHERE source = ?)")
+            params.append(source)
+        if since_us is not None:
+            clauses.append("e.ts_us >= ?")
+            params.append(since_us)
+        if until_us is not None:
+            clauses.append("e.ts_us < ?")
+            params.append(until_us)
+        if after is not None:
+            # The plain lower bound lets SQLite seek the index; the row value
+            # comparison then breaks ties within the same microsecond.
+            clauses.append("e.ts_us >= ? AND (e.ts_us, t.topic, e.event_id) > (?, ?, ?)")
+            params.append(after[0])
+            params.extend(after)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        # With a fixed topic the (topic_id, ts_us, event_id) index already
+        # yields the requested order; otherwise ties on ts_us sort by name.
+        if topic:
+            query += " ORDER BY e.ts_us, e.event_id"
+        else:
+            query += " ORDER BY e.ts_us, t.topic, e.event_id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._read() as conn:
+            rows = conn.execute(query, params).fetchall()
+        wrap = self._codec.lazy if lazy else self._codec.decode
+        return [(row[0], row[1], row[2], row[3], wrap(row[4])) for row in rows]
+
+    def prune_dedup_keys(self, older_than: datetime, limit: int = 1000) -> list[Tuple[str, str]]:
+        """Forget up to ``limit`` dedup keys processed before ``older_than``.
+
+        Returns the removed keys so callers can evict them from in-memory
+        caches. Counters are cumulative and are not decremented.
+        """
+        if older_than.tzinfo is not None:
+            older_than = older_than.astimezone(timezone.utc).replace(tzinfo=None)
+        cutoff = older_than.strftime("%Y-%m-%d %H:%M:%S")
         with self._connect() as conn:
-            return conn.execute(query, params).fetchall()
+            try:
+                removed = conn.execute(_PRUNE_DEDUP, (cutoff, limit)).fetchall()
+                if removed:
+                    conn.execute(_BUMP_COUNTER, (len(removed), "dedup_pruned"))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            return [(self._topic_names[topic_id], event_id) for topic_id, event_id in removed]
 
-    def stats(self) -> dict[str, int]:
-        """Return dedup statistics."""
+    def prune_events(self, before_us: int, limit: int = 1000) -> int:
+        """Delete up to ``limit`` stored events with ``ts_us < before_us``; return count."""
+        with self._connect() as conn:
+            try:
+                removed = conn.execute(_PRUNE_EVENTS, (before_us, limit)).rowcount
+                if removed:
+                    conn.execute(_BUMP_COUNTER, (removed, "events_pruned"))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return removed
+
+    def release_keys(self, keys: Sequence[Tuple[str, str]]) -> int:
+        """Delete keys that now belong to another store; return how many were held.
+
+        Used after the rows were handed off to their new owner. Unlike retention
+        this also takes the keys out of ``unique_processed`` and the rollup
+        event counts, since the new owner counts them from now on.
+        """
+        pairs = [
+            (self._topic_ids[topic], event_id)
+            for topic, event_id in keys
+            if topic in self._topic_ids
+        ]
+        if not pairs:
+            return 0
         with self._connect() as conn:
-            received = conn.execute("SELECT COUNT(*) FROM processed_events").fetchone()[0]
-            unique_processed = conn.execute("SELECT COUNT(*) FROM dedup").fetchone()[0]
-            return {
-                "received": received,
-                "unique_processed": unique_processed,
-            }
+            try:
+                released = [
+                    (topic_id, *row)
+                    for topic_id, event_id in pairs
+                    for row in conn.execute(_RELEASE_EVENT, (topic_id, event_id))
+                ]
+                removed = conn.executemany(_RELEASE_DEDUP, pairs).rowcount
+                if removed:
+                    conn.execute(_BUMP_COUNTER, (-removed, "unique_processed"))
+                if self._rollups:
+                    self._bump_rollups(
+                        conn, [(row[0], row[1], row[2], -1, 0) for row in released]
+                    )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return removed
+
+    def downsample_rollups(self, minutes_before_us: int, hours_before_us: int) -> int:
+        """Merge old rollup buckets into coarser ones; return how many rows went away.
+
+        Per-minute topic buckets that start before ``minutes_before_us`` are
+        summed into their hour, and hourly topic and source buckets before
+        ``hours_before_us`` into their day (0 skips a step). Both cut-offs
+        are rounded down to whole coarse buckets. The coarse bucket is the
+        row at the aligned start. The cut-offs are kept as watermarks: they
+        tell bucket widths apart on read and send events arriving later for
+        an old minute straight to its coarse bucket.
+        """
+        merged = 0
+        watermarks: dict[str, int] = {}
+        with self._connect() as conn:
+            try:
+                for table, keys, width, window in _ROLLUP_STEPS:
+                    before_us = minutes_before_us if window == "minute" else hours_before_us
+                    if before_us <= 0:
+                        continue
+                    before_us -= before_us % width
+                    conn.execute(
+                        f"INSERT INTO {table} ({keys}, bucket_us, events, duplicates) "
+                        f"SELECT {keys}, bucket_us - bucket_us % :width, "
+                        "SUM(events), SUM(duplicates) "
+                        f"FROM {table} WHERE bucket_us < :before AND bucket_us % :width != 0 "
+                        f"GROUP BY {keys}, bucket_us - bucket_us % :width "
+                        f"ON CONFLICT ({keys}, bucket_us) DO UPDATE SET "
+                        "events = events + excluded.events, "
+                        "duplicates = duplicates + excluded.duplicates",
+                        {"width": width, "before": before_us},
+                    )
+                    merged += conn.execute(
+                        f"DELETE FROM {table} WHERE bucket_us < ? AND bucket_us % ? != 0",
+                        (before_us, width),
+                    ).rowcount
+                    name = f"{table}_{width}_until"
+                    watermarks[name] = conn.execute(
+                        "INSERT INTO counters (name, value) VALUES (?, ?) "
+                        "ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value) "
+                        "RETURNING value",
+                        (name, before_us),
+                    ).fetchall()[0][0]
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            self._rollup_until.update(watermarks)
+        return merged
+
+    def load_rollups(
+        self,
+        topic: str | None = None,
+        since_us: int | None = None,
+        until_us: int | None = None,
+    ) -> Tuple[list[RollupBucketRow], list[RollupSourceRow]]:
+        """Per-topic buckets and per-source totals whose bucket starts in the range.
+
+        Topic buckets are a minute wide until downsampled (then an hour or a
+        day); source buckets are an hour or a day, so their totals follow the
+        range at that resolution.
+        """
+        clauses: list[str] = []
+        params: list[object] = []
+        if topic:
+            clauses.append("r.topic_id = (SELECT id FROM topics WHERE topic = ?)")
+            params.append(topic)
+        if since_us is not None:
+            clauses.append("r.bucket_us >= ?")
+            params.append(since_us)
+        if until_us is not None:
+            clauses.append("r.bucket_us < ?")
+            params.append(until_us)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        with self._read() as conn:
+            watermarks = dict(
+                conn.execute("SELECT name, value FROM counters WHERE name LIKE 'rollup_%'")
+            )
+            buckets = conn.execute(
+                "SELECT t.topic, r.bucket_us, r.events, r.duplicates FROM rollup_topics AS r "
+                f"CROSS JOIN topics AS t ON t.id = r.topic_id{where} "
+                # Primary key order; sorting by name would need a temp B-tree.
+                "ORDER BY r.topic_id, r.bucket_us",
+                params,
+            ).fetchall()
+            sources = conn.execute(
+                "SELECT t.topic, s.source, SUM(r.events), SUM(r.duplicates) "
+                "FROM rollup_sources AS r "
+                "CROSS JOIN topics AS t ON t.id = r.topic_id "
+                f"CROSS JOIN sources AS s ON s.id = r.source_id{where} "
+                "GROUP BY t.topic, s.source ORDER BY t.topic, s.source",
+                params,
+            ).fetchall()
+        hours_until = watermarks.get(f"rollup_topics_{HOUR_US}_until", 0)
+        days_until = watermarks.get(f"rollup_topics_{DAY_US}_until", 0)
+
+        def width(bucket_us: int) -> int:
+            if bucket_us < days_until and bucket_us % DAY_US == 0:
+                return DAY_US
+            if bucket_us < hours_until and bucket_us % HOUR_US == 0:
+                return HOUR_US
+            return MINUTE_US
+
+        return (
+            [(name, bucket, width(bucket), events, dups) for name, bucket, events, dups in buckets],
+            sources,
+        )
+
+    def export_state(
+        self,
+    ) -> tuple[dict[str, int], list[StoredTopicRollup], list[StoredSourceRollup]]:
+        """Return the counters and every rollup row, for copying the store wholesale."""
+        with self._read() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters"))
+            topics = conn.execute(
+                "SELECT t.topic, r.bucket_us, r.events, r.duplicates FROM rollup_topics AS r "
+                "CROSS JOIN topics AS t ON t.id = r.topic_id"
+            ).fetchall()
+            sources = conn.execute(
+                "SELECT t.topic, s.source, r.bucket_us, r.events, r.duplicates "
+                "FROM rollup_sources AS r "
+                "CROSS JOIN topics AS t ON t.id = r.topic_id "
+                "CROSS JOIN sources AS s ON s.id = r.source_id"
+            ).fetchall()
+        return counters, topics, sources
+
+    def restore_state(
+        self,
+        counters: dict[str, int],
+        topic_rows: Sequence[StoredTopicRollup],
+        source_rows: Sequence[StoredSourceRollup],
+    ) -> None:
+        """Overwrite ``counters`` and replace the rollups with rows from :meth:`export_state`.
+
+        Rows sharing a bucket are summed, so the rows of several stores can be
+        restored into one.
+        """
+        with self._connect() as conn:
+            try:
+                conn.executemany(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                    counters.items(),
+                )
+                conn.execute("DELETE FROM rollup_topics")
+                conn.execute("DELETE FROM rollup_sources")
+                topic_id, source_id = self._topic_id, self._source_id
+                conn.executemany(
+                    _UPSERT_TOPIC_ROLLUP,
+                    [(topic_id(conn, row[0]), *row[1:]) for row in topic_rows],
+                )
+                conn.executemany(
+                    _UPSERT_SOURCE_ROLLUP,
+                    [
+                        (topic_id(conn, row[0]), source_id(conn, row[1]), *row[2:])
+                        for row in source_rows
+                    ],
+                )
+                conn.commit()
+            except BaseException:
+                self._rollback(conn)
+                raise
+            self._rollup_until.update(
+                (name, value) for name, value in counters.items() if name.startswith("rollup_")
+            )
+
+    def incremental_vacuum(self, pages: int = 1000) -> int:
+        """Release up to ``pages`` free pages to the filesystem; return pages freed.
+
+        Databases created before auto_vacuum was enabled report zero; they need a
+        one-off ``PRAGMA auto_vacuum=INCREMENTAL; VACUUM;`` to opt in.
+        """
+        with self._connect() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # executescript steps the pragma to completion; a plain execute() only
+            # runs its first step and frees a single page.
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return before - after
+
+    def stats(self) -> dict[str, int]:
+        """Return dedup statistics from the persisted counters."""
+        with self._read() as conn:
+            rows = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        unique_processed = rows.get("unique_processed", 0)
+        return {
+            "received": unique_processed,
+            "unique_processed": unique_processed,
+        }
+
+    def prune_stats(self) -> dict[str, int]:
+        """Return how many dedup keys and events retention has removed so far."""
+        with self._read() as conn:
+            rows = dict(
+                conn.execute(
+                    "SELECT name, value FROM counters WHERE name IN ('dedup_pruned', 'events_pruned')"
+                ).fetchall()
+            )
+        return {name: rows.get(name, 0) for name in ("dedup_pruned", "events_pruned")}
+
+    def topics(self) -> list[str]:
+        """Return every topic that has at least one processed event."""
+        with self._read() as conn:
+            return [row[0] for row in conn.execute("SELECT topic FROM topics ORDER BY topic")]
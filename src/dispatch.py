@@ -0,0 +1,220 @@
+"""Key-partitioned event queues that preserve per-key FIFO ordering."""
+from __future__ import annotations
+
+import asyncio
+import zlib
+from collections import OrderedDict, deque
+from typing import Callable, Generic, Hashable, Iterable, Sequence, TypeVar
+
+from .dedup_store import EventRecord
+
+
+T = TypeVar("T")
+
+# Keyed on store rows ``(topic, event_id, ts_us, source, payload)``, which is
+# what the service queues.
+PARTITION_KEYS: dict[str, Callable[[EventRecord], str]] = {
+    "topic": lambda record: record[0],
+    "source": lambda record: record[3],
+    "topic_source": lambda record: f"{record[0]}\x1f{record[3]}",
+}
+
+
+class _Capacity:
+    """Item budget shared by every partition of one dispatcher (``0`` = unbounded)."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = max(0, maxsize)
+        self.size = 0
+        self.freed = asyncio.Event()
+
+    def free(self) -> int | None:
+        """Free slots, or None when the dispatcher is unbounded."""
+        if not self.maxsize:
+            return None
+        return max(0, self.maxsize - self.size)
+
+    def full(self) -> bool:
+        return bool(self.maxsize) and self.size >= self.maxsize
+
+
+class _Partition(Generic[T]):
+    """One partition: either a single FIFO lane or, in fair mode, one lane per key.
+
+    Fair mode serves the lanes round-robin, taking at most ``quantum`` items from
+    a lane before moving on, so a hot key cannot starve colder keys that hash to
+    the same partition. Items of one key always share a lane, keeping them FIFO.
+
+    All state is only touched from the event loop, so non-awaiting methods are
+    atomic and waiters are woken through plain ``asyncio.Event`` flags.
+    """
+
+    def __init__(self, capacity: _Capacity, fair: bool, quantum: int) -> None:
+        self._capacity = capacity
+        self._fair = fair
+        self._quantum = max(1, quantum)
+        self._lanes: OrderedDict[Hashable, deque[T]] = OrderedDict()
+        self._not_empty = asyncio.Event()
+        self._all_done = asyncio.Event()
+        self._all_done.set()
+        self._closed = False
+        self.size = 0
+        self.unfinished = 0
+
+    def push(self, key: Hashable, item: T) -> None:
+        lane_key = key if self._fair else None
+        lane = self._lanes.get(lane_key)
+        if lane is None:
+            lane = self._lanes[lane_key] = deque()
+        lane.append(item)
+        self.size += 1
+        self._capacity.size += 1
+        self.unfinished += 1
+        self._all_done.clear()
+        self._not_empty.set()
+
+    def _pop_batch(self, limit: int) -> list[T]:
+        batch: list[T] = []
+        while self._lanes and len(batch) < limit:
+            lane_key, lane = next(iter(self._lanes.items()))
+            take = min(len(lane), limit - len(batch))
+            if self._fair:
+                take = min(take, self._quantum)
+            for _ in range(take):
+                batch.append(lane.popleft())
+            if lane:
+                # Rotate the lane to the back so the next key gets a turn.
+                self._lanes.move_to_end(lane_key)
+            else:
+                del self._lanes[lane_key]
+        self.size -= len(batch)
+        if batch:
+            self._capacity.size -= len(batch)
+            self._capacity.freed.set()
+        if not self.size:
+            self._not_empty.clear()
+        return batch
+
+    async def put_many(self, items: list[tuple[Hashable, T]]) -> None:
+        for key, item in items:
+            while self._capacity.full():
+                self._capacity.freed.clear()
+                await self._capacity.freed.wait()
+            self.push(key, item)
+
+    async def get_batch(self, limit: int, linger: float) -> list[T]:
+        """Wait for at least one item, then linger up to ``linger`` seconds to fill."""
+        while not self.size and not self._closed:
+            await self._not_empty.wait()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + linger
+        while self.size < limit and not self._closed:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._not_empty.clear()
+            try:
+                await asyncio.wait_for(self._not_empty.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self._pop_batch(limit)
+
+    def task_done(self, count: int) -> None:
+        self.unfinished -= count
+        if self.unfinished <= 0:
+            self._all_done.set()
+
+    async def join(self) -> None:
+        await self._all_done.wait()
+
+    def close(self) -> None:
+        self._closed = True
+        self._not_empty.set()
+
+
+class PartitionedDispatcher(Generic[T]):
+    """Routes items onto ``partitions`` queues by a stable hash of their key.
+
+    Each partition is meant to be drained by exactly one worker, which gives
+    strict FIFO per key while different keys proceed in parallel. ``maxsize``
+    bounds the items queued across all partitions together (``0`` = unbounded),
+    so the memory held by the dispatcher does not grow with the partition count;
+    a single hot partition may use the whole budget.
+    """
+
+    def __init__(
+        self,
+        partitions: int,
+        key: Callable[[T], str],
+        maxsize: int = 0,
+        fair: bool = False,
+        quantum: int = 32,
+    ) -> None:
+        self._key = key
+        self._capacity = _Capacity(maxsize)
+        self._partitions: list[_Partition[T]] = [
+            _Partition(self._capacity, fair, quantum)
+            for _ in range(max(1, partitions))
+        ]
+
+    @property
+    def partition_count(self) -> int:
+        return len(self._partitions)
+
+    def _index(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % len(self._partitions)
+
+    def partition_for(self, item: T) -> int:
+        return self._index(self._key(item))
+
+    async def put(self, item: T) -> None:
+        await self.put_many([item])
+
+    async def put_many(self, items: Iterable[T]) -> None:
+        """Enqueue items, waiting for room when the dispatcher is bounded."""
+        grouped: dict[int, list[tuple[Hashable, T]]] = {}
+        for item in items:
+            key = self._key(item)
+            grouped.setdefault(self._index(key), []).append((key, item))
+        for index, entries in grouped.items():
+            await self._partitions[index].put_many(entries)
+
+    def fitting_prefix(self, items: Sequence[T], limit: int | None = None) -> int:
+        """Return how many leading ``items`` fit into the dispatcher right now."""
+        count = len(items) if limit is None else min(len(items), max(0, limit))
+        free = self._capacity.free()
+        return count if free is None else min(count, free)
+
+    def put_many_nowait(self, items: Iterable[T]) -> None:
+        """Enqueue items that the caller has already reserved room for."""
+        for item in items:
+            key = self._key(item)
+            self._partitions[self._index(key)].push(key, item)
+
+    async def wait_for_space(self) -> None:
+        """Wait until any partition hands out a batch (and so frees room)."""
+        self._capacity.freed.clear()
+        await self._capacity.freed.wait()
+
+    async def get_batch(self, partition: int, limit: int, linger: float) -> list[T]:
+        """Return the next batch for ``partition``; empty once closed and drained."""
+        return await self._partitions[partition].get_batch(limit, linger)
+
+    async def task_done(self, partition: int, count: int = 1) -> None:
+        self._partitions[partition].task_done(count)
+
+    async def join(self) -> None:
+        """Wait until every queued item has been marked done."""
+        for partition in self._partitions:
+            await partition.join()
+
+    async def close(self) -> None:
+        """Wake idle workers; they drain what is queued and then exit."""
+        for partition in self._partitions:
+            partition.close()
+
+    def depths(self) -> list[int]:
+        return [partition.size for partition in self._partitions]
+
+    def qsize(self) -> int:
+        return sum(partition.size for partition in self._partitions)
@@ -0,0 +1,192 @@
+"""In-process fan-out of newly committed events to live subscribers.
+
+Workers hand every batch of newly stored events to :meth:`FanoutHub.publish`,
+which is synchronous and never waits on a subscriber: each subscription owns a
+bounded buffer, and a subscriber that falls ``buffer_size`` events behind is
+handled by the slow-consumer policy instead of holding up the worker:
+
+``drop``
+    the oldest buffered events are discarded and the subscriber is told how
+    many it missed (it can re-read them from ``GET /events``);
+``disconnect``
+    the subscription is closed and the client has to resume with a cursor.
+
+Items are rendered once per event by the publisher and shared by every
+subscriber, so the per-subscriber cost is a ``deque.append``. Nothing is
+rendered at all while the hub has no subscriber for a topic.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Any, Iterable, NamedTuple
+
+SLOW_CONSUMER_POLICIES = ("drop", "disconnect")
+
+
+# Outcomes of Subscription.offer.
+DELIVERED, DROPPED, EVICTED = 0, 1, 2
+
+
+class LiveEvent(NamedTuple):
+    """A committed event, rendered once for both push transports."""
+
+    topic: str
+    key: tuple[int, str, str]
+    sse: bytes
+    ws: str
+
+
+class Notice(NamedTuple):
+    """Out-of-band message to a subscriber: ``dropped``, ``gap`` or ``disconnected``."""
+
+    kind: str
+    data: dict[str, Any]
+
+
+class SubscriptionClosed(Exception):
+    """Raised by :meth:`Subscription.get` once a closed subscription is drained."""
+
+
+class Subscription:
+    """One subscriber's bounded buffer; see the module docstring for the policies."""
+
+    __slots__ = ("topic", "_buffer", "_limit", "_disconnect", "_wakeup", "_dropped", "closed")
+
+    def __init__(self, topic: str | None, limit: int, disconnect: bool) -> None:
+        self.topic = topic
+        self._buffer: deque[LiveEvent | Notice] = deque()
+        self._limit = limit
+        self._disconnect = disconnect
+        self._wakeup = asyncio.Event()
+        self._dropped = 0
+        self.closed = False
+
+    def offer(self, item: LiveEvent | Notice) -> int:
+        """Buffer ``item``; returns ``DELIVERED``, ``DROPPED`` (oldest lost) or ``EVICTED``."""
+        if self.closed:
+            return EVICTED
+        buffer = self._buffer
+        outcome = DELIVERED
+        if len(buffer) >= self._limit:
+            if self._disconnect:
+                self.close()
+                return EVICTED
+            buffer.popleft()
+            self._dropped += 1
+            outcome = DROPPED
+        buffer.append(item)
+        self._wakeup.set()
+        return outcome
+
+    def close(self) -> None:
+        self.closed = True
+        self._wakeup.set()
+
+    async def get(self, timeout: float | None = None) -> tuple[list[LiveEvent | Notice], int]:
+        """Wait for and take everything buffered, plus how many were dropped meanwhile.
+
+        Returns ``([], 0)`` when ``timeout`` passes first so callers can send a
+        keep-alive.
+        """
+        if not self._buffer and not self.closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return [], 0
+        self._wakeup.clear()
+        items = list(self._buffer)
+        self._buffer.clear()
+        dropped, self._dropped = self._dropped, 0
+        if not items and not dropped and self.closed:
+            raise SubscriptionClosed
+        return items, dropped
+
+
+class FanoutHub:
+    """Routes published events to subscriptions by topic (``None`` = every topic)."""
+
+    def __init__(self, buffer_size: int = 1024, policy: str = "drop") -> None:
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"unknown slow consumer policy: {policy}")
+        self._buffer_size = max(1, buffer_size)
+        self._disconnect = policy == "disconnect"
+        self._by_topic: dict[str | None, set[Subscription]] = {}
+        self._count = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    @property
+    def active(self) -> bool:
+        return self._count > 0
+
+    def wants(self, topic: str) -> bool:
+        by_topic = self._by_topic
+        return None in by_topic or topic in by_topic
+
+    def subscribe(self, topic: str | None = None) -> Subscription:
+        subscription = Subscription(topic, self._buffer_size, self._disconnect)
+        self._by_topic.setdefault(topic, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> bool:
+        """Remove ``subscription``; return False if it was already gone."""
+        subscribers = self._by_topic.get(subscription.topic)
+        if subscribers is None or subscription not in subscribers:
+            return False
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._by_topic[subscription.topic]
+        self._count -= 1
+        return True
+
+    def publish(self, items: Iterable[LiveEvent]) -> None:
+        """Offer each event to its topic's and the wildcard subscribers; never blocks."""
+        by_topic = self._by_topic
+        everyone = by_topic.get(None, ())
+        evicted: set[Subscription] = set()
+        outcomes = [0, 0, 0]
+        for item in items:
+            for subscribers in (by_topic.get(item.topic, ()), everyone):
+                for subscription in subscribers:
+                    outcome = subscription.offer(item)
+                    outcomes[outcome] += 1
+                    if outcome == EVICTED:
+                        evicted.add(subscription)
+        self.delivered += outcomes[DELIVERED] + outcomes[DROPPED]
+        self.dropped += outcomes[DROPPED]
+        self._evict(evicted)
+
+    def broadcast(self, notice: Notice) -> None:
+        """Send ``notice`` to every subscriber regardless of topic."""
+        self._evict(
+            {
+                subscription
+                for subscribers in self._by_topic.values()
+                for subscription in subscribers
+                if subscription.offer(notice) == EVICTED
+            }
+        )
+
+    def _evict(self, subscriptions: Iterable[Subscription]) -> None:
+        for subscription in subscriptions:
+            if self.unsubscribe(subscription):
+                self.disconnected += 1
+
+    def close(self) -> None:
+        """Disconnect every subscriber (shutdown or lost upstream)."""
+        for subscribers in list(self._by_topic.values()):
+            for subscription in subscribers:
+                subscription.close()
+        self._by_topic.clear()
+        self._count = 0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "subscribers": float(self._count),
+            "delivered": float(self.delivered),
+            "dropped": float(self.dropped),
+            "disconnected": float(self.disconnected),
+        }
@@ -0,0 +1,310 @@
+"""Append-only ingest log that makes admitted events survive a crash.
+
+``submit_batch`` appends every admitted batch as one frame before it is
+acknowledged. A single flusher task writes and ``fsync``\\ s whatever has
+accumulated since its previous pass, so concurrent publishers share one
+``fsync`` (group commit) instead of paying one each.
+
+Every event gets a sequence number. Workers report which sequence numbers
+reached the ``DedupStore``; the log tracks the contiguous committed prefix
+(the watermark), persists it in ``checkpoint`` and deletes segments that lie
+entirely below it. The checkpoint is rewritten at most once per
+``checkpoint_ms`` (and on close), so a busy log does not pay a file rewrite
+for every advance; a stale checkpoint only means replaying more. After a
+crash the events from the checkpoint onwards are replayed; the service skips
+the ones whose keys the store already holds.
+
+Segment files are named after the first sequence number they hold and
+contain frames of ``length, first_seq, crc32`` followed by a JSON array of
+store rows ``[topic, event_id, ts_us, source, payload_json]``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from .dedup_store import EventRecord
+
+logger = logging.getLogger(__name__)
+
+ACK_MODES = ("accepted", "durable", "committed")
+
+_FRAME = struct.Struct(">IQI")
+_SEGMENT_SUFFIX = ".log"
+_CHECKPOINT = "checkpoint"
+# Committed flags are compacted once this many leading entries are settled.
+_COMPACT_AFTER = 1 << 16
+
+
+def _segment_name(first_seq: int) -> str:
+    return f"{first_seq:020d}{_SEGMENT_SUFFIX}"
+
+
+def _encode_frame(first_seq: int, records: Sequence[EventRecord]) -> bytes:
+    body = json.dumps(records, separators=(",", ":")).encode("utf-8")
+    return _FRAME.pack(len(body), first_seq, zlib.crc32(body)) + body
+
+
+def _read_frames(path: Path) -> Iterator[tuple[int, list, int]]:
+    """Yield ``(first_seq, rows, end_offset)`` until EOF or the first torn frame."""
+    with path.open("rb") as handle:
+        offset = 0
+        while True:
+            header = handle.read(_FRAME.size)
+            if len(header) < _FRAME.size:
+                return
+            length, first_seq, crc = _FRAME.unpack(header)
+            body = handle.read(length)
+            if len(body) < length or zlib.crc32(body) != crc:
+                return
+            offset += _FRAME.size + length
+            yield first_seq, json.loads(body), offset
+
+
+class IngestLog:
+    """Segmented write-ahead log for admitted events; see the module docstring."""
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        segment_bytes: int = 16 * 1024 * 1024,
+        group_commit_ms: float = 0.0,
+        checkpoint_ms: float = 1000.0,
+        fsync: bool = True,
+    ) -> None:
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._segment_bytes = max(1, segment_bytes)
+        self._linger = max(0.0, group_commit_ms) / 1000
+        self._checkpoint_interval = max(0.0, checkpoint_ms) / 1000
+        # Loop time before which watermark advances are not written out.
+        self._checkpoint_due = 0.0
+        self._fsync = fsync
+        self._checkpointed = self._read_checkpoint()
+        self._segments = sorted(
+            int(path.name[: -len(_SEGMENT_SUFFIX)])
+            for path in self._dir.glob("*" + _SEGMENT_SUFFIX)
+        )
+        self._next_seq = self._recover_tail()
+        # Next sequence number after the last frame on disk; owned by _sync.
+        self._written_seq = self._next_seq
+        # Frames not yet handed to the flusher: (first_seq, records).
+        self._buffer: list[tuple[int, Sequence[EventRecord]]] = []
+        self._durable_seq = self._next_seq - 1
+        self._waiters: list[tuple[int, asyncio.Future[None]]] = []
+        # committed[i] is 1 once sequence number committed_start + i reached the store.
+        self._watermark = self._checkpointed
+        self._committed_start = self._checkpointed
+        self._committed = bytearray(self._next_seq - self._checkpointed)
+        self._file = None
+        self._file_size = 0
+        self._wake = asyncio.Event()
+        self._flusher: asyncio.Task[None] | None = None
+        self._closing = False
+        self.flushes = 0
+
+    def _read_checkpoint(self) -> int:
+        try:
+            return int((self._dir / _CHECKPOINT).read_text().strip() or 0)
+        except (OSError, ValueError):
+            # A missing or torn checkpoint only means replaying more than needed.
+            return 0
+
+    def _recover_tail(self) -> int:
+        """Return the next sequence number, cutting a torn frame off the last segment."""
+        if not self._segments:
+            return self._checkpointed
+        last = self._dir / _segment_name(self._segments[-1])
+        next_seq = self._segments[-1]
+        valid = 0
+        for first_seq, rows, offset in _read_frames(last):
+            next_seq = first_seq + len(rows)
+            valid = offset
+        if last.stat().st_size != valid:
+            logger.warning("Truncating torn ingest log tail in %s at byte %s", last.name, valid)
+            with last.open("r+b") as handle:
+                handle.truncate(valid)
+        return max(next_seq, self._checkpointed)
+
+    @property
+    def watermark(self) -> int:
+        """Every sequence number below this one is committed to the store."""
+        return self._watermark
+
+    def pending(self) -> int:
+        """Logged events that are not yet known to be committed."""
+        return self._next_seq - self._watermark
+
+    def replay(self, chunk_size: int = 1000) -> Iterator[list[tuple[int, EventRecord]]]:
+        """Yield logged ``(seq, record)`` at or above the checkpoint, in order."""
+        chunk: list[tuple[int, EventRecord]] = []
+        for first in list(self._segments):
+            for first_seq, rows, _ in _read_frames(self._dir / _segment_name(first)):
+                for offset, (topic, event_id, ts_us, source, payload) in enumerate(rows):
+                    seq = first_seq + offset
+                    if seq < self._checkpointed or seq >= self._next_seq:
+                        continue
+                    chunk.append((seq, (topic, event_id, ts_us, source, payload)))
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+        if chunk:
+            yield chunk
+
+    def start(self) -> None:
+        if self._flusher is None:
+            self._closing = False
+            self._flusher = asyncio.create_task(self._run(), name="ingest-log-flusher")
+
+    async def close(self) -> None:
+        """Flush what is buffered, write a final checkpoint and stop the flusher."""
+        if self._flusher is not None:
+            self._closing = True
+            self._wake.set()
+            await self._flusher
+            self._flusher = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, records: Sequence[EventRecord]) -> int:
+        """Buffer one frame and return the sequence number of its first event."""
+        first_seq = self._next_seq
+        self._next_seq += len(records)
+        self._committed.extend(bytes(len(records)))
+        self._buffer.append((first_seq, records))
+        self._wake.set()
+        return first_seq
+
+    async def wait_durable(self, seq: int) -> None:
+        """Wait until the frame holding ``seq`` has been written and synced."""
+        if seq <= self._durable_seq:
+            return
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append((seq, future))
+        await future
+
+    def mark_committed(self, seqs: Sequence[int]) -> None:
+        """Record that these sequence numbers are now stored in the ``DedupStore``."""
+        committed = self._committed
+        start = self._committed_start
+        for seq in seqs:
+            committed[seq - start] = 1
+        settled = committed.find(0, self._watermark - start)
+        if settled < 0:
+            settled = len(committed)
+        if start + settled != self._watermark:
+            self._watermark = start + settled
+            self._wake.set()
+        if settled >= _COMPACT_AFTER and settled * 2 >= len(committed):
+            del committed[:settled]
+            self._committed_start += settled
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            timeout = None
+            if self._watermark != self._checkpointed:
+                # Wake up by itself once the pending checkpoint is due.
+                timeout = max(0.0, self._checkpoint_due - loop.time())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._linger and not self._closing:
+                await asyncio.sleep(self._linger)
+            frames, self._buffer = self._buffer, []
+            durable = self._next_seq - 1
+            due = self._closing or loop.time() >= self._checkpoint_due
+            watermark = self._watermark if due else self._checkpointed
+            checkpoint = watermark != self._checkpointed
+            if frames or checkpoint:
+                try:
+                    await asyncio.to_thread(self._sync, frames, watermark)
+                except Exception as exc:
+                    logger.exception("Ingest log write failed")
+                    self._fail_waiters(exc)
+                else:
+                    self._durable_seq = durable
+                    self._release_waiters()
+                if checkpoint:
+                    self._checkpoint_due = loop.time() + self._checkpoint_interval
+            if self._closing and not self._buffer:
+                return
+
+    def _release_waiters(self) -> None:
+        durable = self._durable_seq
+        waiting = []
+        for seq, future in self._waiters:
+            if seq <= durable:
+                if not future.done():
+                    future.set_result(None)
+            else:
+                waiting.append((seq, future))
+        self._waiters = waiting
+
+    def _fail_waiters(self, exc: BaseException) -> None:
+        waiters, self._waiters = self._waiters, []
+        for _, future in waiters:
+            if not future.done():
+                future.set_exception(exc)
+
+    def _sync(self, frames: list[tuple[int, Sequence[EventRecord]]], watermark: int) -> None:
+        """Flusher thread: append frames, fsync, then checkpoint and drop old segments."""
+        if frames:
+            for first_seq, records in frames:
+                if self._file is None or self._file_size >= self._segment_bytes:
+                    self._roll(first_seq)
+                data = _encode_frame(first_seq, records)
+                self._file.write(data)
+                self._file_size += len(data)
+                self._written_seq = first_seq + len(records)
+            self._file.flush()
+            if self._fsync:
+                os.fsync(self._file.fileno())
+            self.flushes += 1
+        if watermark != self._checkpointed:
+            self._checkpoint(watermark)
+
+    def _roll(self, first_seq: int) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = (self._dir / _segment_name(first_seq)).open("ab")
+        self._file_size = self._file.tell()
+        if first_seq not in self._segments:
+            self._segments.append(first_seq)
+            if self._fsync:
+                # Make the new directory entry itself durable.
+                dir_fd = os.open(self._dir, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+
+    def _checkpoint(self, watermark: int) -> None:
+        tmp = self._dir / (_CHECKPOINT + ".tmp")
+        tmp.write_text(str(watermark))
+        os.replace(tmp, self._dir / _CHECKPOINT)
+        self._checkpointed = watermark
+        # A sealed segment is obsolete once the next one starts at or below the
+        # watermark; the active one only once everything written is committed.
+        segments = self._segments
+        drop = 0
+        while drop + 1 < len(segments) and segments[drop + 1] <= watermark:
+            drop += 1
+        if segments and drop == len(segments) - 1 and watermark >= self._written_seq:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            drop = len(segments)
+        for first in segments[:drop]:
+            (self._dir / _segment_name(first)).unlink(missing_ok=True)
+        del segments[:drop]
@@ -1,31 +1,97 @@
 """FastAPI application entrypoint for the event aggregator."""
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
-from typing import Any
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator
 
-from fastapi import Body, FastAPI, HTTPException, Query
+from fastapi import (
+    Body,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
+from .admission import AdmissionRejected
+from .cluster import (
+    FORWARDED_HEADER,
+    HANDOFF_HEADER,
+    ClusterAggregator,
+    PeerUnavailable,
+    create_cluster,
+)
 from .config import Settings
-from .dedup_store import DedupStore
-from .models import PublishRequest
-from .service import AggregatorService
+from .dedup_store import ExportRow
+from .fanout import Notice
+from .ingest_log import ACK_MODES
+from .models import Event, PublishRequest, parse_event_line
+from .profiling import PROFILE_MODES, PROFILE_SORT_KEYS, Profiler, ProfilerBusy
+from .response_cache import CachedResponse, ResponseCache, etag_matches, make_etag
+from .service import AggregatorService, create_service, decode_cursor
+from .snapshot import EXPORT_CHUNK, export_line, parse_export_line
+from .tracing import Tracer, current_trace
+from .writer import RemoteAggregator, run_with_frontends
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+NDJSON_SUBMIT_CHUNK = 500
+MAX_REPORTED_ERRORS = 100
+ACK_PATTERN = "^(" + "|".join(ACK_MODES) + ")$"
+PROFILE_MODE_PATTERN = "^(" + "|".join(PROFILE_MODES) + ")$"
+PROFILE_SORT_PATTERN = "^(" + "|".join(PROFILE_SORT_KEYS) + ")$"
+
 
 def create_app(settings: Settings | None = None) -> FastAPI:
     settings = settings or Settings()
-    dedup_store = DedupStore(settings.resolved_database_path())
-    aggregator = AggregatorService(
-        dedup_store,
-        worker_count=settings.worker_count,
-        queue_maxsize=settings.queue_maxsize,
+    cluster: ClusterAggregator | None = None
+    if settings.cluster_peers:
+        if settings.writer_socket or settings.frontend_processes > 1:
+            raise ValueError("CLUSTER_PEERS needs FRONTEND_PROCESSES=1 and no WRITER_SOCKET")
+        local, dedup_store = create_service(settings)
+        cluster = create_cluster(local, settings)
+        aggregator: AggregatorService | RemoteAggregator | ClusterAggregator = cluster
+        close_store = dedup_store.close
+    elif settings.writer_socket:
+        # Front-end process: parse and validate here, the writer does the rest.
+        aggregator = RemoteAggregator(
+            Path(settings.writer_socket),
+            metrics_enabled=settings.metrics_enabled,
+            subscriber_buffer=settings.subscriber_buffer,
+            slow_consumer_policy=settings.slow_consumer_policy,
+        )
+        close_store = None
+    else:
+        aggregator, dedup_store = create_service(settings)
+        close_store = dedup_store.close
+    publish_latency = aggregator.metrics.publish_latency
+    local = cluster.local if cluster is not None else aggregator
+    # Traces follow events into the workers, so only an in-process service samples.
+    tracer = local.tracer if isinstance(local, AggregatorService) else Tracer()
+    if settings.publish_ack not in ACK_MODES:
+        raise ValueError(f"unknown PUBLISH_ACK mode: {settings.publish_ack}")
+    default_ack = settings.publish_ack
+    response_cache = ResponseCache(
+        settings.response_cache_size, settings.response_cache_max_bytes
     )
 
     app = FastAPI(title="Event Aggregator", version="1.0.0")
     app.state.aggregator = aggregator
+    app.state.response_cache = response_cache
     app.state.settings = settings
+    app.state.close_store = close_store
 
     @app.on_event("startup")
     async def on_startup() -> None:
@@ -34,36 +100,557 @@ def create_app(settings: Settings | None = None) -> FastAPI:
     @app.on_event("shutdown")
     async def on_shutdown() -> None:
         await aggregator.stop()
+        if close_store is not None:
+            close_store()
+
+    @app.exception_handler(AdmissionRejected)
+    async def admission_rejected(_: Request, exc: AdmissionRejected) -> JSONResponse:
+        return JSONResponse(
+            {"detail": str(exc), "reason": exc.reason, "accepted": exc.accepted},
+            status_code=429,
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+    @app.exception_handler(PeerUnavailable)
+    async def peer_unavailable(_: Request, exc: PeerUnavailable) -> JSONResponse:
+        return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+    def _scope(request: Request) -> AggregatorService | RemoteAggregator | ClusterAggregator:
+        """Requests forwarded by a cluster peer are answered from this node alone."""
+        if cluster is not None and FORWARDED_HEADER in request.headers:
+            return cluster.local
+        return aggregator
+
+    def _ingest_scope(request: Request) -> Any:
+        """Like ``_scope``, but forwarded batches pass the cluster's handoff read-through."""
+        if cluster is not None and FORWARDED_HEADER in request.headers:
+            return cluster.owner_scope
+        return aggregator
 
     @app.post("/publish")
-    async def publish(payload: Any = Body(...)) -> dict[str, int]:
+    async def publish(
+        request: Request,
+        response: Response,
+        payload: Any = Body(...),
+        ack: str | None = Query(default=None, pattern=ACK_PATTERN),
+        sync: bool = Query(default=False),
+    ) -> dict[str, Any]:
+        started = time.perf_counter()
+        trace = tracer.start("publish?sync" if sync else "publish", started)
         try:
-            request = PublishRequest.from_payload(payload)
+            batch = PublishRequest.from_payload(payload)
         except ValueError as exc:
             raise HTTPException(status_code=422, detail=str(exc)) from exc
-        await aggregator.submit_batch(request.events)
-        return {"accepted": len(request.events)}
+        target = _ingest_scope(request)
+        if trace is not None:
+            trace.events = len(batch.events)
+            trace.span("parse", started, time.perf_counter(), trace.events)
+            token = current_trace.set(trace)
+            response.headers["X-Trace-Id"] = str(trace.trace_id)
+        if sync:
+            # Committed before answering, with a verdict per event; ``ack`` is moot.
+            try:
+                results = await target.submit_sync(batch.events)
+            finally:
+                publish_latency.observe(time.perf_counter() - started)
+                if trace is not None:
+                    current_trace.reset(token)
+                    trace.seal()
+            return {
+                "accepted": len(results),
+                "duplicates": results.count(False),
+                "results": ["new" if is_new else "duplicate" for is_new in results],
+            }
+        try:
+            accepted = await target.submit_batch(batch.events, ack or default_ack)
+        finally:
+            publish_latency.observe(time.perf_counter() - started)
+            if trace is not None:
+                current_trace.reset(token)
+                trace.seal()
+        result = {"accepted": accepted}
+        if accepted < len(batch.events):
+            result["rejected"] = len(batch.events) - accepted
+            response.headers["Retry-After"] = str(target.retry_after())
+        return result
+
+    async def _submit_chunk(target, events: list[Event], accepted_before: int, ack: str) -> int:
+        try:
+            accepted = await target.submit_batch(events, ack)
+        except AdmissionRejected as exc:
+            exc.accepted += accepted_before
+            raise
+        if accepted < len(events):
+            raise AdmissionRejected("capacity", target.retry_after(), accepted_before + accepted)
+        return accepted
+
+    @app.post("/publish/ndjson")
+    async def publish_ndjson(
+        request: Request, ack: str | None = Query(default=None, pattern=ACK_PATTERN)
+    ) -> JSONResponse:
+        """Ingest newline-delimited events straight from the request body stream."""
+        started = time.perf_counter()
+        try:
+            return await _publish_ndjson(request, ack or default_ack)
+        finally:
+            publish_latency.observe(time.perf_counter() - started)
+
+    async def _publish_ndjson(request: Request, ack: str) -> JSONResponse:
+        target = _ingest_scope(request)
+        accepted = 0
+        rejected = 0
+        errors: list[dict[str, Any]] = []
+        pending: list[Event] = []
+        line_no = 0
+
+        def consume(line: bytes) -> None:
+            nonlocal rejected
+            if not line.strip():
+                return
+            try:
+                pending.append(parse_event_line(line))
+            except ValueError as exc:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_no, "error": str(exc)})
+
+        async for line in _iter_lines(request.stream()):
+            line_no += 1
+            consume(line)
+            if len(pending) >= NDJSON_SUBMIT_CHUNK:
+                accepted += await _submit_chunk(target, pending, accepted, ack)
+                pending = []
+        if pending:
+            accepted += await _submit_chunk(target, pending, accepted, ack)
+        status_code = 422 if rejected and not accepted else 200
+        return JSONResponse(
+            {"accepted": accepted, "rejected": rejected, "errors": errors},
+            status_code=status_code,
+        )
+
+    @app.get("/events", response_model=None)
+    async def list_events(
+        request: Request,
+        response: Response,
+        topic: str | None = Query(default=None),
+        limit: int | None = Query(default=None, ge=1, le=10000),
+        cursor: str | None = Query(default=None),
+        format: str | None = Query(default=None, pattern="^(json|ndjson)$"),
+        source: str | None = Query(default=None),
+        since: datetime | None = Query(default=None),
+        until: datetime | None = Query(default=None),
+    ) -> Response:
+        filters = {"source": source, "since": since, "until": until}
+        target = _scope(request)
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+        wants_ndjson = format == "ndjson" or (
+            format is None and NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+        )
+        # Read the version before the rows: a commit racing with the query can
+        # only make the body newer than its ETag, never older.
+        version = await target.events_version(topic)
+        key = ("events", topic, limit, cursor, wants_ndjson, source, since, until)
+        etag = make_etag(key, version)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            response_cache.record_not_modified()
+            return Response(status_code=304, headers={"ETag": etag})
+        if wants_ndjson:
+            return StreamingResponse(
+                target.stream_events(topic, cursor, limit, **filters),
+                media_type=NDJSON_MEDIA_TYPE,
+                headers={"ETag": etag},
+            )
+        cached = response_cache.get((key, version))
+        if cached is None:
+            headers = {"ETag": etag}
+            if limit is None and cursor is None:
+                events = await target.get_events(topic, **filters)
+            else:
+                events, next_cursor = await target.get_events_page(
+                    topic, cursor, limit or 100, **filters
+                )
+                if next_cursor:
+                    headers["X-Next-Cursor"] = next_cursor
+            body = JSONResponse(jsonable_encoder([event.model_dump() for event in events])).body
+            cached = CachedResponse(body, headers, time.monotonic())
+            response_cache.put((key, version), cached)
+        return Response(cached.body, media_type="application/json", headers=cached.headers)
+
+    def _subscription(topic: str | None, cursor: str | None):
+        if cursor:
+            decode_cursor(cursor)
+        return aggregator.subscribe(
+            topic,
+            cursor,
+            backfill_limit=settings.subscribe_backfill_max,
+            heartbeat=settings.subscribe_heartbeat_seconds,
+        )
+
+    @app.get("/events/subscribe")
+    async def subscribe_events(
+        request: Request,
+        topic: str | None = Query(default=None),
+        cursor: str | None = Query(default=None),
+    ) -> StreamingResponse:
+        """Server-Sent Events stream of newly committed events."""
+        # EventSource reconnects with the id of the last event it saw.
+        cursor = cursor or request.headers.get("last-event-id") or None
+        try:
+            batches = _subscription(topic, cursor)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+        async def frames():
+            async for items in batches:
+                if not items:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield b"".join(
+                    f"event: {item.kind}\ndata: {json.dumps(item.data)}\n\n".encode("utf-8")
+                    if isinstance(item, Notice)
+                    else item.sse
+                    for item in items
+                )
+
+        return StreamingResponse(
+            frames(),
+            media_type=SSE_MEDIA_TYPE,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.websocket("/events/ws")
+    async def events_websocket(
+        websocket: WebSocket, topic: str | None = None, cursor: str | None = None
+    ) -> None:
+        """WebSocket variant: one JSON text message per event or notice."""
+        try:
+            batches = _subscription(topic, cursor)
+        except ValueError as exc:
+            await websocket.close(code=1008, reason=str(exc))
+            return
+        await websocket.accept()
+
+        async def pump() -> None:
+            async for items in batches:
+                for item in items:
+                    if isinstance(item, Notice):
+                        await websocket.send_text(json.dumps({"notice": item.kind, **item.data}))
+                    else:
+                        await websocket.send_text(item.ws)
+                    if isinstance(item, Notice) and item.kind == "disconnected":
+                        # 1013: try again later, resuming from the last cursor.
+                        await websocket.close(code=1013)
+                        return
 
-    @app.get("/events")
-    async def list_events(topic: str | None = Query(default=None)) -> list[dict[str, Any]]:
-        events = await aggregator.get_events(topic)
-        return [event.dict() for event in events]
+        async def watch() -> None:
+            # Clients only listen; a receive returning means they went away.
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        tasks = [asyncio.create_task(pump()), asyncio.create_task(watch())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     @app.get("/stats")
-    async def get_stats() -> dict[str, Any]:
-        stats = await aggregator.get_stats()
-        return stats.dict()
+    async def get_stats(request: Request) -> Response:
+        target = _scope(request)
+        version = await target.stats_version()
+        etag = make_etag("stats", version)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            response_cache.record_not_modified()
+            return Response(status_code=304, headers={"ETag": etag})
+        cached = response_cache.get(("stats", version))
+        if cached is None:
+            stats = jsonable_encoder((await target.get_stats()).model_dump())
+            uptime = stats.pop("uptime_seconds")
+            del stats["response_cache"]
+            # Cache everything but the two fields that move on their own and
+            # fill them in per request.
+            cached = CachedResponse(b"", {"ETag": etag}, time.monotonic() - uptime, stats)
+            response_cache.put(("stats", version), cached)
+        assert cached.data is not None
+        return JSONResponse(
+            {
+                **cached.data,
+                "uptime_seconds": time.monotonic() - cached.rendered_at,
+                "response_cache": response_cache.stats(),
+            },
+            headers=cached.headers,
+        )
+
+    @app.get("/stats/rollups")
+    async def get_rollups(
+        request: Request,
+        topic: str | None = Query(default=None),
+        since: datetime | None = Query(default=None),
+        until: datetime | None = Query(default=None),
+        series: bool = Query(default=True),
+    ) -> Response:
+        """Events per minute per topic, per-source totals and duplicate rates."""
+        target = _scope(request)
+        # Every commit, import, release and downsampling pass bumps this too.
+        version = await target.stats_version()
+        key = ("rollups", topic, since, until, series)
+        etag = make_etag(key, version)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            response_cache.record_not_modified()
+            return Response(status_code=304, headers={"ETag": etag})
+        cached = response_cache.get((key, version))
+        if cached is None:
+            rollups = await target.get_rollups(topic, since, until, series)
+            body = JSONResponse(jsonable_encoder(rollups.model_dump())).body
+            cached = CachedResponse(body, {"ETag": etag}, time.monotonic())
+            response_cache.put((key, version), cached)
+        return Response(cached.body, media_type="application/json", headers=cached.headers)
+
+    @app.get("/metrics")
+    async def metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            await aggregator.render_metrics(), media_type=METRICS_MEDIA_TYPE
+        )
+
+    # Admin routes need the store in-process: in multi-process mode use
+    # ``python -m src.snapshot`` against the writer's database instead.
+    if settings.admin_endpoints and isinstance(local, AggregatorService):
+        _add_admin_routes(app, local, settings)
+    if settings.debug_endpoints:
+        _add_debug_routes(app, tracer)
+    if cluster is not None:
+        _add_cluster_routes(app, cluster)
 
     return app
 
 
+def _add_admin_routes(app: FastAPI, aggregator: AggregatorService, settings: Settings) -> None:
+    @app.post("/admin/snapshot")
+    async def create_snapshot() -> dict[str, Any]:
+        """Hot backup of the dedup store into ``SNAPSHOT_DIR``."""
+        database = settings.resolved_database_path()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        target = settings.resolved_snapshot_dir() / f"{database.stem}-{stamp}{database.suffix}"
+        started = time.perf_counter()
+        pages = await aggregator.snapshot(target)
+        return {
+            "path": str(target),
+            "pages": pages,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    @app.get("/admin/export")
+    async def export_events(
+        topic: str | None = Query(default=None),
+        since: datetime | None = Query(default=None),
+        until: datetime | None = Query(default=None),
+    ) -> StreamingResponse:
+        """Stream stored events (with ``processed_at``) as NDJSON for ``/admin/import``.
+
+        Dedup keys whose event was pruned come as key-only lines (null
+        ``timestamp``, ``source`` and ``payload``) unless ``since``/``until``
+        is given. Counters and rollups are not exported; use ``/admin/snapshot``.
+        """
+
+        async def lines():
+            async for rows in aggregator.export_chunks(topic, since, until):
+                yield b"".join(export_line(row) for row in rows)
+
+        return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+    @app.post("/admin/import")
+    async def import_events(request: Request) -> JSONResponse:
+        """Load an NDJSON export, one transaction per chunk; known keys are skipped."""
+        imported = 0
+        parsed = 0
+        errors: list[dict[str, Any]] = []
+        rejected = 0
+        chunk: list[ExportRow] = []
+        line_no = 0
+
+        def consume(line: bytes) -> None:
+            nonlocal rejected
+            if not line.strip():
+                return
+            try:
+                chunk.append(parse_export_line(line))
+            except ValueError as exc:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_no, "error": str(exc)})
+
+        async for line in _iter_lines(request.stream()):
+            line_no += 1
+            consume(line)
+            if len(chunk) >= EXPORT_CHUNK:
+                parsed += len(chunk)
+                imported += await aggregator.import_rows(chunk)
+                chunk = []
+        if chunk:
+            parsed += len(chunk)
+            imported += await aggregator.import_rows(chunk)
+        return JSONResponse(
+            {
+                "imported": imported,
+                "skipped": parsed - imported,
+                "rejected": rejected,
+                "errors": errors,
+            },
+            status_code=422 if rejected and not parsed else 200,
+        )
+
+
+def _add_debug_routes(app: FastAPI, tracer: Tracer) -> None:
+    """Traces and on-demand profiles; they expose internals, keep them private."""
+    profiler = Profiler()
+
+    @app.get("/debug/traces")
+    async def list_traces(limit: int = Query(default=20, ge=1, le=1000)) -> dict[str, Any]:
+        """The slowest sampled ``/publish`` traces kept so far, slowest first."""
+        return {"tracer": tracer.stats(), "traces": tracer.slowest(limit)}
+
+    @app.delete("/debug/traces")
+    async def clear_traces() -> dict[str, Any]:
+        tracer.clear()
+        return {"tracer": tracer.stats()}
+
+    @app.get("/debug/profile")
+    async def profile(
+        seconds: float = Query(default=5.0, gt=0, le=profiler.max_seconds),
+        mode: str = Query(default="cprofile", pattern=PROFILE_MODE_PATTERN),
+        sort: str = Query(default="cumulative", pattern=PROFILE_SORT_PATTERN),
+        limit: int = Query(default=50, ge=1, le=1000),
+    ) -> PlainTextResponse:
+        """Profile this process for ``seconds`` while it keeps serving traffic."""
+        try:
+            report = await profiler.profile(seconds, mode, sort=sort, limit=limit)
+        except ProfilerBusy as exc:
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+        return PlainTextResponse(report)
+
+
+def _add_cluster_routes(app: FastAPI, cluster: ClusterAggregator) -> None:
+    """Node-to-node endpoints; keep them on the cluster's private network."""
+
+    @app.get("/cluster/ring")
+    async def get_ring() -> dict[str, Any]:
+        return cluster.ring_info()
+
+    @app.put("/cluster/ring")
+    async def put_ring(body: dict[str, Any] = Body(...)) -> dict[str, Any]:
+        """Switch routing to a new membership (``{"nodes": [...], "epoch": n}``).
+
+        An optional ``previous`` list names the membership being replaced.
+        """
+        nodes, epoch, previous = body.get("nodes"), body.get("epoch"), body.get("previous")
+        if (
+            not isinstance(nodes, list)
+            or not isinstance(epoch, int)
+            or not isinstance(previous, (list, type(None)))
+        ):
+            raise HTTPException(
+                status_code=422,
+                detail="expected {nodes: [url, ...], epoch: int, previous?: [url, ...]}",
+            )
+        try:
+            cluster.set_ring(nodes, epoch, previous)
+        except ValueError as exc:
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+        return cluster.ring_info()
+
+    @app.post("/cluster/rebalance")
+    async def rebalance() -> dict[str, Any]:
+        """Start handing off the keys this node no longer owns."""
+        cluster.rebalance()
+        return cluster.ring_info()
+
+    @app.post("/cluster/import")
+    async def import_handoff(request: Request) -> dict[str, int]:
+        """Store rows handed off by their previous owner (``/admin/export`` format)."""
+        body = await request.body()
+        try:
+            rows = [parse_export_line(line) for line in body.splitlines() if line.strip()]
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+        imported = await cluster.local.import_rows(rows)
+        return {"imported": imported, "skipped": len(rows) - imported}
+
+    @app.post("/cluster/lookup")
+    async def lookup(
+        keys: list[tuple[str, str]] = Body(...), epoch: int = Query(default=0)
+    ) -> Response:
+        """Rows for moved keys this node may not have handed off yet (export format)."""
+        rows = await cluster.local.export_keys(keys)
+        return Response(
+            b"".join(export_line(row) for row in rows),
+            media_type=NDJSON_MEDIA_TYPE,
+            headers={HANDOFF_HEADER: "done" if cluster.handoff_finished(epoch) else "pending"},
+        )
+
+    @app.post("/cluster/handoff-done")
+    async def handoff_done(body: dict[str, Any] = Body(...)) -> dict[str, Any]:
+        """A node of the previous ring finished its handoff (``{"node": url, "epoch": n}``)."""
+        node, epoch = body.get("node"), body.get("epoch")
+        if not isinstance(node, str) or not isinstance(epoch, int):
+            raise HTTPException(status_code=422, detail="expected {node: url, epoch: int}")
+        cluster.peer_handed_off(node, epoch)
+        return cluster.ring_info()
+
+    @app.get("/cluster/versions")
+    async def versions(topic: str | None = Query(default=None)) -> dict[str, str]:
+        """This node's ``/events`` and ``/stats`` versions, for cluster-wide ETags."""
+        return {
+            "events": await cluster.local.events_version(topic),
+            "stats": await cluster.local.stats_version(),
+        }
+
+
 app = create_app()
 
 
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream on newlines; a trailing line without one is yielded too.
+
+    The parts of a line spanning many network chunks are joined once, so a
+    long line costs linear time however small the chunks are.
+    """
+    parts: list[bytes] = []
+    async for chunk in chunks:
+        if b"\n" not in chunk:
+            if chunk:
+                parts.append(chunk)
+            continue
+        first, *lines, last = chunk.split(b"\n")
+        parts.append(first)
+        yield b"".join(parts)
+        for line in lines:
+            yield line
+        parts = [last] if last else []
+    if parts:
+        yield b"".join(parts)
+
+
 def main() -> None:
     import uvicorn
 
-    uvicorn.run("src.main:app", host="0.0.0.0", port=8080, reload=False)
+    settings = app.state.settings
+    if settings.frontend_processes > 1 and not settings.writer_socket:
+        run_with_frontends(app.state.aggregator, app.state.close_store, settings)
+        return
+    uvicorn.run(
+        "src.main:app",
+        host=settings.http_host,
+        port=settings.http_port,
+        reload=False,
+        workers=settings.frontend_processes if settings.frontend_processes > 1 else None,
+    )
 
 
 if __name__ == "__main__":
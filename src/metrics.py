@@ -0,0 +1,246 @@
+"""Minimal Prometheus text-format instruments for the ingest pipeline.
+
+Instruments are updated only from the event loop thread (store timings are
+taken on the store threads but recorded once the result is back on the loop),
+so they are plain attribute updates without locks. Histograms use fixed bucket
+bounds and a ``bisect`` per observation; batch-oriented call sites use
+``observe_many``.
+"""
+from __future__ import annotations
+
+import bisect
+from collections import Counter as _Tally
+from typing import Callable, Iterable, Sequence
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: dict[str, str]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(val)}"' for key, val in pairs.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help = help_text
+        self._bounds = tuple(buckets)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self._sum += value
+
+    def observe_many(self, values: Iterable[float]) -> None:
+        counts = self._counts
+        bounds = self._bounds
+        total = 0.0
+        for value in values:
+            counts[bisect.bisect_left(bounds, value)] += 1
+            total += value
+        self._sum += total
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def total(self) -> float:
+        return self._sum
+
+    def render(self) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self._bounds, float("inf")), self._counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{_number(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_number(self._sum)}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, optionally split by one label."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label: str | None = None) -> None:
+        self.name = name
+        self.help = help_text
+        self._label = label
+        self._values: dict[str, float] = {}
+
+    def inc(self, amount: float = 1.0, label_value: str = "") -> None:
+        self._values[label_value] = self._values.get(label_value, 0.0) + amount
+
+    def inc_each(self, label_values: Iterable[str]) -> None:
+        """Add one per occurrence of each label value."""
+        values = self._values
+        for key, amount in _Tally(label_values).items():
+            values[key] = values.get(key, 0.0) + amount
+
+    def value(self, label_value: str = "") -> float:
+        return self._values.get(label_value, 0.0)
+
+    def render(self) -> list[str]:
+        if self._label is None:
+            return [f"{self.name} {_number(self._values.get('', 0.0))}"]
+        return [
+            f"{self.name}{_labels({self._label: key})} {_number(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge:
+    """Gauge read at scrape time from a callback returning ``(labels, value)`` pairs."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        collect: Callable[[], Iterable[tuple[dict[str, str], float]]],
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self._collect = collect
+
+    def render(self) -> list[str]:
+        return [f"{self.name}{_labels(labels)} {_number(value)}" for labels, value in self._collect()]
+
+
+class _NullInstrument:
+    """Stand-in used when metrics are disabled; every update is a no-op."""
+
+    kind = "untyped"
+    count = 0
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def observe_many(self, values: Iterable[float]) -> None:
+        pass
+
+    def inc(self, amount: float = 1.0, label_value: str = "") -> None:
+        pass
+
+    def inc_each(self, label_values: Iterable[str]) -> None:
+        pass
+
+    def value(self, label_value: str = "") -> float:
+        return 0.0
+
+    def render(self) -> list[str]:
+        return []
+
+
+class IngestMetrics:
+    """Instruments covering the publish → queue → store pipeline."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._gauges: list[Gauge] = []
+        if not enabled:
+            null = _NullInstrument()
+            self.publish_latency = self.queue_wait = self.store_latency = null
+            self.commit_batch_size = self.topic_events = null
+            self.store_queue_wait = self.store_read_queue_wait = null
+            self.store_coalesced_calls = self.loop_lag = null
+            return
+        self.publish_latency = Histogram(
+            "aggregator_publish_latency_seconds",
+            "HTTP publish handler latency.",
+            LATENCY_BUCKETS,
+        )
+        self.queue_wait = Histogram(
+            "aggregator_queue_wait_seconds",
+            "Time an event waits between submit and worker pickup.",
+            LATENCY_BUCKETS,
+        )
+        self.store_latency = Histogram(
+            "aggregator_store_seconds",
+            "Wall time of one mark_processed_many store call.",
+            LATENCY_BUCKETS,
+        )
+        self.store_queue_wait = Histogram(
+            "aggregator_store_queue_wait_seconds",
+            "Time a write waits for the store writer thread.",
+            LATENCY_BUCKETS,
+        )
+        self.store_read_queue_wait = Histogram(
+            "aggregator_store_read_queue_wait_seconds",
+            "Time a read waits for a store reader thread.",
+            LATENCY_BUCKETS,
+        )
+        self.store_coalesced_calls = Histogram(
+            "aggregator_store_coalesced_calls",
+            "Worker batches merged into one store transaction.",
+            BATCH_SIZE_BUCKETS,
+        )
+        self.loop_lag = Histogram(
+            "aggregator_event_loop_lag_seconds",
+            "How late the event loop woke a periodic timer.",
+            LATENCY_BUCKETS,
+        )
+        self.commit_batch_size = Histogram(
+            "aggregator_commit_batch_size",
+            "Events per committed worker batch.",
+            BATCH_SIZE_BUCKETS,
+        )
+        self.topic_events = Counter(
+            "aggregator_topic_events_total", "Unique events committed per topic.", label="topic"
+        )
+
+    def add_gauge(
+        self,
+        name: str,
+        help_text: str,
+        collect: Callable[[], Iterable[tuple[dict[str, str], float]]],
+    ) -> None:
+        if self.enabled:
+            self._gauges.append(Gauge(name, help_text, collect))
+
+    def render(self) -> str:
+        """Render every instrument in the Prometheus text exposition format."""
+        if not self.enabled:
+            return ""
+        lines: list[str] = []
+        instruments = [
+            self.publish_latency,
+            self.queue_wait,
+            self.store_latency,
+            self.store_queue_wait,
+            self.store_read_queue_wait,
+            self.store_coalesced_calls,
+            self.commit_batch_size,
+            self.topic_events,
+            self.loop_lag,
+            *self._gauges,
+        ]
+        for instrument in instruments:
+            lines.append(f"# HELP {instrument.name} {instrument.help}")
+            lines.append(f"# TYPE {instrument.name} {instrument.kind}")
+            lines.extend(instrument.render())
+        return "\n".join(lines) + "\n"
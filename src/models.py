@@ -1,10 +1,35 @@
 """Domain models and DTOs for the aggregator service."""
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Any, List
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_epoch_micros(value: datetime) -> int:
+    """Convert a datetime to integer microseconds since the epoch (naive = UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_micros(value: int) -> datetime:
+    """Inverse of :func:`to_epoch_micros`, returning an aware UTC datetime."""
+    return _EPOCH + timedelta(microseconds=value)
+
+
+# Compiled serializer for payload dicts; several times faster than json.dumps.
+# NaN/Infinity are written as the bare constants json.loads accepted them as.
+_PAYLOAD_JSON = TypeAdapter(Dict[str, Any], config=ConfigDict(ser_json_inf_nan="constants"))
+
+
+def encode_payload(payload: Dict[str, Any]) -> str:
+    """Compact JSON text of an event payload, as stored and served back."""
+    return _PAYLOAD_JSON.dump_json(payload).decode("utf-8")
 
 
 class Event(BaseModel):
@@ -42,6 +67,23 @@ class PublishRequest(BaseModel):
         raise ValueError("publish payload must be an object or an array of objects")
 
 
+def parse_event_line(line: bytes | str) -> Event:
+    """Validate one NDJSON line into an :class:`Event`.
+
+    Parsing and validation both run inside pydantic-core's compiled JSON
+    validator, skipping the intermediate Python dict that ``json.loads`` would
+    build. Raises ``ValueError`` with a compact description of the problems.
+    """
+    try:
+        return Event.model_validate_json(line)
+    except ValidationError as exc:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'event'}: {error['msg']}"
+            for error in exc.errors(include_url=False)
+        )
+        raise ValueError(problems) from None
+
+
 class Stats(BaseModel):
     """Service statistics model."""
 
@@ -50,6 +92,50 @@ class Stats(BaseModel):
     duplicate_dropped: int
     topics: List[str]
     uptime_seconds: float
+    prefilter: Dict[str, float] = Field(default_factory=dict)
+    queue_depths: List[int] = Field(default_factory=list)
+    admission: Dict[str, float] = Field(default_factory=dict)
+    retention: Dict[str, float] = Field(default_factory=dict)
+    ingest_log: Dict[str, float] = Field(default_factory=dict)
+    response_cache: Dict[str, float] = Field(default_factory=dict)
+    subscriptions: Dict[str, float] = Field(default_factory=dict)
+    cluster: Dict[str, float] = Field(default_factory=dict)
+
+
+class RollupTopic(BaseModel):
+    """Committed events and duplicate deliveries of one topic over a range."""
+
+    topic: str
+    events: int
+    duplicates: int
+    duplicate_rate: float
+
+
+class RollupSource(BaseModel):
+    """Per ``(topic, source)`` totals over a range, at hour resolution."""
+
+    topic: str
+    source: str
+    events: int
+    duplicates: int
+
+
+class RollupBucket(BaseModel):
+    """One rollup bucket of a topic; ``width_seconds`` grows as buckets age."""
+
+    topic: str
+    bucket: datetime
+    width_seconds: int
+    events: int
+    duplicates: int
+
+
+class Rollups(BaseModel):
+    """Response of ``/stats/rollups``."""
+
+    topics: List[RollupTopic]
+    sources: List[RollupSource]
+    series: List[RollupBucket] = Field(default_factory=list)
 
 
 class StoredEvent(BaseModel):
@@ -0,0 +1,154 @@
+"""Compact on-disk encoding for event payloads.
+
+Every stored payload BLOB starts with a one-byte header:
+
+* ``0x00`` – raw UTF-8 JSON (small payloads, or compression disabled)
+* ``0x01`` – zlib stream
+* ``0x02`` – 2-byte big-endian dictionary id followed by a zlib stream that was
+  compressed against that preset dictionary (``zdict``)
+
+Dictionaries live in the ``payload_dicts`` table and are never rewritten, so
+rows keep decoding after a newer dictionary becomes active.
+"""
+from __future__ import annotations
+
+import zlib
+from typing import Mapping, Sequence
+
+RAW = 0
+ZLIB = 1
+ZLIB_DICT = 2
+
+COMPRESSION_MODES = ("none", "zlib")
+
+# Payloads shorter than this gain nothing from deflate's framing overhead.
+MIN_COMPRESS_SIZE = 64
+
+# Dictionaries up to 8 KiB fit a 2**13 window; the smaller window and hash
+# table (memLevel 4) make the per-payload compressor copy markedly cheaper.
+_SMALL_WINDOW_BITS = 13
+_SMALL_MEM_LEVEL = 4
+
+
+class PayloadCodec:
+    """Encodes payload JSON into header-tagged BLOBs and back."""
+
+    def __init__(
+        self,
+        compression: str = "zlib",
+        level: int = 6,
+        dictionaries: Mapping[int, bytes] | None = None,
+    ) -> None:
+        if compression not in COMPRESSION_MODES:
+            raise ValueError(f"unknown payload compression: {compression}")
+        self.compression = compression
+        self._level = level
+        self._dictionaries: dict[int, bytes] = {}
+        # Priming a (de)compressor with a dictionary is most of the cost for
+        # small payloads, so primed objects are kept and copied per payload.
+        self._decompressors: dict[int, "zlib._Decompress"] = {}
+        self._compressor: "zlib._Compress | None" = None
+        self.active_dictionary: int | None = None
+        for dict_id in sorted(dictionaries or {}):
+            self.add_dictionary(dict_id, dictionaries[dict_id])
+
+    def add_dictionary(self, dict_id: int, data: bytes) -> None:
+        """Register a dictionary and use it for subsequent encodes."""
+        self._dictionaries[dict_id] = data
+        self._decompressors[dict_id] = zlib.decompressobj(zdict=data)
+        if len(data) <= 1 << _SMALL_WINDOW_BITS:
+            self._compressor = zlib.compressobj(
+                self._level, zlib.DEFLATED, _SMALL_WINDOW_BITS, _SMALL_MEM_LEVEL, zdict=data
+            )
+        else:
+            self._compressor = zlib.compressobj(self._level, zdict=data)
+        self.active_dictionary = dict_id
+
+    def encode(self, payload_json: str) -> bytes:
+        raw = payload_json.encode("utf-8")
+        if self.compression == "none" or len(raw) < MIN_COMPRESS_SIZE:
+            return b"\x00" + raw
+        dict_id = self.active_dictionary
+        if dict_id is None or self._compressor is None:
+            packed = b"\x01" + zlib.compress(raw, self._level)
+        else:
+            compressor = self._compressor.copy()
+            packed = (
+                b"\x02"
+                + dict_id.to_bytes(2, "big")
+                + compressor.compress(raw)
+                + compressor.flush()
+            )
+        return packed if len(packed) < len(raw) + 1 else b"\x00" + raw
+
+    def decode(self, blob: bytes) -> str:
+        kind = blob[0]
+        if kind == RAW:
+            return blob[1:].decode("utf-8")
+        if kind == ZLIB:
+            return zlib.decompress(blob[1:]).decode("utf-8")
+        if kind == ZLIB_DICT:
+            dict_id = int.from_bytes(blob[1:3], "big")
+            decompressor = self._decompressors[dict_id].copy()
+            return (decompressor.decompress(blob[3:]) + decompressor.flush()).decode("utf-8")
+        raise ValueError(f"unknown payload encoding {kind}")
+
+    def lazy(self, blob: bytes) -> "LazyPayload":
+        return LazyPayload(blob, self)
+
+
+class LazyPayload:
+    """A stored payload that is only decompressed when :meth:`decode` is called."""
+
+    __slots__ = ("_blob", "_codec")
+
+    def __init__(self, blob: bytes, codec: PayloadCodec) -> None:
+        self._blob = blob
+        self._codec = codec
+
+    def decode(self) -> str:
+        return self._codec.decode(self._blob)
+
+    @property
+    def stored_size(self) -> int:
+        return len(self._blob)
+
+
+class DecodedPayload:
+    """Payload text that is already decoded, with the :class:`LazyPayload` interface.
+
+    Rows forwarded from the writer process carry plain JSON text, since
+    dictionary ids are local to each store file.
+    """
+
+    __slots__ = ("_text",)
+
+    def __init__(self, text: str) -> None:
+        self._text = text
+
+    def decode(self) -> str:
+        return self._text
+
+
+def train_dictionary(samples: Sequence[str], size: int = 8192) -> bytes:
+    """Build a zlib preset dictionary from sample payloads.
+
+    The standard library has no dictionary trainer; for JSON events that share
+    keys and enum-like values, a window of real payloads works well. Distinct
+    samples are packed newest-last, since deflate reaches the end of the
+    dictionary with the shortest match distances.
+    """
+    seen: set[bytes] = set()
+    parts: list[bytes] = []
+    total = 0
+    for sample in reversed(samples):
+        encoded = sample.encode("utf-8")
+        if encoded in seen:
+            continue
+        seen.add(encoded)
+        parts.append(encoded)
+        total += len(encoded)
+        if total >= size:
+            break
+    parts.reverse()
+    return b"".join(parts)[-size:]
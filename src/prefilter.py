@@ -0,0 +1,165 @@
+"""In-memory duplicate pre-filter placed in front of the SQLite dedup store."""
+from __future__ import annotations
+
+import hashlib
+import math
+from collections import OrderedDict
+from typing import Iterable, Tuple
+
+DedupKey = Tuple[str, str]
+
+
+def _key_bytes(key: DedupKey) -> bytes:
+    return f"{key[0]}\x1f{key[1]}".encode("utf-8")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a blake2b digest."""
+
+    def __init__(self, size_bytes: int, false_positive_rate: float) -> None:
+        if size_bytes <= 0:
+            raise ValueError("size_bytes must be positive")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate must be between 0 and 1")
+        self._bits = bytearray(size_bytes)
+        self._bit_count = size_bytes * 8
+        self._hash_count = max(1, round(-math.log2(false_positive_rate)))
+        # Number of insertions the filter can absorb while staying at the target rate.
+        self.capacity = int(
+            self._bit_count * (math.log(2) ** 2) / -math.log(false_positive_rate)
+        )
+        self.count = 0
+
+    def _positions(self, key: DedupKey) -> Iterable[int]:
+        digest = hashlib.blake2b(_key_bytes(key), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bit_count = self._bit_count
+        return ((h1 + idx * h2) % bit_count for idx in range(self._hash_count))
+
+    def add(self, key: DedupKey) -> None:
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: DedupKey) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def estimated_false_positive_rate(self) -> float:
+        """Expected false-positive rate given the current number of insertions."""
+        fill = 1 - math.exp(-self._hash_count * self.count / self._bit_count)
+        return fill**self._hash_count
+
+    def clear(self) -> None:
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
+
+
+class HotKeyCache:
+    """Bounded LRU set of recently seen dedup keys."""
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max(0, max_size)
+        self._entries: OrderedDict[DedupKey, None] = OrderedDict()
+
+    def __contains__(self, key: DedupKey) -> bool:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: DedupKey) -> None:
+        if self._max_size == 0:
+            return
+        self._entries[key] = None
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: DedupKey) -> None:
+        self._entries.pop(key, None)
+
+
+class DuplicatePrefilter:
+    """Answers cheap dedup questions before the store is consulted.
+
+    ``classify`` returns ``True`` for keys that are definitely duplicates (hot in
+    the LRU), ``False`` for keys that are definitely new (absent from the Bloom
+    filter) and ``None`` when the store has to decide. The Bloom filter only
+    gives "definitely new" answers once it has been fully rebuilt from the store.
+    """
+
+    def __init__(self, bloom_bytes: int, false_positive_rate: float, lru_size: int) -> None:
+        self._bloom = (
+            BloomFilter(bloom_bytes, false_positive_rate) if bloom_bytes > 0 else None
+        )
+        self._hot = HotKeyCache(lru_size)
+        self._ready = False
+        self.lru_hits = 0
+        self.bloom_negatives = 0
+        self.bloom_maybes = 0
+        self.bloom_false_positives = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def mark_ready(self) -> None:
+        self._ready = self._bloom is not None
+
+    def classify(self, key: DedupKey) -> bool | None:
+        if key in self._hot:
+            self.lru_hits += 1
+            return True
+        if not self._ready or self._bloom is None:
+            return None
+        if key in self._bloom:
+            self.bloom_maybes += 1
+            return None
+        self.bloom_negatives += 1
+        return False
+
+    def record(self, key: DedupKey, is_new: bool, probed: bool) -> None:
+        """Feed the store's verdict for ``key`` back into the filters."""
+        if is_new:
+            if self._bloom is not None:
+                self._bloom.add(key)
+            if probed and self._ready:
+                self.bloom_false_positives += 1
+        self._hot.add(key)
+
+    def forget(self, keys: Iterable[DedupKey]) -> None:
+        """Drop keys the store has pruned so they are no longer "known duplicates".
+
+        Bloom bits cannot be cleared; a pruned key only degrades to a store probe.
+        """
+        for key in keys:
+            self._hot.discard(key)
+
+    def warm(self, keys: Iterable[DedupKey], hot_keys: Iterable[DedupKey] = ()) -> None:
+        """Load keys from the store; ``hot_keys`` seeds the LRU (oldest first)."""
+        if self._bloom is not None:
+            for key in keys:
+                self._bloom.add(key)
+        for key in hot_keys:
+            self._hot.add(key)
+
+    def stats(self) -> dict[str, float]:
+        data: dict[str, float] = {
+            "ready": float(self._ready),
+            "lru_size": float(len(self._hot)),
+            "lru_hits": float(self.lru_hits),
+            "bloom_negatives": float(self.bloom_negatives),
+            "bloom_maybes": float(self.bloom_maybes),
+            "bloom_false_positives": float(self.bloom_false_positives),
+        }
+        if self._bloom is not None:
+            data["bloom_keys"] = float(self._bloom.count)
+            data["bloom_capacity"] = float(self._bloom.capacity)
+            data["bloom_estimated_fp_rate"] = self._bloom.estimated_false_positive_rate()
+        return data
@@ -0,0 +1,131 @@
+"""On-demand profiling of a running process for ``GET /debug/profile``.
+
+Two modes:
+
+``cprofile``
+    :mod:`cProfile` on the event loop thread for the requested window. Every
+    coroutine and callback the loop runs meanwhile (routes, workers,
+    admission, fan-out) is profiled deterministically; the store threads are
+    not, since ``cProfile`` only hooks the thread that enables it.
+``sample``
+    a background thread snapshots every thread's stack with
+    :func:`sys._current_frames` at a fixed interval and counts them. It also
+    covers the store writer and reader threads, costs little at the default
+    interval and returns collapsed stacks (``thread;outer;...;inner count``)
+    that flame graph tools read directly.
+
+Only one profile runs at a time; a second request raises
+:class:`ProfilerBusy`.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_MODES = ("cprofile", "sample")
+PROFILE_SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls")
+MAX_PROFILE_SECONDS = 60.0
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running in this process."""
+
+
+class Profiler:
+    """Runs one profile at a time and renders the result as text."""
+
+    def __init__(self, max_seconds: float = MAX_PROFILE_SECONDS) -> None:
+        self.max_seconds = max_seconds
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def profile(
+        self,
+        seconds: float,
+        mode: str = "cprofile",
+        *,
+        sort: str = "cumulative",
+        limit: int = 50,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+    ) -> str:
+        """Profile for ``seconds`` (clamped to ``max_seconds``) and return the report."""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"unknown profile mode: {mode}")
+        if sort not in PROFILE_SORT_KEYS:
+            raise ValueError(f"unknown sort key: {sort}")
+        if self._running:
+            raise ProfilerBusy("a profile is already running")
+        seconds = min(max(seconds, 0.0), self.max_seconds)
+        self._running = True
+        try:
+            if mode == "cprofile":
+                return await _run_cprofile(seconds, sort, limit)
+            return await _run_sampler(seconds, max(interval, 0.001), limit)
+        finally:
+            self._running = False
+
+
+async def _run_cprofile(seconds: float, sort: str, limit: int) -> str:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+async def _run_sampler(seconds: float, interval: float, limit: int) -> str:
+    sampler = _StackSampler(interval)
+    await asyncio.to_thread(sampler.run, seconds)
+    return sampler.render(limit)
+
+
+class _StackSampler:
+    """Counts collapsed stacks of every other thread every ``interval`` seconds."""
+
+    def __init__(self, interval: float) -> None:
+        self._interval = interval
+        self._stacks: Counter[str] = Counter()
+        self.samples = 0
+
+    def run(self, seconds: float) -> None:
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            time.sleep(self._interval)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self._stacks[_collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    def render(self, limit: int) -> str:
+        lines = [f"# samples={self.samples} interval_ms={self._interval * 1000:g}"]
+        for stack, count in self._stacks.most_common(limit if limit > 0 else None):
+            lines.append(f"{stack} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _collapse(thread_name: str, frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
@@ -0,0 +1,88 @@
+"""Versioned response cache and ETag helpers for the polling read endpoints.
+
+The service keeps a monotonic version per topic (and one for ``/stats``) that
+only moves when a commit changes what those endpoints would return. Read
+handlers fetch the version first, which is an in-memory lookup. When it matches
+the client's ``If-None-Match`` they answer ``304`` without reading SQLite.
+Otherwise they look for a serialized body in :class:`ResponseCache` keyed by
+``(endpoint, params, version)``. Bumping a version therefore invalidates
+implicitly, and stale entries simply age out of the LRU.
+"""
+from __future__ import annotations
+
+import zlib
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple
+
+
+class CachedResponse(NamedTuple):
+    """A rendered body plus the extra headers it was served with.
+
+    ``data`` holds a JSON-ready dict instead when a few fields must be
+    filled in per request (``/stats``); ``body`` is then empty.
+    """
+
+    body: bytes
+    headers: dict[str, str]
+    rendered_at: float
+    data: dict[str, Any] | None = None
+
+
+def make_etag(key: Hashable, version: str) -> str:
+    """Weak ETag for one representation (``key``) at one data ``version``."""
+    return f'W/"{version}-{zlib.crc32(repr(key).encode("utf-8")):08x}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of ``etag`` against an ``If-None-Match`` header value."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(",")
+    )
+
+
+class ResponseCache:
+    """Bounded LRU of serialized responses keyed by ``(endpoint, params, version)``."""
+
+    def __init__(self, max_entries: int = 256, max_entry_bytes: int = 1024 * 1024) -> None:
+        self._max_entries = max(0, max_entries)
+        self._max_entry_bytes = max(0, max_entry_bytes)
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry
+
+    def put(self, key: Hashable, entry: CachedResponse) -> None:
+        if not self._max_entries or len(entry.body) > self._max_entry_bytes:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def record_not_modified(self) -> None:
+        self._not_modified += 1
+
+    def stats(self) -> dict[str, float]:
+        # A 304 is the cheapest hit of all: it skips the store and the body.
+        lookups = self._hits + self._misses + self._not_modified
+        return {
+            "hits": float(self._hits),
+            "misses": float(self._misses),
+            "not_modified": float(self._not_modified),
+            "entries": float(len(self._entries)),
+            "hit_rate": (self._hits + self._not_modified) / lookups if lookups else 0.0,
+        }
@@ -2,39 +2,543 @@
 from __future__ import annotations
 
 import asyncio
+import base64
 import json
 import logging
-from datetime import datetime, timezone
-from typing import Iterable, List, Optional
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional, Sequence
 
-from .dedup_store import DedupStore
-from .models import Event, Stats, StoredEvent
+from .admission import AdmissionController
+from .config import Settings
+from .dedup_store import (
+    EventKey,
+    EventRecord,
+    ExportRow,
+    LazyEventRecord,
+    RollupBucketRow,
+    RollupSourceRow,
+)
+from .dispatch import PARTITION_KEYS, PartitionedDispatcher
+from .fanout import FanoutHub, LiveEvent, Notice, SubscriptionClosed
+from .ingest_log import ACK_MODES, IngestLog
+from .metrics import IngestMetrics
+from .models import (
+    Event,
+    RollupBucket,
+    Rollups,
+    RollupSource,
+    RollupTopic,
+    Stats,
+    StoredEvent,
+    encode_payload,
+    from_epoch_micros,
+    to_epoch_micros,
+)
+from .prefilter import DuplicatePrefilter
+from .sharding import AnyDedupStore, open_store
+from .snapshot import EXPORT_CHUNK
+from .store_executor import StoreExecutor
+from .tracing import Trace, Tracer, current_trace
 
 
 logger = logging.getLogger(__name__)
 
 
-class AggregatorService:
+def encode_cursor(key: EventKey) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor."""
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> EventKey:
+    """Decode a cursor produced by :func:`encode_cursor`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not (
+        isinstance(key, list)
+        and len(key) == 3
+        and isinstance(key[0], int)
+        and all(isinstance(v, str) for v in key[1:])
+    ):
+        raise ValueError("invalid cursor")
+    return key[0], key[1], key[2]
+
+
+def event_record(event: Event) -> EventRecord:
+    """The ``DedupStore`` row for an event: what gets queued, logged and stored."""
+    return (
+        event.topic,
+        event.event_id,
+        to_epoch_micros(event.timestamp),
+        event.source,
+        encode_payload(event.payload),
+    )
+
+
+def _row_key(row: LazyEventRecord) -> EventKey:
+    return row[2], row[0], row[1]
+
+
+def _filter_kwargs(
+    source: Optional[str], since: Optional[datetime], until: Optional[datetime]
+) -> dict[str, object]:
+    return {
+        "source": source,
+        "since_us": to_epoch_micros(since) if since is not None else None,
+        "until_us": to_epoch_micros(until) if until is not None else None,
+    }
+
+
+def _stored_event(row: LazyEventRecord) -> StoredEvent:
+    topic, event_id, ts_us, source, payload = row
+    return StoredEvent(
+        topic=topic,
+        event_id=event_id,
+        timestamp=from_epoch_micros(ts_us),
+        source=source,
+        payload=json.loads(payload.decode()),
+    )
+
+
+def _event_json(topic: str, event_id: str, ts_us: int, source: str, payload: str) -> str:
+    """One event as a JSON object, splicing the stored payload JSON in as is."""
+    timestamp = from_epoch_micros(ts_us).isoformat()
+    return (
+        f'{{"topic":{json.dumps(topic)},"event_id":{json.dumps(event_id)},'
+        f'"timestamp":{json.dumps(timestamp)},"source":{json.dumps(source)},'
+        f'"payload":{payload}}}'
+    )
+
+
+def _ndjson_line(row: LazyEventRecord) -> str:
+    topic, event_id, ts_us, source, lazy_payload = row
+    return _event_json(topic, event_id, ts_us, source, lazy_payload.decode()) + "\n"
+
+
+def _live_event(topic: str, event_id: str, ts_us: int, source: str, payload: str) -> LiveEvent:
+    """Render a committed event for SSE (``id:`` = resume cursor) and WebSocket."""
+    body = _event_json(topic, event_id, ts_us, source, payload)
+    cursor = encode_cursor((ts_us, topic, event_id))
+    return LiveEvent(
+        topic,
+        (ts_us, topic, event_id),
+        f"id: {cursor}\ndata: {body}\n\n".encode("utf-8"),
+        f'{{"cursor":"{cursor}","event":{body}}}',
+    )
+
+
+def rollups_from_rows(
+    buckets: Iterable[RollupBucketRow], sources: Iterable[RollupSourceRow], series: bool = True
+) -> Rollups:
+    """``/stats/rollups`` from store rows; rows sharing a key (shards, nodes) are summed."""
+    merged: dict[tuple[str, int], list[int]] = {}
+    for topic, bucket_us, width_us, events, duplicates in buckets:
+        counts = merged.setdefault((topic, bucket_us), [0, 0, 0])
+        counts[0] = max(counts[0], width_us)
+        counts[1] += events
+        counts[2] += duplicates
+    totals: dict[str, list[int]] = {}
+    for (topic, _), (_, events, duplicates) in merged.items():
+        counts = totals.setdefault(topic, [0, 0])
+        counts[0] += events
+        counts[1] += duplicates
+    per_source: dict[tuple[str, str], list[int]] = {}
+    for topic, source, events, duplicates in sources:
+        counts = per_source.setdefault((topic, source), [0, 0])
+        counts[0] += events
+        counts[1] += duplicates
+    return Rollups(
+        topics=[
+            RollupTopic(
+                topic=topic,
+                events=events,
+                duplicates=duplicates,
+                duplicate_rate=duplicates / (events + duplicates) if events + duplicates else 0.0,
+            )
+            for topic, (events, duplicates) in sorted(totals.items())
+        ],
+        sources=[
+            RollupSource(topic=topic, source=source, events=events, duplicates=duplicates)
+            for (topic, source), (events, duplicates) in sorted(per_source.items())
+        ],
+        series=[
+            RollupBucket(
+                topic=topic,
+                bucket=from_epoch_micros(bucket_us),
+                width_seconds=width_us // 1_000_000,
+                events=events,
+                duplicates=duplicates,
+            )
+            for (topic, bucket_us), (width_us, events, duplicates) in sorted(merged.items())
+        ]
+        if series
+        else [],
+    )
+
+
+def _traces_in(batch: Sequence[_Queued]) -> dict[Trace, int]:
+    """Sampled traces with events in ``batch`` and how many each has there."""
+    traced: dict[Trace, int] = {}
+    for item in batch:
+        if item.trace is not None:
+            traced[item.trace] = traced.get(item.trace, 0) + 1
+    return traced
+
+
+def _stamp_batch(traced: dict[Trace, int], picked_up: float, timing: list[float] | None) -> None:
+    """Worker spans of one committed batch, on every trace with events in it."""
+    done = time.perf_counter()
+    for trace, count in traced.items():
+        trace.span("queue_wait", trace.enqueued_at, picked_up, count)
+        if timing:
+            enqueued, started, finished = timing
+            trace.span("prefilter", picked_up, enqueued, count)
+            trace.span("store_queue", enqueued, started, count)
+            trace.span("store_commit", started, finished, count)
+            trace.span("record", finished, done, count)
+        else:
+            # Every event was a known duplicate: no store call.
+            trace.span("prefilter", picked_up, done, count)
+        trace.settle(count)
+
+
+class _CommitWaiter:
+    """Resolves once every admitted event of one ``ack=committed`` request is stored."""
+
+    __slots__ = ("remaining", "sealed", "future")
+
+    def __init__(self) -> None:
+        self.remaining = 0
+        self.sealed = False
+        self.future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+
+    def settle(self, count: int) -> None:
+        self.remaining -= count
+        if self.sealed and self.remaining <= 0 and not self.future.done():
+            self.future.set_result(None)
+
+    async def wait(self) -> None:
+        self.sealed = True
+        self.settle(0)
+        await self.future
+
+
+class _Queued:
+    """An event waiting in a partition queue, stamped with its enqueue time.
+
+    Only the store row is kept: the pydantic :class:`Event` (with its
+    ``datetime`` and payload dict) is dropped at admission, so a deep backlog
+    costs a few small objects per event and workers store the row as is.
+    ``seq`` is its ingest log sequence number (``-1`` without a log),
+    ``waiter`` the ``ack=committed`` request waiting for it and ``trace`` the
+    sampled request trace it belongs to, if any.
+    """
+
+    __slots__ = ("record", "enqueued_at", "seq", "waiter", "trace")
+
+    def __init__(
+        self,
+        record: EventRecord,
+        enqueued_at: float,
+        seq: int = -1,
+        waiter: Optional[_CommitWaiter] = None,
+        trace: Optional[Trace] = None,
+    ) -> None:
+        self.record = record
+        self.enqueued_at = enqueued_at
+        self.seq = seq
+        self.waiter = waiter
+        self.trace = trace
+
+
+class EventQueries(ABC):
+    """``/events`` read paths on top of a row source.
+
+    Subclasses provide :meth:`load_events` and a :class:`FanoutHub` of newly
+    committed events; the in-process service reads the store directly and
+    feeds the hub from its workers, while multi-process front ends ask the
+    writer process for both.
+    """
+
+    hub: FanoutHub
+
+    @abstractmethod
+    async def load_events(
+        self,
+        topic: Optional[str] = None,
+        after: Optional[EventKey] = None,
+        limit: Optional[int] = None,
+        *,
+        source: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[LazyEventRecord]:
+        """Rows after ``after`` in ``(ts_us, topic, event_id)`` order."""
+
+    @abstractmethod
+    async def events_version(self, topic: Optional[str] = None) -> str:
+        """Opaque token that changes whenever ``/events`` for ``topic`` could change."""
+
+    @abstractmethod
+    async def stats_version(self) -> str:
+        """Opaque token that changes whenever ``/stats`` counters change."""
+
+    async def get_events(
+        self,
+        topic: Optional[str] = None,
+        *,
+        source: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[StoredEvent]:
+        rows = await self.load_events(topic, source=source, since=since, until=until)
+        return [_stored_event(row) for row in rows]
+
+    async def get_events_page(
+        self,
+        topic: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        *,
+        source: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> tuple[List[StoredEvent], Optional[str]]:
+        """Return one keyset page of events plus the cursor for the next page."""
+        after = decode_cursor(cursor) if cursor else None
+        rows = await self.load_events(
+            topic, after, limit, source=source, since=since, until=until
+        )
+        next_cursor = encode_cursor(_row_key(rows[-1])) if len(rows) == limit else None
+        return [_stored_event(row) for row in rows], next_cursor
+
+    async def stream_events(
+        self,
+        topic: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        chunk_size: int = 1000,
+        *,
+        source: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> AsyncIterator[bytes]:
+        """Yield events as NDJSON, fetching ``chunk_size`` rows per query.
+
+        Payloads are spliced in as stored, so rows are never decoded into models
+        and memory use stays bounded by one chunk.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            rows = await self.load_events(
+                topic, after, size, source=source, since=since, until=until
+            )
+            if not rows:
+                break
+            yield "".join(_ndjson_line(row) for row in rows).encode("utf-8")
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                break
+            after = _row_key(rows[-1])
+
+    async def _attach_live(self) -> None:
+        """Make sure :attr:`hub` receives commits before a subscriber relies on it."""
+
+    async def subscribe(
+        self,
+        topic: Optional[str] = None,
+        cursor: Optional[str] = None,
+        *,
+        backfill_limit: int = 10000,
+        heartbeat: float = 15.0,
+    ) -> AsyncIterator[List[LiveEvent | Notice]]:
+        """Yield batches of newly committed events for ``topic`` (all when None).
+
+        With ``cursor`` the stored events after it are replayed first, at most
+        ``backfill_limit`` of them; beyond that a ``gap`` notice carries the
+        cursor to page the rest from ``GET /events``. The subscription is
+        registered before the replay, so nothing committed meanwhile is missed,
+        and events seen in both are only yielded once. An empty batch is
+        yielded after ``heartbeat`` idle seconds so transports can keep alive.
+        """
+        await self._attach_live()
+        subscription = self.hub.subscribe(topic)
+        try:
+            replayed: set[EventKey] = set()
+            if cursor:
+                after = decode_cursor(cursor)
+                remaining = backfill_limit
+                while True:
+                    size = min(1000, remaining)
+                    if not size:
+                        yield [Notice("gap", {"cursor": encode_cursor(after)})]
+                        break
+                    rows = await self.load_events(topic, after, size)
+                    replayed.update(_row_key(row) for row in rows)
+                    if rows:
+                        yield [_live_event(*row[:4], row[4].decode()) for row in rows]
+                    if len(rows) < size:
+                        break
+                    remaining -= size
+                    after = _row_key(rows[-1])
+            while True:
+                try:
+                    items, dropped = await subscription.get(heartbeat)
+                except SubscriptionClosed:
+                    yield [Notice("disconnected", {})]
+                    return
+                if replayed:
+                    items = [
+                        item
+                        for item in items
+                        if not (isinstance(item, LiveEvent) and item.key in replayed)
+                    ]
+                if dropped:
+                    items.insert(0, Notice("dropped", {"count": dropped}))
+                yield items
+        finally:
+            self.hub.unsubscribe(subscription)
+
+
+class AggregatorService(EventQueries):
     """Coordinates event ingestion, deduplication, and retrieval."""
 
     def __init__(
         self,
-        dedup_store: DedupStore,
+        dedup_store: AnyDedupStore,
         worker_count: int = 2,
         queue_maxsize: int = 0,
+        batch_max_size: int = 1,
+        batch_linger_ms: int = 0,
+        prefilter: DuplicatePrefilter | None = None,
+        prefilter_warm_chunk: int = 10000,
+        partition_key: str = "topic",
+        partition_fair: bool = False,
+        partition_quantum: int = 32,
+        admission: AdmissionController | None = None,
+        metrics: IngestMetrics | None = None,
+        dedup_retention: float = 0.0,
+        event_retention: float = 0.0,
+        retention_interval: float = 300.0,
+        retention_chunk: int = 1000,
+        retention_vacuum_pages: int = 2000,
+        rollup_minute_retention: float = 0.0,
+        rollup_hour_retention: float = 0.0,
+        ingest_log: IngestLog | None = None,
+        hub: FanoutHub | None = None,
+        store_reader_threads: int = 4,
+        store_coalesce_max: int = 2048,
+        loop_lag_interval: float = 0.5,
+        tracer: Tracer | None = None,
     ) -> None:
-        self._queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=queue_maxsize)
-        self._dedup_store = dedup_store
+        if partition_key not in PARTITION_KEYS:
+            raise ValueError(f"unknown partition key: {partition_key}")
         self._worker_count = max(1, worker_count)
+        # One partition per worker: events sharing a partition key stay FIFO.
+        key_of = PARTITION_KEYS[partition_key]
+        self._dispatcher: PartitionedDispatcher[_Queued] = PartitionedDispatcher(
+            self._worker_count,
+            lambda item: key_of(item.record),
+            maxsize=queue_maxsize,
+            fair=partition_fair,
+            quantum=partition_quantum,
+        )
+        self._dedup_store = dedup_store
+        self._admission = admission or AdmissionController()
+        self._batch_max_size = max(1, batch_max_size)
+        self._batch_linger = max(0, batch_linger_ms) / 1000
         self._start_time = datetime.now(timezone.utc)
         self._shutdown = asyncio.Event()
         self._workers: list[asyncio.Task[None]] = []
         self._stats_lock = asyncio.Lock()
-        existing = self._dedup_store.load_events()
-        self._received = len(existing)
-        self._unique_processed = len(existing)
+        self._prefilter = prefilter
+        self._prefilter_warm_chunk = max(1, prefilter_warm_chunk)
+        self._warm_task: asyncio.Task[None] | None = None
+        persisted = self._dedup_store.stats()
+        self._received = persisted["received"]
+        self._unique_processed = persisted["unique_processed"]
         self._duplicate_dropped = 0
-        self._topics = {row[0] for row in existing}
+        self._topics = set(self._dedup_store.topics())
+        self._sorted_topics: list[str] | None = None
+        # Versions for conditional GETs: one per topic, one across all topics,
+        # an epoch bumped when retention deletes events, and one for /stats.
+        # They restart at 0 with the process, so every version also carries a
+        # per-boot nonce; an ETag from a previous run never matches.
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._topic_versions: dict[str, int] = {}
+        self._events_version = 0
+        self._events_epoch = 0
+        self._stats_version = 0
+        # Retention windows in seconds; 0 keeps data forever.
+        self._dedup_retention = max(0.0, dedup_retention)
+        self._event_retention = max(0.0, event_retention)
+        self._retention_interval = max(0.0, retention_interval)
+        self._retention_chunk = max(1, retention_chunk)
+        self._retention_vacuum_pages = max(0, retention_vacuum_pages)
+        # Rollup buckets older than these (seconds) are downsampled; 0 keeps them.
+        self._rollup_minute_retention = max(0.0, rollup_minute_retention)
+        self._rollup_hour_retention = max(0.0, rollup_hour_retention)
+        self._rollup_rows_merged = 0
+        self._count_duplicates = dedup_store.rollups_enabled
+        self._retention_task: asyncio.Task[None] | None = None
+        pruned = self._dedup_store.prune_stats()
+        self._dedup_pruned = pruned["dedup_pruned"]
+        self._events_pruned = pruned["events_pruned"]
+        self._vacuumed_pages = 0
+        self._retention_runs = 0
+        self._busy_workers = 0
+        self._ingest_log = ingest_log
+        self.hub = hub or FanoutHub()
+        self._loop_lag_interval = max(0.0, loop_lag_interval)
+        self._loop_lag_task: asyncio.Task[None] | None = None
+        self.metrics = metrics or IngestMetrics()
+        self.tracer = tracer or Tracer()
+        # All store calls made from the loop go through here instead of to_thread.
+        self._store = StoreExecutor(
+            dedup_store,
+            reader_threads=store_reader_threads,
+            coalesce_max=store_coalesce_max,
+            metrics=self.metrics,
+        )
+        self.metrics.add_gauge(
+            "aggregator_queue_depth",
+            "Events waiting per partition queue.",
+            lambda: (
+                ({"partition": str(idx)}, depth)
+                for idx, depth in enumerate(self._dispatcher.depths())
+            ),
+        )
+        self.metrics.add_gauge(
+            "aggregator_busy_workers",
+            "Workers currently processing a batch.",
+            lambda: [({}, self._busy_workers)],
+        )
+        self.metrics.add_gauge(
+            "aggregator_subscribers",
+            "Live event subscriptions attached to this process.",
+            lambda: [({}, self.hub.stats()["subscribers"])],
+        )
+        self.metrics.add_gauge(
+            "aggregator_store_write_backlog",
+            "Store writes queued for or running on the writer thread.",
+            lambda: [({}, self._store.write_backlog())],
+        )
+        if ingest_log is not None:
+            self.metrics.add_gauge(
+                "aggregator_ingest_log_pending",
+                "Logged events not yet committed to the dedup store.",
+                lambda: [({}, ingest_log.pending())],
+            )
 
     async def start(self) -> None:
         """Start background workers."""
@@ -43,47 +547,294 @@ class AggregatorService:
         for idx in range(self._worker_count):
             task = asyncio.create_task(self._worker_loop(idx), name=f"worker-{idx}")
             self._workers.append(task)
+        if self._prefilter is not None and self._warm_task is None:
+            self._warm_task = asyncio.create_task(self._warm_prefilter(), name="prefilter-warm")
+        if self._retention_task is None and (
+            self._dedup_retention
+            or self._event_retention
+            or self._rollup_minute_retention
+            or self._rollup_hour_retention
+        ):
+            self._retention_task = asyncio.create_task(self._retention_loop(), name="retention")
+        if self._loop_lag_interval and self.metrics.enabled and self._loop_lag_task is None:
+            self._loop_lag_task = asyncio.create_task(self._watch_loop_lag(), name="loop-lag")
+        if self._ingest_log is not None:
+            self._ingest_log.start()
+            # Finish before serving traffic so replayed events stay ahead of new ones.
+            await self._replay_ingest_log()
 
     async def stop(self) -> None:
         """Stop workers and drain queue."""
         self._shutdown.set()
-        for _ in self._workers:
-            await self._queue.put(None)  # type: ignore[arg-type]
+        # Ends every open subscription stream so the server can shut down.
+        self.hub.close()
+        if self._warm_task is not None:
+            self._warm_task.cancel()
+            await asyncio.gather(self._warm_task, return_exceptions=True)
+            self._warm_task = None
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+            await asyncio.gather(self._retention_task, return_exceptions=True)
+            self._retention_task = None
+        if self._loop_lag_task is not None:
+            self._loop_lag_task.cancel()
+            await asyncio.gather(self._loop_lag_task, return_exceptions=True)
+            self._loop_lag_task = None
+        await self._dispatcher.close()
         await asyncio.gather(*self._workers, return_exceptions=True)
         self._workers.clear()
+        if self._ingest_log is not None:
+            await self._ingest_log.close()
+        self._store.close()
+
+    async def _watch_loop_lag(self) -> None:
+        """Sample how late the loop runs a timer; long blocking callbacks show up here."""
+        loop = asyncio.get_running_loop()
+        interval = self._loop_lag_interval
+        lag = self.metrics.loop_lag
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag.observe(max(0.0, loop.time() - expected))
+
+    async def _replay_ingest_log(self) -> None:
+        """Re-queue logged events that had not reached the store before a crash.
+
+        The checkpoint lags the commits, so part of what is replayed is already
+        stored. Those events are settled in the log without being queued:
+        running them through the workers again would count them as received
+        and as dropped duplicates a second time.
+        """
+        log = self._ingest_log
+        assert log is not None
+        chunks = log.replay()
+        replayed = skipped = 0
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            stored = await self._store.read(
+                self._dedup_store.stored_keys, [(record[0], record[1]) for _, record in chunk]
+            )
+            pending: list[tuple[int, EventRecord]] = []
+            settled: list[int] = []
+            for seq, record in chunk:
+                if (record[0], record[1]) in stored:
+                    settled.append(seq)
+                else:
+                    pending.append((seq, record))
+            if settled:
+                log.mark_committed(settled)
+                skipped += len(settled)
+            now = time.monotonic()
+            await self._dispatcher.put_many(_Queued(record, now, seq) for seq, record in pending)
+            replayed += len(pending)
+        if replayed:
+            await self._count_received(replayed)
+        if replayed or skipped:
+            logger.info(
+                "Replayed %s events from the ingest log, %s were already stored",
+                replayed,
+                skipped,
+            )
 
     async def submit(self, event: Event) -> None:
         """Queue an event for processing and update received count."""
-        async with self._stats_lock:
-            self._received += 1
-        await self._queue.put(event)
-
-    async def submit_batch(self, events: Iterable[Event]) -> None:
-        for event in events:
-            await self.submit(event)
-
-    async def get_events(self, topic: Optional[str] = None) -> List[StoredEvent]:
-        rows = await asyncio.to_thread(self._dedup_store.load_events, topic)
-        result: list[StoredEvent] = []
-        for topic_val, event_id, timestamp, source, payload in rows:
-            payload_data = json.loads(payload)
-            result.append(
-                StoredEvent(
-                    topic=topic_val,
-                    event_id=event_id,
-                    timestamp=datetime.fromisoformat(timestamp),
-                    source=source,
-                    payload=payload_data,
-                )
-            )
-        return result
+        await self.submit_batch([event])
+
+    async def submit_batch(self, events: Iterable[Event], ack: str = "accepted") -> int:
+        """Admit a batch of validated events; see :meth:`submit_records`."""
+        return await self.submit_records([event_record(event) for event in events], ack)
+
+    async def submit_records(self, records: Sequence[EventRecord], ack: str = "accepted") -> int:
+        """Admit a batch into the partition queues; return how many were accepted.
+
+        Capacity for the batch is checked and reserved in one step (no awaits
+        between the check and the enqueue). Depending on the admission policy a
+        batch that does not fit is rejected outright, trimmed to the prefix that
+        fits, or waited on until ``block_timeout``; refusals raise
+        :class:`AdmissionRejected` carrying a ``Retry-After`` hint.
+
+        With an ingest log, admitted events are appended to it before they are
+        queued. ``ack`` picks when this returns: ``accepted`` once queued,
+        ``durable`` once the log is synced (``committed`` without a log) and
+        ``committed`` once the events are in the dedup store.
+        """
+        if ack not in ACK_MODES:
+            raise ValueError(f"unknown ack mode: {ack}")
+        if ack == "durable" and self._ingest_log is None:
+            ack = "committed"
+        now = time.monotonic()
+        waiter = _CommitWaiter() if ack == "committed" else None
+        trace = current_trace.get()
+        items = [_Queued(record, now, -1, waiter, trace) for record in records]
+        if not items:
+            return 0
+        traced_from = time.perf_counter() if trace is not None else 0.0
+        log = self._ingest_log
+        last_seq = -1
+        admission = self._admission
+        dispatcher = self._dispatcher
+        if admission.over_latency_target(self._backlog()):
+            raise admission.reject("latency", dispatcher.qsize() + len(items))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + admission.block_timeout
+        accepted = 0
+        while accepted < len(items):
+            pending = items[accepted:]
+            room = admission.room(dispatcher.qsize())
+            fit = dispatcher.fitting_prefix(pending, room)
+            whole = fit == len(pending)
+            if fit and (whole or admission.policy != "reject"):
+                admitted = pending[:fit]
+                if log is not None:
+                    # The queued rows are also the log frame.
+                    first_seq = log.append([item.record for item in admitted])
+                    for offset, item in enumerate(admitted):
+                        item.seq = first_seq + offset
+                    last_seq = first_seq + fit - 1
+                if waiter is not None:
+                    waiter.remaining += fit
+                if trace is not None:
+                    trace.pending += fit
+                    trace.enqueued_at = time.perf_counter()
+                dispatcher.put_many_nowait(admitted)
+                accepted += fit
+                continue
+            reason = "high_water" if room is not None and room < len(pending) else "capacity"
+            backlog = dispatcher.qsize() + len(pending)
+            if admission.policy == "block":
+                remaining = deadline - loop.time()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    await asyncio.wait_for(dispatcher.wait_for_space(), remaining)
+                    continue
+                except asyncio.TimeoutError:
+                    reason = "timeout"
+            if admission.policy == "partial" and accepted:
+                break
+            await self._count_received(accepted)
+            rejected = admission.reject(reason, backlog, accepted)
+            await self._await_ack(ack, last_seq, waiter, trace, traced_from, accepted)
+            raise rejected
+        admission.record_admitted(accepted, partial=accepted < len(items))
+        await self._count_received(accepted)
+        await self._await_ack(ack, last_seq, waiter, trace, traced_from, accepted)
+        return accepted
+
+    async def _await_ack(
+        self,
+        ack: str,
+        last_seq: int,
+        waiter: _CommitWaiter | None,
+        trace: Trace | None = None,
+        traced_from: float = 0.0,
+        accepted: int = 0,
+    ) -> None:
+        acked_from = 0.0
+        if trace is not None:
+            acked_from = time.perf_counter()
+            trace.span("admit", traced_from, acked_from, accepted)
+        try:
+            if ack == "durable" and last_seq >= 0:
+                assert self._ingest_log is not None
+                await self._ingest_log.wait_durable(last_seq)
+            elif waiter is not None:
+                await waiter.wait()
+        finally:
+            if trace is not None and ack != "accepted":
+                trace.span("ack_wait", acked_from, time.perf_counter(), accepted)
+
+    def retry_after(self) -> int:
+        """Current ``Retry-After`` hint for the queued backlog."""
+        return self._admission.retry_after(self._dispatcher.qsize())
+
+    def _backlog(self) -> int:
+        """Queued events plus batches a worker is committing right now."""
+        return self._dispatcher.qsize() + self._busy_workers
+
+    async def submit_sync(self, events: Iterable[Event]) -> list[bool]:
+        """Store a batch before returning and report, per event, whether it was new."""
+        return await self.submit_records_sync([event_record(event) for event in events])
+
+    async def submit_records_sync(self, records: Sequence[EventRecord]) -> list[bool]:
+        """Resolve ``records`` against the store at once instead of queueing them.
+
+        The batch skips the partition queues and the ingest log. It is handed
+        to the store writer thread as one :meth:`DedupStore.mark_processed_set`
+        call, so one set-based lookup and one transaction cover the whole
+        batch. Once this returns the events are committed. Duplicates
+        inside the batch count after their first occurrence. Per-key FIFO with
+        events still waiting in the queues is not guaranteed; whichever copy
+        commits first is the new one.
+        """
+        if not records:
+            return []
+        admission = self._admission
+        if admission.over_latency_target(self._backlog()):
+            raise admission.reject("latency", self._dispatcher.qsize() + len(records))
+        await self._count_received(len(records))
+        trace = current_trace.get()
+        timing: list[float] | None = [] if trace is not None else None
+        results = await self._store.write(
+            self._dedup_store.mark_processed_set, records, timing=timing
+        )
+        if self._prefilter is not None:
+            # The store was asked directly, not because the filter said "maybe".
+            for record, is_new in zip(records, results):
+                self._prefilter.record((record[0], record[1]), is_new, probed=False)
+        await self._record_results(records, results)
+        if trace is not None and timing:
+            enqueued, started, finished = timing
+            trace.span("store_queue", enqueued, started, len(records))
+            trace.span("store_commit", started, finished, len(records))
+            trace.span("record", finished, time.perf_counter(), len(records))
+        return results
+
+    async def _count_received(self, count: int) -> None:
+        # Also called for rejected batches, whose admission counters changed.
+        self._stats_version += 1
+        if count:
+            async with self._stats_lock:
+                self._received += count
+
+    async def events_version(self, topic: Optional[str] = None) -> str:
+        if topic:
+            return f"{self._boot_id}.{self._events_epoch}.{self._topic_versions.get(topic, 0)}"
+        return f"{self._boot_id}.{self._events_epoch}.{self._events_version}"
+
+    async def stats_version(self) -> str:
+        flushes = self._ingest_log.flushes if self._ingest_log is not None else 0
+        return f"{self._boot_id}.{self._stats_version}.{flushes}"
+
+    async def load_events(
+        self,
+        topic: Optional[str] = None,
+        after: Optional[EventKey] = None,
+        limit: Optional[int] = None,
+        *,
+        source: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[LazyEventRecord]:
+        return await self._store.read(
+            self._dedup_store.load_events,
+            topic,
+            after,
+            limit,
+            lazy=True,
+            **_filter_kwargs(source, since, until),
+        )
 
     async def get_stats(self) -> Stats:
         async with self._stats_lock:
             received = self._received
             unique_processed = self._unique_processed
             duplicate_dropped = self._duplicate_dropped
-            topics = sorted(self._topics)
+            if self._sorted_topics is None:
+                self._sorted_topics = sorted(self._topics)
+            topics = list(self._sorted_topics)
         uptime = (datetime.now(timezone.utc) - self._start_time).total_seconds()
         return Stats(
             received=received,
@@ -91,39 +842,401 @@ class AggregatorService:
             duplicate_dropped=duplicate_dropped,
             topics=topics,
             uptime_seconds=uptime,
+            prefilter=self._prefilter.stats() if self._prefilter is not None else {},
+            queue_depths=self._dispatcher.depths(),
+            admission=self._admission.stats(),
+            retention={
+                "dedup_pruned": float(self._dedup_pruned),
+                "events_pruned": float(self._events_pruned),
+                "vacuumed_pages": float(self._vacuumed_pages),
+                "runs": float(self._retention_runs),
+                "rollup_rows_merged": float(self._rollup_rows_merged),
+            },
+            ingest_log=(
+                {
+                    "pending": float(self._ingest_log.pending()),
+                    "watermark": float(self._ingest_log.watermark),
+                    "flushes": float(self._ingest_log.flushes),
+                }
+                if self._ingest_log is not None
+                else {}
+            ),
+            subscriptions=self.hub.stats(),
         )
 
+    async def get_rollups(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        series: bool = True,
+    ) -> Rollups:
+        """Per-topic and per-source counts from the rollup tables, not from the events."""
+        buckets, sources = await self._store.read(
+            self._dedup_store.load_rollups,
+            topic,
+            to_epoch_micros(since) if since is not None else None,
+            to_epoch_micros(until) if until is not None else None,
+        )
+        return rollups_from_rows(buckets, sources, series)
+
+    async def render_metrics(self) -> str:
+        """Prometheus text for ``/metrics``."""
+        return self.metrics.render()
+
     async def _worker_loop(self, worker_id: int) -> None:
+        """Drain partition ``worker_id`` in batches until it is closed and empty."""
         logger.info("Worker %s started", worker_id)
         while True:
-            event = await self._queue.get()
-            if event is None:
-                self._queue.task_done()
+            batch = await self._dispatcher.get_batch(
+                worker_id, self._batch_max_size, self._batch_linger
+            )
+            if not batch:
                 break
+            picked_up = time.monotonic()
+            self.metrics.queue_wait.observe_many(picked_up - item.enqueued_at for item in batch)
+            # Only scanned for traces while sampling is on.
+            traced = _traces_in(batch) if self.tracer.enabled else None
+            timing: list[float] | None = [] if traced else None
+            traced_from = time.perf_counter() if traced else 0.0
+            self._busy_workers += 1
             try:
-                await self._process_event(event)
+                try:
+                    await self._process_batch([item.record for item in batch], timing)
+                except Exception as exc:
+                    for item in batch:
+                        if item.waiter is not None and not item.waiter.future.done():
+                            item.waiter.future.set_exception(exc)
+                    raise
+                if traced:
+                    _stamp_batch(traced, traced_from, timing)
+                self._settle_committed(batch)
+                now = time.monotonic()
+                self._admission.record_commit(
+                    len(batch), sum(now - item.enqueued_at for item in batch) / len(batch)
+                )
+                # Admission and ingest log figures moved after the counters did.
+                self._stats_version += 1
             finally:
-                self._queue.task_done()
+                self._busy_workers -= 1
+                await self._dispatcher.task_done(worker_id, len(batch))
         logger.info("Worker %s stopped", worker_id)
 
-    async def _process_event(self, event: Event) -> None:
-        payload_json = json.dumps(event.payload)
-        timestamp_str = event.timestamp.isoformat()
-        is_new = await asyncio.to_thread(
-            self._dedup_store.mark_processed,
-            event.topic,
-            event.event_id,
-            timestamp_str,
-            event.source,
-            payload_json,
+    def _settle_committed(self, batch: List[_Queued]) -> None:
+        if self._ingest_log is not None:
+            self._ingest_log.mark_committed([item.seq for item in batch])
+        waiter = None
+        count = 0
+        # Items of one request are mostly adjacent, so settle runs of them.
+        for item in batch:
+            if item.waiter is not waiter:
+                if waiter is not None:
+                    waiter.settle(count)
+                waiter, count = item.waiter, 0
+            count += 1
+        if waiter is not None:
+            waiter.settle(count)
+
+    async def join(self) -> None:
+        """Wait until every submitted event has been processed."""
+        await self._dispatcher.join()
+
+    async def _warm_prefilter(self) -> None:
+        """Rebuild the pre-filter from the dedup table without blocking startup."""
+        assert self._prefilter is not None
+        hot = await self._store.read(
+            self._dedup_store.recent_dedup_keys, self._prefilter_warm_chunk
         )
-        if is_new:
-            async with self._stats_lock:
-                self._unique_processed += 1
-                self._topics.add(event.topic)
-        else:
+        self._prefilter.warm((), hot_keys=[(topic, event_id) for topic, event_id in hot])
+        chunks = self._dedup_store.iter_dedup_keys(self._prefilter_warm_chunk)
+        while True:
+            keys = await self._store.read(next, chunks, None)
+            if keys is None:
+                break
+            self._prefilter.warm(keys)
+            self._stats_version += 1
+        self._prefilter.mark_ready()
+        self._stats_version += 1
+        logger.info("Duplicate pre-filter ready: %s", self._prefilter.stats())
+
+    async def _retention_loop(self) -> None:
+        while True:
+            try:
+                await self.run_retention()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Retention pass failed")
+            await asyncio.sleep(self._retention_interval)
+
+    async def snapshot(self, target: Path) -> int:
+        """Hot copy of the store to ``target`` (see :meth:`DedupStore.backup`); return pages.
+
+        Runs on the reader pool, so the writer thread keeps committing batches.
+        """
+        return await self._store.read(self._dedup_store.backup, target)
+
+    async def export_chunks(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        chunk_size: int = EXPORT_CHUNK,
+    ) -> AsyncIterator[List[ExportRow]]:
+        """Stored events with their ``processed_at`` in ``(topic, event_id)`` pages."""
+        since_us = to_epoch_micros(since) if since is not None else None
+        until_us = to_epoch_micros(until) if until is not None else None
+        after: tuple[str, str] | None = None
+        while True:
+            rows = await self._store.read(
+                self._dedup_store.export_rows,
+                after,
+                chunk_size,
+                topic=topic,
+                since_us=since_us,
+                until_us=until_us,
+            )
+            if not rows:
+                return
+            yield rows
+            after = (rows[-1][0], rows[-1][1])
+
+    async def export_keys(self, keys: Sequence[tuple[str, str]]) -> List[ExportRow]:
+        """Export rows for those of ``keys`` stored here, key-only rows included."""
+        return await self._store.read(self._dedup_store.export_keys, keys)
+
+    async def import_rows(self, rows: Sequence[ExportRow]) -> int:
+        """Load exported rows into the live store; return how many were new.
+
+        Imported events are history: they do not count as ``received`` and are
+        not pushed to live subscribers, but the pre-filter, ``unique_processed``,
+        the topic list and the ``/events`` versions all follow them.
+        """
+        added = await self._store.write(self._dedup_store.import_rows, rows)
+        if not added:
+            return 0
+        keys = [(row[0], row[1]) for row in rows]
+        if self._prefilter is not None:
+            self._prefilter.warm(keys)
+        topics = {row[0] for row in rows}
+        async with self._stats_lock:
+            if not self._topics.issuperset(topics):
+                self._topics.update(topics)
+                self._sorted_topics = None
+            self._unique_processed += added
+        # Rows land anywhere in the (ts_us, ...) order, so every cursor moves.
+        self._events_epoch += 1
+        self._stats_version += 1
+        return added
+
+    async def release_keys(self, keys: Sequence[tuple[str, str]]) -> int:
+        """Drop keys handed off to another node; return how many were stored here.
+
+        The counterpart of :meth:`import_rows` on the new owner, so
+        ``unique_processed`` moves with the keys. The topic list stays cumulative.
+        """
+        removed = await self._store.write(self._dedup_store.release_keys, keys)
+        if self._prefilter is not None:
+            self._prefilter.forget(keys)
+        if removed:
             async with self._stats_lock:
-                self._duplicate_dropped += 1
+                self._unique_processed -= removed
+            self._events_epoch += 1
+            self._stats_version += 1
+        return removed
+
+    async def run_retention(self, now: datetime | None = None) -> tuple[int, int]:
+        """Apply both retention windows once; return ``(dedup_keys, events)`` pruned.
+
+        Rows are deleted ``retention_chunk`` at a time, each chunk in its own
+        short write transaction, so ingest batches interleave with pruning
+        instead of waiting behind one large delete. Cumulative counters such as
+        ``unique_processed`` are persisted separately and are not affected, and
+        neither are rollups: their old buckets are downsampled in the same pass.
+        """
+        now = now or datetime.now(timezone.utc)
+        store = self._dedup_store
+        chunk = self._retention_chunk
+        dedup_removed = 0
+        if self._dedup_retention:
+            cutoff = now - timedelta(seconds=self._dedup_retention)
+            while True:
+                keys = await self._store.write(store.prune_dedup_keys, cutoff, chunk)
+                if not keys:
+                    break
+                if self._prefilter is not None:
+                    self._prefilter.forget(keys)
+                dedup_removed += len(keys)
+        events_removed = 0
+        if self._event_retention:
+            before_us = to_epoch_micros(now) - int(self._event_retention * 1_000_000)
+            while True:
+                removed = await self._store.write(store.prune_events, before_us, chunk)
+                if not removed:
+                    break
+                events_removed += removed
+        if self._rollup_minute_retention or self._rollup_hour_retention:
+            now_us = to_epoch_micros(now)
+            minutes_before = hours_before = 0
+            if self._rollup_minute_retention:
+                minutes_before = now_us - int(self._rollup_minute_retention * 1_000_000)
+            if self._rollup_hour_retention:
+                hours_before = now_us - int(self._rollup_hour_retention * 1_000_000)
+            self._rollup_rows_merged += await self._store.write(
+                store.downsample_rollups, minutes_before, hours_before
+            )
+        vacuumed = 0
+        if (dedup_removed or events_removed) and self._retention_vacuum_pages:
+            vacuumed = await self._store.write(
+                store.incremental_vacuum, self._retention_vacuum_pages
+            )
+        self._dedup_pruned += dedup_removed
+        self._events_pruned += events_removed
+        if events_removed:
+            self._events_epoch += 1
+        self._stats_version += 1
+        self._vacuumed_pages += vacuumed
+        self._retention_runs += 1
+        if dedup_removed or events_removed:
             logger.info(
-                "Duplicate detected for topic=%s event_id=%s", event.topic, event.event_id
+                "Retention pruned %s dedup keys and %s events, vacuumed %s pages",
+                dedup_removed,
+                events_removed,
+                vacuumed,
+            )
+        return dedup_removed, events_removed
+
+    async def _process_batch(
+        self, records: Sequence[EventRecord], timing: list[float] | None = None
+    ) -> None:
+        """Dedup and store a batch of queued rows; ``timing`` is passed to the store call."""
+        # verdicts: True = known duplicate, False = known new, None = ask the store.
+        verdicts: list[bool | None] = [None] * len(records)
+        if self._prefilter is not None:
+            seen: set[tuple[str, str]] = set()
+            for idx, record in enumerate(records):
+                key = (record[0], record[1])
+                if key in seen:
+                    verdicts[idx] = True
+                    continue
+                seen.add(key)
+                verdicts[idx] = self._prefilter.classify(key)
+        pending = [idx for idx, verdict in enumerate(verdicts) if verdict is not True]
+        known: list[EventRecord] = []
+        if self._count_duplicates:
+            # Repeats settled here skip the store's probe; the rollups still count them.
+            known = [records[idx] for idx, verdict in enumerate(verdicts) if verdict is True]
+
+        results = [False] * len(records)
+        if pending or known:
+            rows = [records[idx] for idx in pending]
+            hints = [verdicts[idx] is False for idx in pending]
+            stored = await self._store.mark_processed_many(
+                rows, hints, duplicates=known, timing=timing
+            )
+            for position, idx in enumerate(pending):
+                results[idx] = stored[position]
+                if self._prefilter is not None:
+                    self._prefilter.record(
+                        (records[idx][0], records[idx][1]),
+                        stored[position],
+                        probed=not hints[position],
+                    )
+        await self._record_results(records, results)
+
+    async def _record_results(self, records: Sequence[EventRecord], results: list[bool]) -> None:
+        """Counters, versions and live subscribers after a batch was stored."""
+        hub = self.hub
+        if hub.active:
+            hub.publish(
+                [
+                    _live_event(*record)
+                    for record, is_new in zip(records, results)
+                    if is_new and hub.wants(record[0])
+                ]
+            )
+        new_topics = [record[0] for record, is_new in zip(records, results) if is_new]
+        self.metrics.commit_batch_size.observe(len(records))
+        self.metrics.topic_events.inc_each(new_topics)
+        new_count = len(new_topics)
+        async with self._stats_lock:
+            if not self._topics.issuperset(new_topics):
+                self._topics.update(new_topics)
+                self._sorted_topics = None
+            self._unique_processed += new_count
+            self._duplicate_dropped += len(records) - new_count
+        if new_count:
+            versions = self._topic_versions
+            for topic in set(new_topics):
+                versions[topic] = versions.get(topic, 0) + 1
+            self._events_version += 1
+        self._stats_version += 1
+        for record, is_new in zip(records, results):
+            if not is_new:
+                logger.info(
+                    "Duplicate detected for topic=%s event_id=%s", record[0], record[1]
+                )
+
+
+def create_service(settings: Settings) -> tuple[AggregatorService, AnyDedupStore]:
+    """Build the store and the service wired to it from ``settings``."""
+    dedup_store = open_store(
+        settings.resolved_database_path(),
+        settings.shard_count,
+        reader_count=settings.sqlite_readers,
+        synchronous=settings.sqlite_synchronous,
+        cache_size=settings.sqlite_cache_size,
+        mmap_size=settings.sqlite_mmap_size,
+        compression=settings.payload_compression,
+        zdict_size=settings.payload_zdict_size,
+        rollups=settings.rollups,
+    )
+    prefilter = None
+    if settings.prefilter_bloom_bytes > 0 or settings.prefilter_lru_size > 0:
+        prefilter = DuplicatePrefilter(
+            settings.prefilter_bloom_bytes,
+            settings.prefilter_fp_rate,
+            settings.prefilter_lru_size,
+        )
+    aggregator = AggregatorService(
+        dedup_store,
+        worker_count=settings.worker_count,
+        queue_maxsize=settings.queue_maxsize,
+        batch_max_size=settings.batch_max_size,
+        batch_linger_ms=settings.batch_linger_ms,
+        prefilter=prefilter,
+        partition_key=settings.partition_key,
+        partition_fair=settings.partition_fair,
+        partition_quantum=settings.partition_quantum,
+        admission=AdmissionController(
+            policy=settings.admission_policy,
+            high_water=settings.admission_high_water,
+            latency_target=settings.admission_latency_target_ms / 1000,
+            block_timeout=settings.admission_block_timeout_ms / 1000,
+        ),
+        metrics=IngestMetrics(enabled=settings.metrics_enabled),
+        dedup_retention=settings.dedup_retention_days * 86400,
+        event_retention=settings.event_retention_days * 86400,
+        retention_interval=settings.retention_interval_seconds,
+        retention_chunk=settings.retention_chunk_size,
+        retention_vacuum_pages=settings.retention_vacuum_pages,
+        rollup_minute_retention=settings.rollup_minute_hours * 3600,
+        rollup_hour_retention=settings.rollup_hour_days * 86400,
+        hub=FanoutHub(settings.subscriber_buffer, settings.slow_consumer_policy),
+        store_reader_threads=settings.sqlite_readers,
+        store_coalesce_max=settings.store_coalesce_max,
+        loop_lag_interval=settings.loop_lag_interval_ms / 1000,
+        tracer=Tracer(settings.trace_sample_rate, settings.trace_keep),
+        ingest_log=(
+            IngestLog(
+                settings.resolved_ingest_log_dir(),
+                segment_bytes=settings.ingest_log_segment_bytes,
+                group_commit_ms=settings.ingest_log_group_commit_ms,
+                checkpoint_ms=settings.ingest_log_checkpoint_ms,
+                fsync=settings.ingest_log_fsync,
             )
+            if settings.ingest_log
+            else None
+        ),
+    )
+    return aggregator, dedup_store
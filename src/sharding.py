@@ -0,0 +1,411 @@
+"""Hash-partitioned dedup store spread over several SQLite files.
+
+SQLite allows a single writer per database file, so :class:`ShardedDedupStore`
+splits ``(topic, event_id)`` keys across ``N`` files, each owned by its own
+:class:`~src.dedup_store.DedupStore` and a dedicated writer thread. Batches are
+split by owning shard and written to all shards in parallel; reads fan out and
+are merged back into ``(ts_us, topic, event_id)`` order.
+
+The shard count is recorded in a manifest next to the shard files. Opening a
+layout with a different count is refused because keys would be routed to the
+wrong shard; use the ``reshard`` command to rewrite the data instead::
+
+    python -m src.sharding reshard --source data/dedup.sqlite \
+        --target data/sharded/dedup.sqlite --shards 4
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Sequence, Tuple, Union
+
+from .dedup_store import (
+    DedupStore,
+    EventKey,
+    EventRecord,
+    ExportRow,
+    RollupBucketRow,
+    RollupSourceRow,
+    StoredSourceRollup,
+    StoredTopicRollup,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def key_hash(topic: str, event_id: str) -> int:
+    """Stable 64-bit hash of a dedup key, the same in every process."""
+    digest = hashlib.blake2b(f"{topic}\x1f{event_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def shard_index(topic: str, event_id: str, shard_count: int) -> int:
+    """Return the shard that owns ``(topic, event_id)``."""
+    return key_hash(topic, event_id) % shard_count
+
+
+def shard_paths(db_path: Path, shard_count: int) -> list[Path]:
+    """Return the shard file paths derived from the configured database path."""
+    return [
+        db_path.with_name(f"{db_path.stem}.shard{idx}{db_path.suffix}")
+        for idx in range(shard_count)
+    ]
+
+
+def manifest_path(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.stem}.shards.json")
+
+
+class ShardedDedupStore:
+    """Drop-in replacement for :class:`DedupStore` backed by ``shard_count`` files."""
+
+    def __init__(self, db_path: Path, shard_count: int, **store_options: Any) -> None:
+        if shard_count < 2:
+            raise ValueError("ShardedDedupStore needs at least two shards")
+        self._db_path = db_path
+        self._shard_count = shard_count
+        self._check_manifest()
+        self._shards = [
+            DedupStore(path, **store_options) for path in shard_paths(db_path, shard_count)
+        ]
+        self._writers = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"dedup-shard-{idx}")
+            for idx in range(shard_count)
+        ]
+
+    def _check_manifest(self) -> None:
+        manifest = manifest_path(self._db_path)
+        if manifest.exists():
+            recorded = json.loads(manifest.read_text())["shard_count"]
+            if recorded != self._shard_count:
+                raise ValueError(
+                    f"{manifest} records {recorded} shards but {self._shard_count} were "
+                    "configured; run `python -m src.sharding reshard` to change the shard count"
+                )
+            return
+        if self._db_path.exists():
+            raise ValueError(
+                f"{self._db_path} is a single-file store; run `python -m src.sharding reshard` "
+                "to split it before enabling sharding"
+            )
+        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest.write_text(json.dumps({"shard_count": self._shard_count}))
+
+    @property
+    def shards(self) -> list[DedupStore]:
+        return list(self._shards)
+
+    @property
+    def rollups_enabled(self) -> bool:
+        return self._shards[0].rollups_enabled
+
+    def close(self) -> None:
+        for writer in self._writers:
+            writer.shutdown(wait=True)
+        for shard in self._shards:
+            shard.close()
+
+    def mark_processed(
+        self,
+        topic: str,
+        event_id: str,
+        ts_us: int,
+        source: str,
+        payload_json: str,
+    ) -> bool:
+        return self.mark_processed_many([(topic, event_id, ts_us, source, payload_json)])[0]
+
+    def mark_processed_many(
+        self,
+        records: Sequence[EventRecord],
+        known_new: Sequence[bool] | None = None,
+        duplicates: Sequence[EventRecord] = (),
+    ) -> list[bool]:
+        """Route each record to its shard and commit all shard batches in parallel."""
+        return self._route("mark_processed_many", records, known_new, duplicates)
+
+    def mark_processed_set(self, records: Sequence[EventRecord]) -> list[bool]:
+        """:meth:`DedupStore.mark_processed_set` per shard, one transaction each."""
+        return self._route("mark_processed_set", records)
+
+    def _route(
+        self,
+        method: str,
+        records: Sequence[EventRecord],
+        known_new: Sequence[bool] | None = None,
+        duplicates: Sequence[EventRecord] | None = None,
+    ) -> list[bool]:
+        groups: dict[int, list[int]] = {}
+        for idx, record in enumerate(records):
+            groups.setdefault(shard_index(record[0], record[1], self._shard_count), []).append(idx)
+        # Known duplicates are only counted, on the shard that owns their key.
+        repeats: dict[int, list[EventRecord]] = {}
+        for record in duplicates or ():
+            shard_id = shard_index(record[0], record[1], self._shard_count)
+            repeats.setdefault(shard_id, []).append(record)
+            groups.setdefault(shard_id, [])
+        futures: list[tuple[list[int], Future[list[bool]]]] = []
+        for shard_id, indices in groups.items():
+            args: tuple[Any, ...] = ([records[idx] for idx in indices],)
+            if known_new is not None or duplicates is not None:
+                args += (None if known_new is None else [known_new[idx] for idx in indices],)
+            if duplicates is not None:
+                args += (repeats.get(shard_id, ()),)
+            futures.append(
+                (
+                    indices,
+                    self._writers[shard_id].submit(
+                        getattr(self._shards[shard_id], method), *args
+                    ),
+                )
+            )
+        results = [False] * len(records)
+        for indices, future in futures:
+            for idx, is_new in zip(indices, future.result()):
+                results[idx] = is_new
+        return results
+
+    def stored_keys(self, keys: Sequence[Tuple[str, str]]) -> set[Tuple[str, str]]:
+        groups: dict[int, list[Tuple[str, str]]] = {}
+        for key in keys:
+            groups.setdefault(shard_index(key[0], key[1], self._shard_count), []).append(key)
+        return set().union(
+            *(self._shards[shard_id].stored_keys(group) for shard_id, group in groups.items())
+        )
+
+    def export_keys(self, keys: Sequence[Tuple[str, str]]) -> list[ExportRow]:
+        groups: dict[int, list[Tuple[str, str]]] = {}
+        for key in keys:
+            groups.setdefault(shard_index(key[0], key[1], self._shard_count), []).append(key)
+        return [
+            row
+            for shard_id, group in groups.items()
+            for row in self._shards[shard_id].export_keys(group)
+        ]
+
+    def iter_dedup_keys(self, chunk_size: int = 10000) -> Iterator[list[Tuple[str, str]]]:
+        for shard in self._shards:
+            yield from shard.iter_dedup_keys(chunk_size)
+
+    def recent_dedup_keys(self, limit: int) -> list[Tuple[str, str]]:
+        per_shard = max(1, limit // self._shard_count)
+        return [key for shard in self._shards for key in shard.recent_dedup_keys(per_shard)]
+
+    def export_rows(
+        self, after: Tuple[str, str] | None = None, limit: int = 10000, **filters: Any
+    ) -> list[ExportRow]:
+        merged = heapq.merge(
+            *(shard.export_rows(after, limit, **filters) for shard in self._shards),
+            key=lambda row: (row[0], row[1]),
+        )
+        return list(itertools.islice(merged, limit))
+
+    def import_rows(self, rows: Sequence[ExportRow]) -> int:
+        groups: dict[int, list[ExportRow]] = {}
+        for row in rows:
+            groups.setdefault(shard_index(row[0], row[1], self._shard_count), []).append(row)
+        futures = [
+            self._writers[shard_id].submit(self._shards[shard_id].import_rows, group)
+            for shard_id, group in groups.items()
+        ]
+        return sum(future.result() for future in futures)
+
+    def release_keys(self, keys: Sequence[Tuple[str, str]]) -> int:
+        groups: dict[int, list[Tuple[str, str]]] = {}
+        for key in keys:
+            groups.setdefault(shard_index(key[0], key[1], self._shard_count), []).append(key)
+        futures = [
+            self._writers[shard_id].submit(self._shards[shard_id].release_keys, group)
+            for shard_id, group in groups.items()
+        ]
+        return sum(future.result() for future in futures)
+
+    @contextmanager
+    def deferred_indexes(self) -> Iterator[None]:
+        with ExitStack() as stack:
+            for shard in self._shards:
+                stack.enter_context(shard.deferred_indexes())
+            yield
+
+    def backup(self, target: Path) -> int:
+        """Back up every shard next to ``target`` plus the manifest; return total pages.
+
+        Each shard is a consistent snapshot on its own, taken one after the
+        other; a batch committing meanwhile may be in some shard copies only.
+        """
+        pages = sum(
+            shard.backup(path)
+            for shard, path in zip(self._shards, shard_paths(target, self._shard_count))
+        )
+        manifest_path(target).write_text(json.dumps({"shard_count": self._shard_count}))
+        return pages
+
+    def downsample_rollups(self, minutes_before_us: int, hours_before_us: int) -> int:
+        futures = [
+            writer.submit(shard.downsample_rollups, minutes_before_us, hours_before_us)
+            for writer, shard in zip(self._writers, self._shards)
+        ]
+        return sum(future.result() for future in futures)
+
+    def load_rollups(
+        self, topic: str | None = None, since_us: int | None = None, until_us: int | None = None
+    ) -> tuple[list[RollupBucketRow], list[RollupSourceRow]]:
+        """Every shard's rows, concatenated; callers sum rows sharing a key."""
+        buckets: list[RollupBucketRow] = []
+        sources: list[RollupSourceRow] = []
+        for shard in self._shards:
+            shard_buckets, shard_sources = shard.load_rollups(topic, since_us, until_us)
+            buckets.extend(shard_buckets)
+            sources.extend(shard_sources)
+        return buckets, sources
+
+    def load_events(
+        self,
+        topic: str | None = None,
+        after: EventKey | None = None,
+        limit: int | None = None,
+        **filters: Any,
+    ) -> list[EventRecord]:
+        """Query every shard and k-way merge the ordered results."""
+        merged = heapq.merge(
+            *(shard.load_events(topic, after, limit, **filters) for shard in self._shards),
+            key=lambda row: (row[2], row[0], row[1]),
+        )
+        if limit is None:
+            return list(merged)
+        return list(itertools.islice(merged, limit))
+
+    def prune_dedup_keys(self, older_than: datetime, limit: int = 1000) -> list[Tuple[str, str]]:
+        """Prune up to ``limit`` expired keys from every shard in parallel."""
+        futures = [
+            writer.submit(shard.prune_dedup_keys, older_than, limit)
+            for writer, shard in zip(self._writers, self._shards)
+        ]
+        return [key for future in futures for key in future.result()]
+
+    def prune_events(self, before_us: int, limit: int = 1000) -> int:
+        futures = [
+            writer.submit(shard.prune_events, before_us, limit)
+            for writer, shard in zip(self._writers, self._shards)
+        ]
+        return sum(future.result() for future in futures)
+
+    def incremental_vacuum(self, pages: int = 1000) -> int:
+        futures = [
+            writer.submit(shard.incremental_vacuum, pages)
+            for writer, shard in zip(self._writers, self._shards)
+        ]
+        return sum(future.result() for future in futures)
+
+    def stats(self) -> dict[str, int]:
+        totals: dict[str, int] = {}
+        for shard in self._shards:
+            for name, value in shard.stats().items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def prune_stats(self) -> dict[str, int]:
+        totals: dict[str, int] = {}
+        for shard in self._shards:
+            for name, value in shard.prune_stats().items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def topics(self) -> list[str]:
+        return sorted({topic for shard in self._shards for topic in shard.topics()})
+
+
+AnyDedupStore = Union[DedupStore, ShardedDedupStore]
+
+
+def open_store(db_path: Path, shard_count: int = 1, **store_options: Any) -> AnyDedupStore:
+    """Open a single-file store, or a sharded one when ``shard_count > 1``."""
+    if shard_count > 1:
+        return ShardedDedupStore(db_path, shard_count, **store_options)
+    return DedupStore(db_path, **store_options)
+
+
+def reshard(source: Path, source_shards: int, target: Path, target_shards: int) -> int:
+    """Copy every stored key and event from one layout into another; return rows copied.
+
+    The source must not be receiving writes while this runs, and ``target``
+    should be a new path. ``processed_at`` dedup timestamps are preserved so
+    retention behaves the same afterwards. Dedup keys whose events were pruned
+    are copied as keys. The counters and rollups are carried over as totals,
+    because they also count keys and events that retention already removed.
+    """
+    if source.expanduser().resolve() == target.expanduser().resolve():
+        raise ValueError("reshard target must differ from the source path")
+    source_store = open_store(source, source_shards)
+    target_store = open_store(target, target_shards)
+    copied = 0
+    after: Tuple[str, str] | None = None
+    try:
+        while True:
+            rows = source_store.export_rows(after, 5000)
+            if not rows:
+                break
+            copied += target_store.import_rows(rows)
+            after = (rows[-1][0], rows[-1][1])
+            logger.info("Resharded %s rows", copied)
+        _copy_state(_shards_of(source_store), _shards_of(target_store))
+    finally:
+        source_store.close()
+        target_store.close()
+    return copied
+
+
+def _shards_of(store: AnyDedupStore) -> list[DedupStore]:
+    return store.shards if isinstance(store, ShardedDedupStore) else [store]
+
+
+def _copy_state(sources: list[DedupStore], targets: list[DedupStore]) -> None:
+    """Carry counters and rollups over; the first target shard holds the totals."""
+    counters: dict[str, int] = {}
+    topic_rows: list[StoredTopicRollup] = []
+    source_rows: list[StoredSourceRollup] = []
+    for shard in sources:
+        shard_counters, shard_topics, shard_sources = shard.export_state()
+        for name, value in shard_counters.items():
+            if name.startswith("rollup_"):
+                # Downsampling watermarks, the same on every shard.
+                counters[name] = max(counters.get(name, 0), value)
+            else:
+                counters[name] = counters.get(name, 0) + value
+        topic_rows.extend(shard_topics)
+        source_rows.extend(shard_sources)
+    # The import already counted the keys each target shard received.
+    counters["unique_processed"] = counters.get("unique_processed", 0) - sum(
+        shard.stats()["unique_processed"] for shard in targets[1:]
+    )
+    watermarks = {name: value for name, value in counters.items() if name.startswith("rollup_")}
+    targets[0].restore_state(counters, topic_rows, source_rows)
+    for shard in targets[1:]:
+        shard.restore_state(watermarks, [], [])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Dedup store shard maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("reshard", help="Rewrite a store into a different shard count")
+    cmd.add_argument("--source", type=Path, required=True, help="Existing DEDUP_DB_PATH")
+    cmd.add_argument("--source-shards", type=int, default=1)
+    cmd.add_argument("--target", type=Path, required=True, help="New DEDUP_DB_PATH")
+    cmd.add_argument("--shards", type=int, required=True, help="Target shard count")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    copied = reshard(args.source, args.source_shards, args.target, args.shards)
+    print(f"Copied {copied} rows into {args.shards} shard(s) at {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Snapshots of the dedup store for bootstrapping replacement nodes.
+
+Copying ``data/dedup.sqlite`` while the service runs is unsafe: the copy can
+catch a half-applied checkpoint and misses whatever still sits in the WAL.
+This module offers three safe tools, each usable against a running service
+through the ``/admin`` endpoints or from the command line:
+
+``backup``
+    a consistent hot copy through SQLite's online backup API
+    (:meth:`DedupStore.backup`); ingest keeps committing meanwhile.
+``export``
+    stored events as NDJSON, one ``/publish``-shaped object per line plus the
+    dedup ``processed_at``, paged by keyset so memory stays flat. Dedup keys
+    whose event was pruned are exported too, as lines with a null
+    ``timestamp``, ``source`` and ``payload``, so the copy keeps rejecting
+    their duplicates. Optionally narrowed to one topic and a timestamp range
+    (which leaves those key-only lines out).
+``import``
+    loads such a file in bulk transactions, one per chunk, skipping keys that
+    are already stored. With ``--defer-indexes`` the secondary indexes are
+    dropped for the load and rebuilt once at the end, which is only for a
+    store nobody serves from yet.
+
+::
+
+    python -m src.snapshot backup --db data/dedup.sqlite --target backup/dedup.sqlite
+    python -m src.snapshot export --db data/dedup.sqlite --out events.ndjson.gz \\
+        --topic orders --since 2025-01-01T00:00:00Z
+    python -m src.snapshot import --db new/dedup.sqlite --input events.ndjson.gz \\
+        --defer-indexes
+
+Paths ending in ``.gz`` are gzip-compressed.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional
+
+from .dedup_store import ExportRow
+from .models import encode_payload, from_epoch_micros, to_epoch_micros
+from .sharding import AnyDedupStore, open_store
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK = 5000
+
+
+def export_line(row: ExportRow) -> bytes:
+    """One NDJSON line for an exported row; the payload text is spliced in as stored."""
+    topic, event_id, ts_us, source, payload, processed_at = row
+    if payload is None or ts_us is None:
+        return (
+            f'{{"topic":{json.dumps(topic)},"event_id":{json.dumps(event_id)},'
+            f'"timestamp":null,"source":null,"payload":null,'
+            f'"processed_at":{json.dumps(processed_at)}}}\n'
+        ).encode("utf-8")
+    return (
+        f'{{"topic":{json.dumps(topic)},"event_id":{json.dumps(event_id)},'
+        f'"timestamp":"{from_epoch_micros(ts_us).isoformat()}",'
+        f'"source":{json.dumps(source)},"payload":{payload},'
+        f'"processed_at":{json.dumps(processed_at)}}}\n'
+    ).encode("utf-8")
+
+
+def parse_export_line(line: bytes | str) -> ExportRow:
+    """Inverse of :func:`export_line`; raises ``ValueError`` for malformed lines.
+
+    ``processed_at`` is optional, so plain ``/publish`` NDJSON imports too.
+    When present it may be any ISO-8601 time (naive means UTC) and is
+    normalized to the ``CURRENT_TIMESTAMP`` text that retention compares.
+    A null ``payload`` marks a key-only line; it needs ``processed_at``.
+    """
+    try:
+        data = json.loads(line)
+        topic, event_id, source, payload = (
+            data["topic"],
+            data["event_id"],
+            data["source"],
+            data["payload"],
+        )
+        if payload is not None:
+            ts_us = to_epoch_micros(datetime.fromisoformat(data["timestamp"]))
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError(f"malformed export line: {exc}") from None
+    if not all(isinstance(value, str) and value for value in (topic, event_id)):
+        raise ValueError("topic and event_id must be non-empty strings")
+    processed_at = _parse_processed_at(data.get("processed_at"))
+    if payload is None:
+        if processed_at is None:
+            raise ValueError("a line without payload needs processed_at")
+        return topic, event_id, None, None, None, processed_at
+    if not (isinstance(source, str) and source):
+        raise ValueError("source must be a non-empty string")
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be an object")
+    return topic, event_id, ts_us, source, encode_payload(payload), processed_at
+
+
+def _parse_processed_at(value: object) -> Optional[str]:
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError("processed_at must be an ISO-8601 string")
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"malformed processed_at: {value!r}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def iter_export(
+    store: AnyDedupStore,
+    *,
+    topic: Optional[str] = None,
+    since_us: Optional[int] = None,
+    until_us: Optional[int] = None,
+    chunk_size: int = EXPORT_CHUNK,
+) -> Iterator[list[ExportRow]]:
+    """Yield exported rows in ``(topic, event_id)`` order, ``chunk_size`` at a time."""
+    after: tuple[str, str] | None = None
+    while True:
+        rows = store.export_rows(
+            after, chunk_size, topic=topic, since_us=since_us, until_us=until_us
+        )
+        if not rows:
+            return
+        yield rows
+        after = (rows[-1][0], rows[-1][1])
+
+
+def read_export(lines: Iterable[bytes], chunk_size: int = EXPORT_CHUNK) -> Iterator[list[ExportRow]]:
+    """Parse NDJSON lines into chunks of rows; errors name the line number."""
+    chunk: list[ExportRow] = []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            chunk.append(parse_export_line(line))
+        except ValueError as exc:
+            raise ValueError(f"line {line_no}: {exc}") from None
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_chunks(
+    store: AnyDedupStore, chunks: Iterable[list[ExportRow]], *, defer_indexes: bool = False
+) -> int:
+    """Import chunks of rows, one transaction each; return how many were new."""
+    added = 0
+    with store.deferred_indexes() if defer_indexes else nullcontext():
+        for rows in chunks:
+            added += store.import_rows(rows)
+    return added
+
+
+def _open(path: Path, mode: str) -> IO[bytes]:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode)  # type: ignore[return-value]
+    return open(path, mode)
+
+
+def _micros(value: Optional[str]) -> Optional[int]:
+    return to_epoch_micros(datetime.fromisoformat(value)) if value else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Dedup store snapshots and NDJSON export/import")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("backup", "Consistent hot copy of the store (SQLite online backup)"),
+        ("export", "Write stored events as NDJSON"),
+        ("import", "Load an NDJSON export into a store"),
+    ):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--db", type=Path, required=True, help="DEDUP_DB_PATH of the store")
+        cmd.add_argument("--shards", type=int, default=1, help="DEDUP_SHARDS of the store")
+        if name == "backup":
+            cmd.add_argument("--target", type=Path, required=True)
+        elif name == "export":
+            cmd.add_argument("--out", type=Path, required=True)
+            cmd.add_argument("--topic")
+            cmd.add_argument("--since", help="ISO 8601, inclusive")
+            cmd.add_argument("--until", help="ISO 8601, exclusive")
+        else:
+            cmd.add_argument("--input", type=Path, required=True)
+            cmd.add_argument("--defer-indexes", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    store = open_store(args.db, args.shards)
+    started = time.perf_counter()
+    try:
+        if args.command == "backup":
+            pages = store.backup(args.target)
+            summary = f"Backed up {pages} pages to {args.target}"
+        elif args.command == "export":
+            count = 0
+            with _open(args.out, "wb") as out:
+                for rows in iter_export(
+                    store,
+                    topic=args.topic,
+                    since_us=_micros(args.since),
+                    until_us=_micros(args.until),
+                ):
+                    out.write(b"".join(export_line(row) for row in rows))
+                    count += len(rows)
+            summary = f"Exported {count} events to {args.out}"
+        else:
+            with _open(args.input, "rb") as source:
+                added = import_chunks(
+                    store, read_export(source), defer_indexes=args.defer_indexes
+                )
+            summary = f"Imported {added} new events from {args.input}"
+    finally:
+        store.close()
+    print(f"{summary} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""Async adapter that owns the threads talking to the dedup store.
+
+``asyncio.to_thread`` sends every store call to the loop's shared default
+executor, where ingest writes, ``/events`` reads and anything else offloaded
+by the app compete for the same threads, and the writes then serialise on the
+store's writer lock anyway. :class:`StoreExecutor` instead runs
+
+* one writer thread fed by a FIFO of pending operations. Consecutive
+  ``mark_processed_many`` calls that queued up while the previous transaction
+  was running are merged into a single store call (one transaction) and the
+  results are split back per caller;
+* a separately sized pool of reader threads, matching the store's pool of
+  read-only connections.
+
+Every operation records when a thread picked it up, so the loop side can
+observe executor queueing time next to the store call duration. Results are
+handed back with ``call_soon_threadsafe`` and instruments are only updated on
+the loop, like everywhere else in :mod:`src.metrics`. Writers that pass a
+``timing`` list (traced requests, see :mod:`src.tracing`) get the enqueue,
+start and finish times of their writer call appended to it.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence, TypeVar
+
+from .dedup_store import EventRecord
+from .metrics import IngestMetrics
+from .sharding import AnyDedupStore
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+class _WriteOp:
+    """A queued writer-thread call; ``fn`` is None for a coalescible insert."""
+
+    __slots__ = ("fn", "records", "hints", "duplicates", "future", "enqueued_at", "timing")
+
+    def __init__(
+        self,
+        fn: Callable[[], Any] | None,
+        records: Sequence[EventRecord],
+        hints: Sequence[bool] | None,
+        future: asyncio.Future[Any],
+        timing: list[float] | None = None,
+        duplicates: Sequence[EventRecord] = (),
+    ) -> None:
+        self.fn = fn
+        self.records = records
+        self.hints = hints
+        self.duplicates = duplicates
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.timing = timing
+
+
+def _resolve(future: asyncio.Future[Any], result: Any, error: BaseException | None) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class StoreExecutor:
+    """One coalescing writer thread plus a reader pool in front of a store."""
+
+    def __init__(
+        self,
+        store: AnyDedupStore,
+        *,
+        reader_threads: int = 4,
+        coalesce_max: int = 2048,
+        metrics: IngestMetrics | None = None,
+    ) -> None:
+        self._store = store
+        self._reader_threads = max(1, reader_threads)
+        self._coalesce_max = max(1, coalesce_max)
+        self._metrics = metrics or IngestMetrics(enabled=False)
+        self._queue: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        self._writer: threading.Thread | None = None
+        self._readers: ThreadPoolExecutor | None = None
+        # Operations handed to the writer thread and not yet answered.
+        self._write_backlog = 0
+        # Set once a BaseException killed the writer thread; writes fail fast.
+        self._writer_died: BaseException | None = None
+
+    def write_backlog(self) -> int:
+        """Writer operations queued or running."""
+        return self._write_backlog
+
+    async def mark_processed_many(
+        self,
+        records: Sequence[EventRecord],
+        known_new: Sequence[bool] | None = None,
+        *,
+        duplicates: Sequence[EventRecord] = (),
+        timing: list[float] | None = None,
+    ) -> list[bool]:
+        """``store.mark_processed_many`` on the writer thread, merged with its neighbours."""
+        if not records and not duplicates:
+            return []
+        return await self._submit(
+            _WriteOp(None, records, known_new, self._future(), timing, duplicates)
+        )
+
+    async def write(
+        self, fn: Callable[..., T], *args: Any, timing: list[float] | None = None
+    ) -> T:
+        """Run any other write (pruning, vacuum) on the writer thread, in order."""
+        return await self._submit(
+            _WriteOp(functools.partial(fn, *args), (), None, self._future(), timing)
+        )
+
+    async def read(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a read-only store call on the reader pool."""
+        if self._readers is None:
+            self._readers = ThreadPoolExecutor(
+                self._reader_threads, thread_name_prefix="store-reader"
+            )
+        enqueued_at = time.perf_counter()
+        started, result = await asyncio.get_running_loop().run_in_executor(
+            self._readers, _timed, functools.partial(fn, *args, **kwargs)
+        )
+        self._metrics.store_read_queue_wait.observe(started - enqueued_at)
+        return result
+
+    def close(self) -> None:
+        """Finish queued writes and stop every thread; later calls start fresh ones."""
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            # A thread that died on a BaseException never takes its _STOP;
+            # it must not stop the next one.
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._writer = None
+        self._writer_died = None
+        if self._readers is not None:
+            self._readers.shutdown(wait=True)
+            self._readers = None
+
+    @staticmethod
+    def _future() -> asyncio.Future[Any]:
+        return asyncio.get_running_loop().create_future()
+
+    async def _submit(self, op: _WriteOp) -> Any:
+        if self._writer_died is not None:
+            raise RuntimeError("store writer thread died") from self._writer_died
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name="store-writer", daemon=True)
+            self._writer.start()
+        self._write_backlog += 1
+        self._queue.put(op)
+        return await op.future
+
+    def _run(self) -> None:
+        """Writer thread: drain the FIFO, coalescing runs of inserts."""
+        pending = self._queue
+        carry: Any = None
+        while True:
+            op = carry if carry is not None else pending.get()
+            carry = None
+            if op is _STOP:
+                return
+            if op.fn is not None:
+                self._run_call(op)
+                continue
+            batch = [op]
+            size = len(op.records)
+            # Only take what is already queued: never wait to grow a batch.
+            while size < self._coalesce_max:
+                try:
+                    nxt = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP or nxt.fn is not None:
+                    carry = nxt
+                    break
+                batch.append(nxt)
+                size += len(nxt.records)
+            self._run_inserts(batch)
+
+    def _run_call(self, op: _WriteOp) -> None:
+        started = time.perf_counter()
+        result: Any = None
+        error: BaseException | None = None
+        try:
+            result = op.fn()
+        except BaseException as exc:  # handed to the awaiting coroutine
+            error = exc
+        finished = time.perf_counter()
+        self._finish([op], [result], error, started, finished)
+
+    def _run_inserts(self, batch: list[_WriteOp]) -> None:
+        if len(batch) == 1:
+            records = batch[0].records
+            hints = batch[0].hints
+            duplicates = batch[0].duplicates
+        else:
+            records = [record for op in batch for record in op.records]
+            duplicates = [record for op in batch for record in op.duplicates]
+            hints = None
+            if any(op.hints is not None for op in batch):
+                # The store bulk-inserts hinted rows before probing the rest, so a
+                # hint is only kept if no earlier caller in the merge has the key.
+                hints = []
+                seen: set[tuple[str, str]] = set()
+                for op in batch:
+                    op_hints = op.hints if op.hints is not None else [False] * len(op.records)
+                    for record, hint in zip(op.records, op_hints):
+                        key = (record[0], record[1])
+                        hints.append(hint and key not in seen)
+                        seen.add(key)
+        started = time.perf_counter()
+        results: list[Any] = []
+        error: BaseException | None = None
+        try:
+            flags = self._store.mark_processed_many(records, hints, duplicates)
+        except BaseException as exc:
+            error = exc
+        else:
+            offset = 0
+            for op in batch:
+                results.append(flags[offset : offset + len(op.records)])
+                offset += len(op.records)
+        finished = time.perf_counter()
+        self._finish(batch, results, error, started, finished)
+
+    def _finish(
+        self,
+        batch: list[_WriteOp],
+        results: list[Any],
+        error: BaseException | None,
+        started: float,
+        finished: float,
+    ) -> None:
+        """Hand a writer call's outcome to the loop; re-raise what must end the thread.
+
+        A ``BaseException`` (``KeyboardInterrupt``, ``SystemExit``) still
+        reaches its callers first, and every write queued behind it fails
+        instead of waiting for a thread that is gone.
+        """
+        loop = batch[0].future.get_loop()
+        loop.call_soon_threadsafe(self._settle, batch, results, error, started, finished)
+        if error is not None and not isinstance(error, Exception):
+            loop.call_soon_threadsafe(self._fail_queued, error)
+            raise error
+
+    def _fail_queued(self, error: BaseException) -> None:
+        """Loop side of a dead writer thread: fail whatever is still queued."""
+        self._writer_died = error
+        failure = RuntimeError("store writer thread died")
+        failure.__cause__ = error
+        while True:
+            try:
+                op = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if op is not _STOP:
+                self._write_backlog -= 1
+                _resolve(op.future, None, failure)
+
+    def _settle(
+        self,
+        batch: list[_WriteOp],
+        results: list[Any],
+        error: BaseException | None,
+        started: float,
+        finished: float,
+    ) -> None:
+        """Loop side of a finished writer call: record timings, wake the callers."""
+        self._write_backlog -= len(batch)
+        metrics = self._metrics
+        metrics.store_queue_wait.observe_many(started - op.enqueued_at for op in batch)
+        if batch[0].fn is None:
+            metrics.store_latency.observe(finished - started)
+            metrics.store_coalesced_calls.observe(len(batch))
+        for op in batch:
+            if op.timing is not None:
+                op.timing.extend((op.enqueued_at, started, finished))
+        if error is not None:
+            for op in batch:
+                _resolve(op.future, None, error)
+            return
+        for op, result in zip(batch, results):
+            _resolve(op.future, result, None)
+
+
+def _timed(fn: Callable[[], T]) -> tuple[float, T]:
+    """Reader-thread wrapper reporting when the call was picked up."""
+    return time.perf_counter(), fn()
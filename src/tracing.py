@@ -0,0 +1,160 @@
+"""Sampled per-request traces of the ingest path.
+
+A sampled ``/publish`` request gets a :class:`Trace` that its events carry
+through the pipeline. Each stage stamps a span on it:
+
+``parse``
+    validating the request body into events (``main.publish``);
+``admit``
+    admission control, the ingest log append and the enqueue
+    (``AggregatorService.submit_records``);
+``ack_wait``
+    waiting for ``ack=durable``/``committed`` before answering;
+``queue_wait``
+    sitting in a partition queue until a worker picked the batch up;
+``prefilter``
+    the duplicate pre-filter pass of the worker;
+``store_queue`` / ``store_commit``
+    waiting for the store writer thread and the (coalesced)
+    ``DedupStore.mark_processed_many`` transaction;
+``record``
+    counters, versions and live subscribers after the commit.
+
+Worker stages are stamped once per batch that held events of the request,
+so a request split over several batches or partitions shows one span per
+batch. A trace is finished when the request has answered and all of its
+admitted events are committed; the slowest ``keep`` finished traces are
+kept in a min-heap, so a new trace only displaces a faster one.
+
+Everything happens on the event loop thread (store timings are taken on the
+writer thread and handed back with the result), so there is no locking. With
+a sample rate of 0 no trace is ever created and the ingest path only checks
+for ``None``.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+
+# The trace of the request being handled; set by the route, read at admission.
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Spans of one sampled request, as ``(name, start, end, events)`` tuples."""
+
+    __slots__ = (
+        "trace_id",
+        "route",
+        "events",
+        "started",
+        "finished",
+        "enqueued_at",
+        "spans",
+        "pending",
+        "sealed",
+        "_tracer",
+    )
+
+    def __init__(self, tracer: Tracer, trace_id: int, route: str, started: float) -> None:
+        self._tracer = tracer
+        self.trace_id = trace_id
+        self.route = route
+        self.events = 0
+        self.started = started
+        self.finished = 0.0
+        # When the last admitted events of the request were queued.
+        self.enqueued_at = started
+        self.spans: list[tuple[str, float, float, int]] = []
+        # Admitted events not yet committed.
+        self.pending = 0
+        self.sealed = False
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+    def span(self, name: str, start: float, end: float, events: int = 0) -> None:
+        self.spans.append((name, start, end, events))
+
+    def settle(self, count: int) -> None:
+        """``count`` of the request's queued events were committed."""
+        self.pending -= count
+        self._maybe_finish()
+
+    def seal(self) -> None:
+        """The request has answered; finish once its queued events are committed."""
+        self.sealed = True
+        self._maybe_finish()
+
+    def _maybe_finish(self) -> None:
+        if self.sealed and self.pending <= 0 and not self.finished:
+            self.finished = time.perf_counter()
+            self._tracer.finish(self)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "route": self.route,
+            "events": self.events,
+            "total_ms": round(self.duration * 1000, 3),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((start - self.started) * 1000, 3),
+                    "duration_ms": round((end - start) * 1000, 3),
+                    "events": events,
+                }
+                for name, start, end, events in sorted(self.spans, key=lambda span: span[1])
+            ],
+        }
+
+
+class Tracer:
+    """Samples requests and keeps the slowest ``keep`` finished traces."""
+
+    def __init__(self, sample_rate: float = 0.0, keep: int = 50) -> None:
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.enabled = self.sample_rate > 0
+        self._keep = max(1, keep)
+        self._ids = itertools.count(1)
+        # Min-heap on duration: the root is the fastest trace still kept.
+        self._slowest: list[tuple[float, int, Trace]] = []
+        self.sampled = 0
+        self.finished = 0
+
+    def start(self, route: str, started: float | None = None) -> Trace | None:
+        """A new trace if this request is sampled, else None."""
+        if not self.enabled or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return None
+        self.sampled += 1
+        started = time.perf_counter() if started is None else started
+        return Trace(self, next(self._ids), route, started)
+
+    def finish(self, trace: Trace) -> None:
+        self.finished += 1
+        entry = (trace.duration, trace.trace_id, trace)
+        if len(self._slowest) < self._keep:
+            heapq.heappush(self._slowest, entry)
+        elif entry[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self, limit: int | None = None) -> list[dict[str, Any]]:
+        """Kept traces, slowest first."""
+        ranked = sorted(self._slowest, key=lambda entry: entry[0], reverse=True)
+        return [trace.as_dict() for _, _, trace in ranked[:limit]]
+
+    def clear(self) -> None:
+        self._slowest.clear()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "sample_rate": self.sample_rate,
+            "sampled": float(self.sampled),
+            "finished": float(self.finished),
+            "kept": float(len(self._slowest)),
+        }
@@ -0,0 +1,507 @@
+"""Multi-process deployment: HTTP front ends feeding one writer process.
+
+SQLite allows a single writer and the service keeps its counters in memory, so
+running several uvicorn workers that each build an ``AggregatorService`` would
+split the stats and contend for the database lock. In multi-process mode the
+uvicorn workers are thin front ends: they parse and validate requests and
+forward events over a Unix socket to one writer, which owns the
+``DedupStore``, the partition queues and every counter. ``/stats`` and
+``/metrics`` therefore report the same totals whichever front end answers.
+
+Frames are a 4-byte big-endian length followed by a pickle. Both ends are this
+code base on one host and the socket is created with mode ``0600``. Requests
+are ``(request_id, op, args, publish_latencies)`` and replies
+``(request_id, status, value)``; requests are answered concurrently, so one
+connection per front end carries all of its in-flight calls. After a
+``subscribe`` request the writer also pushes ``(-1, "push", items)`` frames
+with every newly committed event, which the front end fans out to its own
+SSE/WebSocket subscribers.
+
+Run ``python -m src.main`` with ``FRONTEND_PROCESSES=N`` to host the writer in
+the uvicorn supervisor process, or ``python -m src.writer`` for a standalone
+writer with front ends started separately (``WRITER_SOCKET`` set).
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import pickle
+import signal
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from .admission import AdmissionRejected
+from .config import Settings
+from .dedup_store import EventKey, EventRecord, LazyEventRecord
+from .fanout import FanoutHub, LiveEvent, Notice, SubscriptionClosed
+from .models import Event, Rollups, Stats
+from .payload_codec import DecodedPayload
+from .service import AggregatorService, EventQueries, create_service, event_record
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">I")
+PUBLISH_LATENCY_BUFFER = 10000
+PUSH_REQUEST_ID = -1
+
+
+def default_socket_path(settings: Settings) -> Path:
+    """Socket next to the database, e.g. ``data/dedup.writer.sock``."""
+    if settings.writer_socket:
+        return Path(settings.writer_socket)
+    return settings.resolved_database_path().with_suffix(".writer.sock")
+
+
+def _frame(message: Any) -> bytes:
+    body = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(len(body)) + body
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Any:
+    header = await reader.readexactly(_HEADER.size)
+    return pickle.loads(await reader.readexactly(_HEADER.unpack(header)[0]))
+
+
+def _decoded_rows(rows: List[LazyEventRecord]) -> list[tuple[str, str, int, str, str]]:
+    return [
+        (topic, event_id, ts_us, source, payload.decode())
+        for topic, event_id, ts_us, source, payload in rows
+    ]
+
+
+class WriterServer:
+    """Serves an :class:`AggregatorService` to front-end processes over a Unix socket."""
+
+    def __init__(self, aggregator: AggregatorService, socket_path: Path) -> None:
+        self._aggregator = aggregator
+        self._socket_path = Path(socket_path)
+        self._server: asyncio.AbstractServer | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._pumps: dict[asyncio.StreamWriter, asyncio.Task[None]] = {}
+        self._handlers: dict[str, Callable[..., Awaitable[Any]]] = {
+            "submit": self._submit,
+            "submit_sync": self._aggregator.submit_records_sync,
+            "load_events": self._load_events,
+            "stats": self._stats,
+            "rollups": self._rollups,
+            "events_version": self._aggregator.events_version,
+            "stats_version": self._aggregator.stats_version,
+            "metrics": self._aggregator.render_metrics,
+        }
+        aggregator.metrics.add_gauge(
+            "aggregator_frontend_connections",
+            "Front-end processes connected to the writer.",
+            lambda: [({}, len(self._connections))],
+        )
+
+    async def start(self) -> None:
+        # A socket file left by a crashed writer would make bind() fail.
+        self._socket_path.unlink(missing_ok=True)
+        self._socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._serve, path=str(self._socket_path))
+        os.chmod(self._socket_path, 0o600)
+        logger.info("Writer listening on %s", self._socket_path)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+        self._socket_path.unlink(missing_ok=True)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await _read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                # Requests run concurrently; an admission wait must not stall
+                # the stats or reads multiplexed on the same connection.
+                task = asyncio.create_task(self._answer(request, writer))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            self._connections.discard(writer)
+            pump = self._pumps.pop(writer, None)
+            if pump is not None:
+                pump.cancel()
+            writer.close()
+
+    def _subscribe(self, writer: asyncio.StreamWriter) -> None:
+        """Start pushing commits to this front end (idempotent per connection)."""
+        if writer not in self._pumps:
+            self._pumps[writer] = asyncio.create_task(self._push(writer), name="writer-push")
+
+    async def _push(self, writer: asyncio.StreamWriter) -> None:
+        # One wildcard subscription per front end; it filters by topic locally.
+        hub = self._aggregator.hub
+        subscription = hub.subscribe(None)
+        try:
+            closed = False
+            while not closed and not writer.is_closing():
+                try:
+                    items, dropped = await subscription.get()
+                except SubscriptionClosed:
+                    items, dropped, closed = [Notice("disconnected", {})], 0, True
+                if dropped:
+                    items.insert(0, Notice("dropped", {"count": dropped}))
+                writer.write(_frame((PUSH_REQUEST_ID, "push", items)))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            hub.unsubscribe(subscription)
+
+    async def _answer(
+        self, request: tuple[int, str, tuple, list[float]], writer: asyncio.StreamWriter
+    ) -> None:
+        request_id, op, args, latencies = request
+        if latencies:
+            self._aggregator.metrics.publish_latency.observe_many(latencies)
+        try:
+            if op == "subscribe":
+                # Needs the connection itself rather than a return value.
+                value = self._subscribe(writer)
+            else:
+                value = await self._handlers[op](*args)
+            status = "ok"
+        except AdmissionRejected as exc:
+            status, value = "rejected", (exc.reason, exc.retry_after, exc.accepted)
+        except Exception as exc:
+            logger.exception("Writer request %s failed", op)
+            status, value = "error", f"{type(exc).__name__}: {exc}"
+        if writer.is_closing():
+            return
+        writer.write(_frame((request_id, status, value)))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _submit(self, records: list[EventRecord], ack: str) -> tuple[int, int]:
+        # Front ends send finished store rows, so the writer, which every event
+        # has to pass through, does no per-event conversion at all.
+        accepted = await self._aggregator.submit_records(records, ack)
+        return accepted, self._aggregator.retry_after()
+
+    async def _load_events(
+        self, topic: Optional[str], after: Optional[EventKey], limit: Optional[int], filters: dict
+    ) -> list[tuple[str, str, int, str, str]]:
+        rows = await self._aggregator.load_events(topic, after, limit, **filters)
+        # Decompress off the event loop so ingest is not held up by reads.
+        return await asyncio.to_thread(_decoded_rows, rows)
+
+    async def _stats(self) -> dict[str, Any]:
+        return (await self._aggregator.get_stats()).model_dump()
+
+    async def _rollups(self, *args: Any) -> dict[str, Any]:
+        return (await self._aggregator.get_rollups(*args)).model_dump()
+
+
+class _LatencyBuffer:
+    """Publish latencies seen by a front end, shipped with its next writer request."""
+
+    def __init__(self, limit: int) -> None:
+        self._limit = limit
+        self._values: list[float] = []
+
+    def observe(self, value: float) -> None:
+        if len(self._values) < self._limit:
+            self._values.append(value)
+
+    def drain(self) -> list[float]:
+        values, self._values = self._values, []
+        return values
+
+
+class _FrontendMetrics:
+    """The slice of :class:`IngestMetrics` a front end records itself."""
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.publish_latency = _LatencyBuffer(PUBLISH_LATENCY_BUFFER if enabled else 0)
+
+
+class WriterUnavailable(ConnectionError):
+    """The writer process could not be reached or dropped the connection."""
+
+
+class RemoteAggregator(EventQueries):
+    """Front-end stand-in for :class:`AggregatorService` backed by the writer process."""
+
+    def __init__(
+        self,
+        socket_path: Path,
+        metrics_enabled: bool = True,
+        connect_timeout: float = 30.0,
+        subscriber_buffer: int = 1024,
+        slow_consumer_policy: str = "drop",
+    ) -> None:
+        self.metrics = _FrontendMetrics(metrics_enabled)
+        self.hub = FanoutHub(subscriber_buffer, slow_consumer_policy)
+        # Whether the writer is pushing commits on the current connection.
+        self._live = False
+        self._socket_path = Path(socket_path)
+        self._connect_timeout = connect_timeout
+        self._ids = itertools.count()
+        self._pending: dict[int, asyncio.Future[tuple[str, Any]]] = {}
+        self._writer: asyncio.StreamWriter | None = None
+        self._receiver: asyncio.Task[None] | None = None
+        self._connect_lock = asyncio.Lock()
+        self._retry_after = 1
+
+    async def start(self) -> None:
+        """Connect to the writer, waiting for it to come up if necessary."""
+        await self._connect(self._connect_timeout)
+
+    async def stop(self) -> None:
+        self.hub.close()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._receiver is not None:
+            self._receiver.cancel()
+            await asyncio.gather(self._receiver, return_exceptions=True)
+            self._receiver = None
+
+    async def _connect(self, timeout: float) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(str(self._socket_path))
+                break
+            except (FileNotFoundError, ConnectionRefusedError) as exc:
+                if loop.time() >= deadline:
+                    raise WriterUnavailable(f"writer not reachable at {self._socket_path}") from exc
+                await asyncio.sleep(0.1)
+        self._writer = writer
+        self._receiver = asyncio.create_task(self._receive(reader), name="writer-replies")
+
+    async def _receive(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                request_id, status, value = await _read_frame(reader)
+                if request_id == PUSH_REQUEST_ID:
+                    self._forward(value)
+                    continue
+                future = self._pending.pop(request_id, None)
+                if future is not None and not future.done():
+                    future.set_result((status, value))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.warning("Connection to writer at %s lost", self._socket_path)
+        finally:
+            self._writer = None
+            # Subscribers resume by cursor once a new connection is pushing.
+            self._live = False
+            self.hub.close()
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(WriterUnavailable("writer connection lost"))
+
+    def _forward(self, items: list[LiveEvent | Notice]) -> None:
+        """Hand a pushed batch of commits to the local subscribers."""
+        events = [item for item in items if isinstance(item, LiveEvent)]
+        if events:
+            self.hub.publish(events)
+        for item in items:
+            if isinstance(item, Notice):
+                if item.kind == "disconnected":
+                    self._live = False
+                    self.hub.close()
+                else:
+                    self.hub.broadcast(item)
+
+    async def _attach_live(self) -> None:
+        if not self._live:
+            await self._call("subscribe")
+            self._live = True
+
+    async def _call(self, op: str, *args: Any) -> Any:
+        if self._writer is None:
+            async with self._connect_lock:
+                if self._writer is None:
+                    await self._connect(self._connect_timeout)
+        assert self._writer is not None
+        request_id = next(self._ids)
+        future: asyncio.Future[tuple[str, Any]] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        latencies = self.metrics.publish_latency.drain()
+        self._writer.write(_frame((request_id, op, args, latencies)))
+        await self._writer.drain()
+        status, value = await future
+        if status == "ok":
+            return value
+        if status == "rejected":
+            reason, retry_after, accepted = value
+            self._retry_after = retry_after
+            raise AdmissionRejected(reason, retry_after, accepted)
+        raise RuntimeError(f"writer request {op!r} failed: {value}")
+
+    async def submit_batch(self, events: Iterable[Event], ack: str = "accepted") -> int:
+        records = [event_record(event) for event in events]
+        if not records:
+            return 0
+        accepted, self._retry_after = await self._call("submit", records, ack)
+        return accepted
+
+    async def submit_sync(self, events: Iterable[Event]) -> list[bool]:
+        records = [event_record(event) for event in events]
+        if not records:
+            return []
+        return await self._call("submit_sync", records)
+
+    def retry_after(self) -> int:
+        """``Retry-After`` hint from the writer's most recent reply."""
+        return self._retry_after
+
+    async def load_events(
+        self,
+        topic: Optional[str] = None,
+        after: Optional[EventKey] = None,
+        limit: Optional[int] = None,
+        **filters: Any,
+    ) -> List[LazyEventRecord]:
+        rows = await self._call("load_events", topic, after, limit, filters)
+        return [
+            (topic, event_id, ts_us, source, DecodedPayload(payload))
+            for topic, event_id, ts_us, source, payload in rows
+        ]
+
+    async def events_version(self, topic: Optional[str] = None) -> str:
+        return await self._call("events_version", topic)
+
+    async def stats_version(self) -> str:
+        return await self._call("stats_version")
+
+    async def get_stats(self) -> Stats:
+        return Stats(**await self._call("stats"))
+
+    async def get_rollups(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        series: bool = True,
+    ) -> Rollups:
+        return Rollups(**await self._call("rollups", topic, since, until, series))
+
+    async def render_metrics(self) -> str:
+        return await self._call("metrics")
+
+
+async def serve_writer(
+    aggregator: AggregatorService,
+    socket_path: Path,
+    stopped: asyncio.Event,
+    ready: Callable[[], None] | None = None,
+) -> None:
+    """Run the aggregator and its socket server until ``stopped`` is set."""
+    server = WriterServer(aggregator, socket_path)
+    await aggregator.start()
+    try:
+        await server.start()
+        if ready is not None:
+            ready()
+        await stopped.wait()
+    finally:
+        await server.stop()
+        await aggregator.stop()
+
+
+class WriterThread(threading.Thread):
+    """Hosts the writer on its own event loop inside the uvicorn supervisor."""
+
+    def __init__(self, aggregator: AggregatorService, socket_path: Path) -> None:
+        super().__init__(name="aggregator-writer", daemon=True)
+        self._aggregator = aggregator
+        self._socket_path = socket_path
+        self._ready = threading.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopped: asyncio.Event | None = None
+        self.error: BaseException | None = None
+
+    def run(self) -> None:
+        try:
+            asyncio.run(self._main())
+        except BaseException as exc:
+            self.error = exc
+            logger.exception("Writer thread failed")
+        finally:
+            self._ready.set()
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        await serve_writer(self._aggregator, self._socket_path, self._stopped, self._ready.set)
+
+    def wait_ready(self) -> None:
+        self._ready.wait()
+        if self.error is not None:
+            raise RuntimeError("writer failed to start") from self.error
+
+    def stop(self) -> None:
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+        self.join()
+
+
+def run_with_frontends(
+    aggregator: AggregatorService, close_store: Callable[[], None], settings: Settings
+) -> None:
+    """Host the writer here and serve HTTP from ``frontend_processes`` uvicorn workers."""
+    import uvicorn
+
+    socket_path = default_socket_path(settings)
+    writer = WriterThread(aggregator, socket_path)
+    writer.start()
+    writer.wait_ready()
+    # uvicorn workers import src.main afresh; this makes them front ends.
+    os.environ["WRITER_SOCKET"] = str(socket_path)
+    try:
+        uvicorn.run(
+            "src.main:app",
+            host=settings.http_host,
+            port=settings.http_port,
+            workers=settings.frontend_processes,
+        )
+    finally:
+        writer.stop()
+        close_store()
+
+
+def main() -> None:
+    """Standalone writer: ``python -m src.writer`` (front ends set ``WRITER_SOCKET``)."""
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s"
+    )
+    settings = Settings()
+    aggregator, dedup_store = create_service(settings)
+
+    async def run() -> None:
+        stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stopped.set)
+        await serve_writer(aggregator, default_socket_path(settings), stopped)
+
+    try:
+        asyncio.run(run())
+    finally:
+        dedup_store.close()
+
+
+if __name__ == "__main__":
+    main()
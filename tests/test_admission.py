@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from src.admission import AdmissionController, AdmissionRejected
+from src.config import Settings
+from src.dedup_store import DedupStore
+from src.main import create_app
+from src.models import Event
+from src.service import AggregatorService
+
+
+def _events(count: int) -> list[Event]:
+    now = datetime.now(timezone.utc)
+    return [
+        Event(topic="t", event_id=f"evt-{idx}", timestamp=now, source="pub", payload={})
+        for idx in range(count)
+    ]
+
+
+def _service(tmp_path, **admission) -> AggregatorService:
+    # Workers are never started, so everything submitted stays queued.
+    return AggregatorService(
+        DedupStore(tmp_path / "dedup.sqlite"), admission=AdmissionController(**admission)
+    )
+
+
+@pytest.mark.asyncio
+async def test_reject_policy_refuses_whole_batch_over_high_water(tmp_path) -> None:
+    service = _service(tmp_path, policy="reject", high_water=3)
+    assert await service.submit_batch(_events(2)) == 2
+
+    with pytest.raises(AdmissionRejected) as info:
+        await service.submit_batch(_events(2))
+    assert info.value.reason == "high_water"
+    assert info.value.accepted == 0
+    assert info.value.retry_after >= 1
+
+    stats = await service.get_stats()
+    assert stats.received == 2
+    assert stats.admission["rejected_high_water"] == 1
+
+
+@pytest.mark.asyncio
+async def test_partial_policy_accepts_prefix(tmp_path) -> None:
+    service = _service(tmp_path, policy="partial", high_water=3)
+    assert await service.submit_batch(_events(5)) == 3
+    with pytest.raises(AdmissionRejected):
+        await service.submit_batch(_events(1))
+    assert (await service.get_stats()).admission["partial"] == 1
+
+
+@pytest.mark.asyncio
+async def test_block_policy_times_out_with_deadline(tmp_path) -> None:
+    service = _service(tmp_path, policy="block", high_water=2, block_timeout=0.05)
+    with pytest.raises(AdmissionRejected) as info:
+        await service.submit_batch(_events(3))
+    assert info.value.reason == "timeout"
+    assert info.value.accepted == 2
+
+
+@pytest.mark.asyncio
+async def test_latency_target_only_rejects_while_work_is_waiting(tmp_path) -> None:
+    service = _service(tmp_path, latency_target=0.001)
+    # One slow commit; the smoothed latency stays high until the next one.
+    service._admission.record_commit(10, 0.025)
+    assert await service.submit_batch(_events(1)) == 1
+    with pytest.raises(AdmissionRejected) as info:
+        await service.submit_batch(_events(1))
+    assert info.value.reason == "latency"
+
+    await service.start()
+    try:
+        await service.join()
+        # Idle again: the stale sample no longer blocks publishes.
+        assert service._admission.commit_latency > 0.001
+        assert await service.submit_batch(_events(2)) == 2
+        await service.join()
+        assert len(await service.submit_sync(_events(3))) == 3
+    finally:
+        await service.stop()
+
+
+@pytest.mark.asyncio
+async def test_publish_returns_429_with_retry_after(tmp_path) -> None:
+    settings = Settings(
+        database_path=tmp_path / "dedup.sqlite",
+        admission_policy="reject",
+        admission_high_water=1,
+    )
+    app = create_app(settings)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        events = [
+            {
+                "topic": "t",
+                "event_id": f"evt-{idx}",
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "source": "pub",
+                "payload": {},
+            }
+            for idx in range(2)
+        ]
+        response = await client.post("/publish", json=events)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.json()["reason"] == "high_water"
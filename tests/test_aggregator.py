@@ -1,6 +1,7 @@
 import asyncio
+import json
 import time
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any, Callable, Dict
 
 import httpx
@@ -65,6 +66,7 @@ async def test_deduplication(client: httpx.AsyncClient) -> None:
         lambda data: data["received"] >= 2 and data["duplicate_dropped"] >= 1,
     )
     assert stats["unique_processed"] == 1
+    assert len(stats["queue_depths"]) == 2
 
     events_resp = await client.get("/events", params={"topic": "orders"})
     events = events_resp.json()
@@ -72,6 +74,35 @@ async def test_deduplication(client: httpx.AsyncClient) -> None:
     assert events[0]["event_id"] == "evt-1"
 
 
+@pytest.mark.asyncio
+async def test_sync_publish_reports_each_event(client: httpx.AsyncClient) -> None:
+    def event(event_id: str) -> Dict[str, Any]:
+        return {
+            "topic": "orders",
+            "event_id": event_id,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "source": "publisher",
+            "payload": {"id": event_id},
+        }
+
+    await client.post("/publish", params={"ack": "committed"}, json=event("a"))
+    resp = await client.post(
+        "/publish", params={"sync": "true"}, json=[event("a"), event("b"), event("b")]
+    )
+    assert resp.json() == {
+        "accepted": 3,
+        "duplicates": 2,
+        "results": ["duplicate", "new", "duplicate"],
+    }
+    # Already counted when the response arrives: no polling needed.
+    stats = (await client.get("/stats")).json()
+    assert stats["received"] == 4
+    assert stats["unique_processed"] == 2
+    assert stats["duplicate_dropped"] == 2
+    events = (await client.get("/events", params={"topic": "orders"})).json()
+    assert [e["event_id"] for e in events] == ["a", "b"]
+
+
 @pytest.mark.asyncio
 async def test_persistence_across_restart(tmp_path) -> None:
     settings = Settings(database_path=tmp_path / "dedup.sqlite", worker_count=1)
@@ -98,6 +129,8 @@ async def test_persistence_across_restart(tmp_path) -> None:
     transport2 = httpx.ASGITransport(app=app2)
     try:
         async with httpx.AsyncClient(transport=transport2, base_url="http://test") as client2:
+            warmed = await wait_for_stats(client2, lambda data: data["prefilter"]["ready"] == 1)
+            assert warmed["prefilter"]["bloom_keys"] == 1
             await client2.post("/publish", json=event)
             stats = await wait_for_stats(
                 client2,
@@ -193,3 +226,152 @@ async def test_stress_batch_processing(client: httpx.AsyncClient) -> None:
         timeout=5.0,
     )
     assert stats["duplicate_dropped"] >= total_events - unique_ids
+
+
+@pytest.mark.asyncio
+async def test_event_pagination_and_ndjson_stream(client: httpx.AsyncClient) -> None:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+    events = [
+        {
+            "topic": "paged",
+            "event_id": f"evt-{idx}",
+            "timestamp": datetime.fromtimestamp(base + idx, timezone.utc).isoformat(),
+            "source": "pub",
+            "payload": {"seq": idx},
+        }
+        for idx in range(5)
+    ]
+    await client.post("/publish", json=events)
+    await wait_for_stats(client, lambda data: data["unique_processed"] >= 5)
+
+    seen: list[str] = []
+    cursor = None
+    while True:
+        params: Dict[str, Any] = {"topic": "paged", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        resp = await client.get("/events", params=params)
+        assert resp.status_code == 200
+        seen.extend(item["event_id"] for item in resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [f"evt-{idx}" for idx in range(5)]
+
+    resp = await client.get("/events", params={"topic": "paged", "format": "ndjson"})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["payload"]["seq"] for line in lines] == list(range(5))
+
+    ranged = await client.get(
+        "/events",
+        params={
+            "topic": "paged",
+            "source": "pub",
+            "since": events[1]["timestamp"],
+            "until": events[3]["timestamp"],
+        },
+    )
+    assert [item["event_id"] for item in ranged.json()] == ["evt-1", "evt-2"]
+
+    bad = await client.get("/events", params={"cursor": "not-a-cursor"})
+    assert bad.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_publish_ndjson_reports_errors_per_line(client: httpx.AsyncClient) -> None:
+    now = datetime.now(timezone.utc).isoformat()
+    lines = [
+        json.dumps(
+            {"topic": "nd", "event_id": "evt-1", "timestamp": now, "source": "pub", "payload": {}}
+        ),
+        json.dumps({"topic": "nd", "event_id": "evt-2", "timestamp": now, "source": "pub"}),
+        "{not json",
+        json.dumps(
+            {"topic": "nd", "event_id": "evt-1", "timestamp": now, "source": "pub", "payload": {}}
+        ),
+        json.dumps(
+            {"topic": "nd", "event_id": "evt-3", "timestamp": "x", "source": "pub", "payload": {}}
+        ),
+    ]
+    resp = await client.post(
+        "/publish/ndjson",
+        content="\n".join(lines).encode(),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["accepted"] == 2
+    assert body["rejected"] == 3
+    assert [error["line"] for error in body["errors"]] == [2, 3, 5]
+
+    stats = await wait_for_stats(
+        client, lambda data: data["unique_processed"] >= 1 and data["duplicate_dropped"] >= 1
+    )
+    assert stats["unique_processed"] == 1
+
+    invalid = await client.post("/publish/ndjson", content=b'{"topic": "nd"}\n')
+    assert invalid.status_code == 422
+
+    # Lines split across many small network chunks, one of them very long.
+    long_line = json.dumps(
+        {
+            "topic": "nd",
+            "event_id": "evt-long",
+            "timestamp": now,
+            "source": "pub",
+            "payload": {"blob": "x" * 50_000},
+        }
+    )
+    body_bytes = ("\n".join([lines[0], long_line, "", lines[2]]) + "\n").encode()
+
+    async def trickle():
+        for start in range(0, len(body_bytes), 7):
+            yield body_bytes[start : start + 7]
+
+    chunked = await client.post("/publish/ndjson", content=trickle())
+    assert chunked.json()["accepted"] == 2
+    assert [error["line"] for error in chunked.json()["errors"]] == [4]
+
+
+@pytest.mark.asyncio
+async def test_retention_forgets_keys_and_prunes_events(tmp_path) -> None:
+    settings = Settings(
+        database_path=tmp_path / "dedup.sqlite",
+        worker_count=2,
+        dedup_retention_days=1,
+        event_retention_days=7,
+        retention_chunk_size=2,
+    )
+    app = create_app(settings)
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            aggregator = app.state.aggregator
+            now = datetime.now(timezone.utc)
+            old = (now - timedelta(days=30)).isoformat()
+            events = [
+                {"topic": "t", "event_id": f"evt-{idx}", "timestamp": ts, "source": "pub",
+                 "payload": {}}
+                for idx, ts in enumerate([old, old, old, now.isoformat()])
+            ]
+            await client.post("/publish", json=events)
+            await wait_for_stats(client, lambda data: data["unique_processed"] == 4)
+
+            # Nothing is old enough to forget yet; only the stale payloads go.
+            assert await aggregator.run_retention() == (0, 3)
+            assert [e["event_id"] for e in (await client.get("/events")).json()] == ["evt-3"]
+
+            assert await aggregator.run_retention(now + timedelta(days=8)) == (4, 1)
+            stats = (await client.get("/stats")).json()
+            assert stats["unique_processed"] == 4
+            assert stats["retention"]["dedup_pruned"] == 4
+            assert stats["retention"]["events_pruned"] == 4
+
+            # Forgotten keys are no longer treated as duplicates.
+            await client.post("/publish", json=events[3])
+            stats = await wait_for_stats(client, lambda data: data["unique_processed"] == 5)
+            assert stats["duplicate_dropped"] == 0
+    finally:
+        await app.router.shutdown()
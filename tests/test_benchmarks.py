@@ -0,0 +1,98 @@
+"""Micro benchmarks for hot paths; run with ``pytest -m benchmark``.
+
+Budgets are deliberately loose (roughly 10x the numbers measured on a laptop)
+so they only trip on real regressions such as a lost index or per-row commits.
+"""
+import statistics
+import time
+from typing import Callable
+
+import pytest
+
+from src.dedup_store import DedupStore
+from src.models import PublishRequest
+
+pytestmark = pytest.mark.benchmark
+
+TS_US = 1_735_689_600_000_000
+
+
+def _median_seconds(fn: Callable[[], object], rounds: int = 7) -> float:
+    fn()  # warm caches and statement cache
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+@pytest.fixture
+def populated_store(tmp_path):
+    store = DedupStore(tmp_path / "bench.sqlite")
+    records = [
+        (f"topic-{idx % 20}", f"evt-{idx}", TS_US + idx, f"src-{idx % 5}", '{"seq": %d}' % idx)
+        for idx in range(20000)
+    ]
+    for start in range(0, len(records), 5000):
+        store.mark_processed_many(records[start : start + 5000])
+    yield store
+    store.close()
+
+
+def test_mark_processed_single_event(tmp_path) -> None:
+    store = DedupStore(tmp_path / "bench.sqlite")
+    counter = iter(range(10**9))
+
+    def insert() -> None:
+        seq = next(counter)
+        store.mark_processed("bench", f"evt-{seq}", TS_US + seq, "bench", "{}")
+
+    try:
+        elapsed = _median_seconds(insert, rounds=200)
+    finally:
+        store.close()
+    print(f"mark_processed: {elapsed * 1e6:.1f} us/event")
+    assert elapsed < 0.001
+
+
+def test_mark_processed_many_batch(tmp_path) -> None:
+    store = DedupStore(tmp_path / "bench.sqlite")
+    counter = iter(range(10**9))
+
+    def insert_batch() -> None:
+        base = next(counter) * 1000
+        store.mark_processed_many(
+            [("bench", f"evt-{base + idx}", TS_US + idx, "bench", "{}") for idx in range(1000)]
+        )
+
+    try:
+        elapsed = _median_seconds(insert_batch)
+    finally:
+        store.close()
+    print(f"mark_processed_many: {elapsed / 1000 * 1e6:.2f} us/event")
+    assert elapsed < 0.15
+
+
+def test_load_events_topic_page(populated_store: DedupStore) -> None:
+    elapsed = _median_seconds(
+        lambda: populated_store.load_events("topic-3", (TS_US + 5000, "topic-3", ""), 500)
+    )
+    print(f"load_events page of 500: {elapsed * 1000:.2f} ms")
+    assert elapsed < 0.015
+
+
+def test_publish_request_from_payload() -> None:
+    payload = [
+        {
+            "topic": f"topic-{idx % 10}",
+            "event_id": f"evt-{idx}",
+            "timestamp": "2025-01-01T00:00:00+00:00",
+            "source": "bench",
+            "payload": {"seq": idx, "tags": ["a", "b"]},
+        }
+        for idx in range(1000)
+    ]
+    elapsed = _median_seconds(lambda: PublishRequest.from_payload(payload))
+    print(f"PublishRequest.from_payload: {elapsed / 1000 * 1e6:.2f} us/event")
+    assert elapsed < 0.05
@@ -0,0 +1,225 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+import httpx
+import pytest
+
+from src.cluster import HashRing, PeerUnavailable
+from src.config import Settings
+from src.main import create_app
+
+
+A, B, C = "http://node-a", "http://node-b", "http://node-c"
+
+
+def _event(event_id: str, topic: str = "orders", second: int = 0) -> Dict[str, Any]:
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime(2025, 1, 1, 0, 0, second % 60, tzinfo=timezone.utc).isoformat(),
+        "source": "cluster-test",
+        "payload": {"id": event_id},
+    }
+
+
+def _events(count: int) -> list:
+    return [_event(f"e-{n}", ("orders", "users", "billing")[n % 3], n) for n in range(count)]
+
+
+def _node(tmp_path, url: str, members: list, **settings: Any) -> Any:
+    return create_app(
+        Settings(
+            database_path=tmp_path / f"{url.rsplit('-', 1)[1]}.sqlite",
+            cluster_peers=",".join(members),
+            cluster_self=url,
+            ingest_log=False,
+            **settings,
+        )
+    )
+
+
+def _wire(apps: dict) -> None:
+    transports = {url: httpx.ASGITransport(app=app) for url, app in apps.items()}
+    for app in apps.values():
+        app.state.aggregator.peer_transports = transports
+
+
+def _client(app, base_url: str = "http://admin") -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=base_url)
+
+
+async def _local_keys(app) -> set:
+    rows = await app.state.aggregator.local.load_events()
+    return {(row[0], row[1]) for row in rows}
+
+
+def test_hash_ring_spreads_keys_and_moves_few_on_growth() -> None:
+    keys = [("orders", f"evt-{n}") for n in range(20000)]
+    ring = HashRing([A, B, C], vnodes=64)
+    assert HashRing([C, A, B], vnodes=64).split(keys) == ring.split(keys)
+    shares = [len(indices) / len(keys) for indices in ring.split(keys).values()]
+    assert all(0.2 < share < 0.47 for share in shares)
+
+    grown = HashRing([A, B, C, "http://node-d"], vnodes=64)
+    moved = [key for key in keys if ring.owner(*key) != grown.owner(*key)]
+    # Only keys taken over by the new node move, about a quarter of them.
+    assert all(grown.owner(*key) == "http://node-d" for key in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.35
+
+
+@pytest.mark.asyncio
+async def test_publish_is_routed_to_owners_and_reads_are_merged(tmp_path) -> None:
+    members = [A, B, C]
+    apps = {url: _node(tmp_path, url, members) for url in members}
+    _wire(apps)
+    for app in apps.values():
+        await app.router.startup()
+    try:
+        ring = HashRing(members)
+        async with _client(apps[A], A) as client_a, _client(apps[B], B) as client_b:
+            events = _events(60)
+            assert (await client_a.post("/publish", json=events)).json() == {"accepted": 60}
+            for app in apps.values():
+                await app.state.aggregator.local.join()
+            for url, app in apps.items():
+                keys = {(event["topic"], event["event_id"]) for event in events}
+                assert await _local_keys(app) == {key for key in keys if ring.owner(*key) == url}
+
+            # Any node answers for the whole cluster, in (timestamp, topic, id) order.
+            listed = (await client_b.get("/events")).json()
+            assert len(listed) == 60
+            assert [e["timestamp"] for e in listed] == sorted(e["timestamp"] for e in listed)
+            page = await client_b.get("/events", params={"topic": "users", "limit": 7})
+            cursor = page.headers["X-Next-Cursor"]
+            rest = await client_b.get("/events", params={"topic": "users", "cursor": cursor})
+            assert len(page.json()) + len(rest.json()) == 20
+
+            sync = await client_b.post("/publish?sync=true", json=events[:3] + [_event("new-1")])
+            assert sync.json()["results"] == ["duplicate", "duplicate", "duplicate", "new"]
+            etag = (await client_a.get("/stats")).headers["ETag"]
+            stats = (await client_a.get("/stats")).json()
+            assert stats["unique_processed"] == 61 and stats["received"] == 64
+            assert stats["duplicate_dropped"] == 3
+            assert stats["topics"] == ["billing", "orders", "users"]
+            assert stats["cluster"]["nodes"] == 3 and stats["cluster"]["forwarded_events"] > 0
+            # A commit through this node changes its cluster-wide ETag at once...
+            await client_a.post("/publish?sync=true", json=[_event("new-2")])
+            revalidated = await client_a.get("/stats", headers={"If-None-Match": etag})
+            assert revalidated.status_code == 200
+            # ...one through another node once the cached peer versions expire.
+            etag = revalidated.headers["ETag"]
+            await client_b.post("/publish?sync=true", json=[_event("new-3")])
+            await asyncio.sleep(0.3)
+            revalidated = await client_a.get("/stats", headers={"If-None-Match": etag})
+            assert revalidated.status_code == 200
+    finally:
+        for app in apps.values():
+            await app.router.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_adding_a_node_hands_off_its_keys(tmp_path) -> None:
+    apps = {url: _node(tmp_path, url, [A, B]) for url in (A, B)}
+    apps[C] = _node(tmp_path, C, [A, B, C])
+    _wire(apps)
+    for app in apps.values():
+        await app.router.startup()
+    try:
+        events = _events(300)
+        async with _client(apps[A], A) as client:
+            await client.post("/publish?sync=true", json=events)
+            assert await _local_keys(apps[C]) == set()
+
+            for app in apps.values():
+                async with _client(app) as admin:
+                    ring_update = {"nodes": [A, B, C], "epoch": 1, "previous": [A, B]}
+                    assert (await admin.put("/cluster/ring", json=ring_update)).status_code == 200
+            async with _client(apps[B]) as admin:
+                stale = await admin.put("/cluster/ring", json={"nodes": [A, B], "epoch": 0})
+                assert stale.status_code == 409
+            for app in apps.values():
+                app.state.aggregator.rebalance()
+            while any(app.state.aggregator.handoff_running for app in apps.values()):
+                await asyncio.sleep(0.01)
+
+            ring = HashRing([A, B, C])
+            for url, app in apps.items():
+                assert all(ring.owner(*key) == url for key in await _local_keys(app))
+            assert len(await _local_keys(apps[C])) > 50
+            stats = (await client.get("/stats")).json()
+            assert stats["unique_processed"] == 300
+            handed_off = sum(
+                apps[url].state.aggregator.cluster_stats()["handed_off"] for url in (A, B)
+            )
+            assert handed_off == len(await _local_keys(apps[C]))
+            assert len((await client.get("/events")).json()) == 300
+            # The new owner still knows the handed-off keys.
+            dup = (await client.post("/publish?sync=true", json=events)).json()
+            assert dup["duplicates"] == 300
+    finally:
+        for app in apps.values():
+            await app.router.shutdown()
+    assert (tmp_path / "a.ring.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_pruned_events_still_dedup_during_and_after_handoff(tmp_path) -> None:
+    apps = {url: _node(tmp_path, url, [A, B], event_retention_days=1) for url in (A, B)}
+    apps[C] = _node(tmp_path, C, [A, B, C], event_retention_days=1)
+    _wire(apps)
+    for app in apps.values():
+        await app.router.startup()
+    try:
+        events = _events(120)
+        ring = HashRing([A, B, C])
+        moved = [event for event in events if ring.owner(event["topic"], event["event_id"]) == C]
+        async with _client(apps[A], A) as client:
+            await client.post("/publish?sync=true", json=events)
+            for url in (A, B):
+                await apps[url].state.aggregator.local.run_retention()
+            assert (await client.get("/events")).json() == []
+
+            ring_update = {"nodes": [A, B, C], "epoch": 1, "previous": [A, B]}
+            for app in apps.values():
+                async with _client(app) as admin:
+                    await admin.put("/cluster/ring", json=ring_update)
+            # Before any handoff, C asks the previous owners about the moved keys.
+            early = (await client.post("/publish?sync=true", json=moved[:5])).json()
+            assert early["duplicates"] == 5
+
+            for app in apps.values():
+                app.state.aggregator.rebalance()
+            while any(app.state.aggregator.handoff_running for app in apps.values()):
+                await asyncio.sleep(0.01)
+            # The finished handoffs were announced, so C stops asking.
+            assert apps[C].state.aggregator.ring_info()["draining"] == []
+
+            resent = (await client.post("/publish?sync=true", json=events)).json()
+            assert resent["duplicates"] == 120
+            stats = (await client.get("/stats")).json()
+            assert stats["unique_processed"] == 120
+        local_c = apps[C].state.aggregator.local
+        assert (await local_c.get_stats()).unique_processed == len(moved)
+    finally:
+        for app in apps.values():
+            await app.router.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_peer_error_answers_are_unavailable_not_parsed(tmp_path) -> None:
+    apps = {url: _node(tmp_path, url, [A, B]) for url in (A, B)}
+    _wire(apps)
+    apps[A].state.aggregator.peer_transports[B] = httpx.MockTransport(
+        lambda request: httpx.Response(404, text="not found")
+    )
+    for app in apps.values():
+        await app.router.startup()
+    try:
+        aggregator = apps[A].state.aggregator
+        for read in (aggregator.get_stats, aggregator.get_rollups, aggregator.stats_version):
+            with pytest.raises(PeerUnavailable, match="answered 404"):
+                await read()
+    finally:
+        for app in apps.values():
+            await app.router.shutdown()
@@ -0,0 +1,171 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from src.dedup_store import DedupStore
+
+
+TS_US = 1_735_689_600_000_000  # 2025-01-01T00:00:00Z
+
+
+def _record(
+    topic: str, event_id: str, seq: int = 0, ts_us: int = TS_US
+) -> tuple[str, str, int, str, str]:
+    return (topic, event_id, ts_us, "pub", f'{{"seq": {seq}}}')
+
+
+def test_mark_processed_many_reports_per_event_status(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    assert store.mark_processed(*_record("orders", "evt-0")) is True
+
+    results = store.mark_processed_many(
+        [
+            _record("orders", "evt-0"),
+            _record("orders", "evt-1"),
+            _record("orders", "evt-1", seq=1),
+            _record("billing", "evt-1"),
+        ]
+    )
+
+    assert results == [False, True, False, True]
+    assert store.stats() == {"received": 3, "unique_processed": 3}
+    payloads = [row[4] for row in store.load_events("orders")]
+    assert '{"seq": 0}' in payloads and '{"seq": 1}' not in payloads
+
+
+def test_mark_processed_set_resolves_batch_with_one_lookup(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    store.mark_processed_many([_record("orders", "evt-0"), _record("orders", "evt-2")])
+    batch = [
+        _record("orders", "evt-0"),
+        _record("orders", "evt-1"),
+        _record("orders", "evt-1", seq=1),
+        _record("billing", "evt-0"),
+        _record("orders", "evt-2"),
+    ]
+
+    assert store.mark_processed_set(batch) == [False, True, False, True, False]
+    assert store.mark_processed_set(batch) == [False] * 5
+    assert store.stats() == {"received": 4, "unique_processed": 4}
+    assert [row[1] for row in store.load_events("orders")] == ["evt-0", "evt-1", "evt-2"]
+    store.close()
+
+
+def test_reads_do_not_wait_for_open_write_transaction(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    store.mark_processed(*_record("orders", "evt-0"))
+    try:
+        with store._connect() as conn:
+            conn.execute(
+                "INSERT INTO dedup (topic_id, event_id) VALUES (?, ?)", (1, "evt-pending")
+            )
+            assert conn.in_transaction
+            assert store.stats()["unique_processed"] == 1
+            conn.rollback()
+    finally:
+        store.close()
+
+
+def test_wrong_known_new_hint_falls_back_to_probe(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    store.mark_processed(*_record("orders", "evt-0"))
+
+    results = store.mark_processed_many(
+        [_record("orders", "evt-0"), _record("orders", "evt-1")],
+        known_new=[True, True],
+    )
+
+    assert results == [False, True]
+    assert store.stats()["unique_processed"] == 2
+    store.close()
+
+
+def test_legacy_database_is_migrated_with_counters(tmp_path) -> None:
+    db_path = tmp_path / "legacy.sqlite"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        CREATE TABLE dedup (
+            topic TEXT NOT NULL,
+            event_id TEXT NOT NULL,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (topic, event_id)
+        );
+        CREATE TABLE processed_events (
+            topic TEXT NOT NULL,
+            event_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            source TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            PRIMARY KEY (topic, event_id)
+        );
+        """
+    )
+    for topic, event_id in (("orders", "evt-0"), ("billing", "evt-1")):
+        conn.execute("INSERT INTO dedup (topic, event_id) VALUES (?, ?)", (topic, event_id))
+        conn.execute(
+            "INSERT INTO processed_events VALUES (?, ?, ?, ?, ?)",
+            (topic, event_id, "2025-01-01T00:00:01+01:00", "pub", "{}"),
+        )
+    conn.commit()
+    conn.close()
+
+    store = DedupStore(db_path)
+    assert store.stats()["unique_processed"] == 2
+    assert store.topics() == ["billing", "orders"]
+    assert [row[2] for row in store.load_events()] == [TS_US - 3_599_000_000] * 2
+    # Rollups are backfilled from the migrated rows.
+    assert [row[3] for row in store.load_rollups()[0]] == [1, 1]
+
+    store.mark_processed(*_record("audit", "evt-2"))
+    assert store.stats()["unique_processed"] == 3
+    assert store.topics() == ["audit", "billing", "orders"]
+    store.close()
+
+
+def test_time_range_and_source_queries_use_indexes(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    store.mark_processed_many(
+        [_record("orders", f"evt-{idx}", ts_us=TS_US + idx) for idx in range(10)]
+    )
+
+    rows = store.load_events("orders", since_us=TS_US + 3, until_us=TS_US + 6)
+    assert [row[1] for row in rows] == ["evt-3", "evt-4", "evt-5"]
+    assert len(store.load_events(source="pub", since_us=TS_US + 8)) == 2
+    assert store.load_events(source="other") == []
+
+    with store._read() as conn:
+        plan = " ".join(
+            str(row[-1])
+            for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM processed_events "
+                "WHERE topic_id = ? AND ts_us >= ? ORDER BY ts_us, event_id",
+                (1, TS_US),
+            )
+        )
+    assert "processed_events_topic_ts" in plan and "TEMP B-TREE" not in plan
+    store.close()
+
+
+def test_retention_prunes_in_chunks_and_keeps_counters(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    store.mark_processed_many(
+        [_record("orders", f"evt-{idx}", idx, TS_US + idx) for idx in range(5)]
+    )
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+
+    assert store.prune_dedup_keys(datetime.now(timezone.utc) - timedelta(days=1)) == []
+    first = store.prune_dedup_keys(future, limit=3)
+    assert len(first) == 3
+    assert len(store.prune_dedup_keys(future, limit=3)) == 2
+    assert store.prune_events(TS_US + 3, limit=2) == 2
+    assert store.prune_events(TS_US + 3, limit=2) == 1
+
+    assert [row[1] for row in store.load_events()] == ["evt-3", "evt-4"]
+    assert store.stats()["unique_processed"] == 5
+    assert store.prune_stats() == {"dedup_pruned": 5, "events_pruned": 3}
+    assert store.incremental_vacuum() >= 0
+
+    # A forgotten key is accepted again as new.
+    assert store.mark_processed(*_record(*first[0])) is True
+    assert store.stats()["unique_processed"] == 6
+    store.close()
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from src.dispatch import PartitionedDispatcher
+
+
+def _by_key(item: tuple[str, int]) -> str:
+    return item[0]
+
+
+@pytest.mark.asyncio
+async def test_same_key_stays_on_one_partition_in_order() -> None:
+    dispatcher = PartitionedDispatcher(4, _by_key)
+    items = [(f"k{idx % 3}", idx) for idx in range(30)]
+    await dispatcher.put_many(items)
+    assert sum(dispatcher.depths()) == 30
+
+    seen: dict[str, list[int]] = {}
+    for partition, depth in enumerate(dispatcher.depths()):
+        if not depth:
+            continue
+        batch = await dispatcher.get_batch(partition, 100, 0)
+        assert {dispatcher.partition_for(item) for item in batch} == {partition}
+        for key, seq in batch:
+            seen.setdefault(key, []).append(seq)
+        await dispatcher.task_done(partition, len(batch))
+
+    assert seen == {f"k{mod}": list(range(mod, 30, 3)) for mod in range(3)}
+    await asyncio.wait_for(dispatcher.join(), 1)
+
+
+@pytest.mark.asyncio
+async def test_fair_mode_interleaves_hot_and_cold_keys() -> None:
+    dispatcher = PartitionedDispatcher(1, _by_key, fair=True, quantum=2)
+    await dispatcher.put_many([("hot", idx) for idx in range(10)] + [("cold", 0), ("cold", 1)])
+
+    batch = await dispatcher.get_batch(0, 4, 0)
+    assert batch == [("hot", 0), ("hot", 1), ("cold", 0), ("cold", 1)]
+    assert await dispatcher.get_batch(0, 3, 0) == [("hot", 2), ("hot", 3), ("hot", 4)]
+
+
+@pytest.mark.asyncio
+async def test_bounded_partition_blocks_until_drained_and_close_releases() -> None:
+    dispatcher = PartitionedDispatcher(1, _by_key, maxsize=2)
+    await dispatcher.put_many([("k", 0), ("k", 1)])
+    blocked = asyncio.create_task(dispatcher.put(("k", 2)))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    assert await dispatcher.get_batch(0, 1, 0) == [("k", 0)]
+    await asyncio.wait_for(blocked, 1)
+    assert dispatcher.depths() == [2]
+
+    await dispatcher.close()
+    assert await dispatcher.get_batch(0, 10, 1) == [("k", 1), ("k", 2)]
+    assert await dispatcher.get_batch(0, 10, 1) == []
+
+
+@pytest.mark.asyncio
+async def test_maxsize_bounds_all_partitions_together() -> None:
+    dispatcher = PartitionedDispatcher(4, _by_key, maxsize=3)
+    items = [(f"k{idx}", idx) for idx in range(6)]
+    assert dispatcher.fitting_prefix(items) == 3
+    dispatcher.put_many_nowait(items[:3])
+    assert dispatcher.fitting_prefix(items[3:]) == 0
+
+    blocked = asyncio.create_task(dispatcher.put(items[3]))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    assert dispatcher.qsize() == 3
+
+    first = dispatcher.partition_for(items[0])
+    assert await dispatcher.get_batch(first, 10, 0)
+    await asyncio.wait_for(blocked, 1)
+    assert dispatcher.qsize() <= 3
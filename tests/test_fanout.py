@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+import httpx
+import pytest
+
+from src.config import Settings
+from src.fanout import FanoutHub, LiveEvent, Notice, SubscriptionClosed
+from src.main import create_app
+from src.models import Event
+from src.service import _live_event, _row_key, create_service, encode_cursor
+from src.writer import serve_writer
+
+
+def _event(event_id: str, topic: str = "orders", second: int = 0) -> Dict[str, Any]:
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime(2025, 1, 1, 0, 0, second, tzinfo=timezone.utc).isoformat(),
+        "source": "fanout-test",
+        "payload": {"id": event_id},
+    }
+
+
+def _live(event_id: str, topic: str = "orders") -> LiveEvent:
+    return LiveEvent(topic, (0, topic, event_id), b"", event_id)
+
+
+def _ids(batch) -> list:
+    return [item.key[2] if isinstance(item, LiveEvent) else item.kind for item in batch]
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_policies() -> None:
+    hub = FanoutHub(buffer_size=2, policy="drop")
+    orders = hub.subscribe("orders")
+    everything = hub.subscribe(None)
+    assert hub.wants("orders") and hub.wants("users")
+    hub.publish([_live("a"), _live("b"), _live("c"), _live("x", "users")])
+    items, dropped = await orders.get(0)
+    assert [item.ws for item in items] == ["b", "c"] and dropped == 1
+    items, dropped = await everything.get(0)
+    assert [item.ws for item in items] == ["c", "x"] and dropped == 2
+    assert await orders.get(0.01) == ([], 0)
+    assert hub.stats()["dropped"] == 3
+
+    hub = FanoutHub(buffer_size=2, policy="disconnect")
+    slow = hub.subscribe("orders")
+    hub.publish([_live("a"), _live("b"), _live("c")])
+    assert not hub.active
+    assert hub.stats()["disconnected"] == 1
+    # What was buffered before the eviction is still handed out.
+    assert [item.ws for item in (await slow.get(0))[0]] == ["a", "b"]
+    with pytest.raises(SubscriptionClosed):
+        await slow.get(0)
+
+
+@pytest.mark.asyncio
+async def test_subscribe_replays_from_cursor_then_goes_live(tmp_path) -> None:
+    settings = Settings(database_path=tmp_path / "dedup.sqlite", worker_count=2)
+    aggregator, dedup_store = create_service(settings)
+    await aggregator.start()
+    try:
+        await aggregator.submit_batch([Event(**_event(i, second=n)) for n, i in enumerate("abc")])
+        await aggregator.join()
+        a, b, c = await aggregator.load_events("orders")
+        stream = aggregator.subscribe("orders", encode_cursor(_row_key(a)), heartbeat=0.05)
+        assert _ids(await stream.__anext__()) == ["b", "c"]
+        # A commit seen by both the replay and the live feed is yielded once.
+        aggregator.hub.publish([_live_event(*c[:4], c[4].decode())])
+        await aggregator.submit_batch(
+            [Event(**_event("d", second=5)), Event(**_event("u", "users", 6))]
+        )
+        await aggregator.join()
+        assert _ids(await stream.__anext__()) == ["d"]
+        assert await stream.__anext__() == []  # heartbeat
+        await stream.aclose()
+        assert not aggregator.hub.active
+
+        # Past the backfill budget the client is told where to page from.
+        stream = aggregator.subscribe("orders", encode_cursor(_row_key(a)), backfill_limit=1)
+        assert _ids(await stream.__anext__()) == ["b"]
+        assert await stream.__anext__() == [Notice("gap", {"cursor": encode_cursor(_row_key(b))})]
+        await stream.aclose()
+    finally:
+        await aggregator.stop()
+        dedup_store.close()
+
+
+@pytest.mark.asyncio
+async def test_frontend_subscribers_receive_writer_pushes(tmp_path) -> None:
+    socket_path = tmp_path / "writer.sock"
+    settings = Settings(database_path=tmp_path / "dedup.sqlite")
+    aggregator, dedup_store = create_service(settings)
+    stopped, ready = asyncio.Event(), asyncio.Event()
+    writer = asyncio.create_task(serve_writer(aggregator, socket_path, stopped, ready.set))
+    await asyncio.wait_for(ready.wait(), 5)
+    app = create_app(Settings(writer_socket=str(socket_path)))
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://frontend"
+        ) as client:
+            bad = await client.get("/events/subscribe", params={"cursor": "nope"})
+            assert bad.status_code == 400
+
+            stream = app.state.aggregator.subscribe("orders", heartbeat=1.0)
+            pending = asyncio.ensure_future(stream.__anext__())
+            while not aggregator.hub.active:
+                await asyncio.sleep(0.01)
+            await client.post("/publish", json=[_event("a"), _event("x", "users")])
+            batch = await asyncio.wait_for(pending, 5)
+            assert _ids(batch) == ["a"]
+            assert batch[0].sse.startswith(b"id: ")
+            await stream.aclose()
+    finally:
+        await app.router.shutdown()
+        stopped.set()
+        await writer
+        dedup_store.close()
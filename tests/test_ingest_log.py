@@ -0,0 +1,165 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from src.config import Settings
+from src.dedup_store import DedupStore
+from src.ingest_log import IngestLog
+from src.main import create_app
+from src.models import Event
+from src.service import event_record
+
+
+def _events(count: int, start: int = 0) -> list:
+    return [event_record(_event(idx)) for idx in range(start, start + count)]
+
+
+def _event(idx: int) -> Event:
+    return Event(
+        topic="orders",
+        event_id=f"evt-{idx}",
+        timestamp=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        source="log-test",
+        payload={"n": idx},
+    )
+
+
+def _replayed(log: IngestLog) -> list[tuple[int, str]]:
+    return [(seq, record[1]) for chunk in log.replay() for seq, record in chunk]
+
+
+@pytest.mark.asyncio
+async def test_replays_from_checkpoint_after_crash(tmp_path) -> None:
+    log = IngestLog(tmp_path, checkpoint_ms=0)
+    log.start()
+    log.append(_events(3))
+    await log.wait_durable(log.append(_events(2, start=3)) + 1)
+    log.mark_committed([0, 1, 3])
+    assert log.watermark == 2
+    # The next flush also persists the checkpoint.
+    await log.wait_durable(log.append(_events(1, start=5)))
+
+    # Simulate a crash: abandon the log, leaving a torn frame at the tail.
+    segment = next(tmp_path.glob("*.log"))
+    with segment.open("ab") as handle:
+        handle.write(b"\x00\x00\x01\x00partial")
+    reopened = IngestLog(tmp_path)
+    # evt-3 committed out of order and is replayed; the store drops it again.
+    assert _replayed(reopened) == [(2, "evt-2"), (3, "evt-3"), (4, "evt-4"), (5, "evt-5")]
+    assert reopened.append(_events(1, start=6)) == 6
+    await log.close()
+
+
+@pytest.mark.asyncio
+async def test_committed_segments_are_removed(tmp_path) -> None:
+    log = IngestLog(tmp_path, segment_bytes=1, checkpoint_ms=0)
+    log.start()
+    for start in range(0, 6, 2):
+        await log.wait_durable(log.append(_events(2, start=start)) + 1)
+    assert len(list(tmp_path.glob("*.log"))) == 3
+    log.mark_committed(range(4))
+    await log.wait_durable(log.append(_events(1, start=6)))
+    assert len(list(tmp_path.glob("*.log"))) == 2
+    log.mark_committed(range(4, 7))
+    await log.close()
+    assert list(tmp_path.glob("*.log")) == []
+
+    reopened = IngestLog(tmp_path)
+    assert _replayed(reopened) == []
+    assert reopened.append(_events(1)) == 7
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_writes_are_batched(tmp_path) -> None:
+    log = IngestLog(tmp_path, checkpoint_ms=60_000)
+    log.start()
+    await log.wait_durable(log.append(_events(2)) + 1)
+    log.mark_committed([0])
+    await log.wait_durable(log.append(_events(1, start=2)))
+    # The first pass wrote the checkpoint; the next advance waits for the interval.
+    assert (tmp_path / "checkpoint").read_text() == "1"
+    log.mark_committed([1, 2])
+    await log.wait_durable(log.append(_events(1, start=3)))
+    assert (tmp_path / "checkpoint").read_text() != "3"
+    await log.close()
+    assert (tmp_path / "checkpoint").read_text() == "3"
+
+
+@pytest.mark.asyncio
+async def test_service_replays_log_on_start(tmp_path) -> None:
+    settings = Settings(database_path=tmp_path / "dedup.sqlite")
+    log = IngestLog(settings.resolved_ingest_log_dir())
+    log.start()
+    await log.wait_durable(log.append(_events(3)) + 2)
+
+    app = create_app(settings)
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            await app.state.aggregator.join()
+            events = (await client.get("/events")).json()
+            assert [event["event_id"] for event in events] == ["evt-0", "evt-1", "evt-2"]
+            stats = (await client.get("/stats")).json()
+            assert stats["received"] == 3
+            assert stats["ingest_log"]["pending"] == 0
+    finally:
+        await app.router.shutdown()
+        await log.close()
+    assert list(settings.resolved_ingest_log_dir().glob("*.log")) == []
+
+
+@pytest.mark.asyncio
+async def test_replay_skips_events_that_were_already_stored(tmp_path) -> None:
+    settings = Settings(database_path=tmp_path / "dedup.sqlite")
+    store = DedupStore(settings.database_path)
+    # Committed before the crash, but after the last checkpoint was written.
+    store.mark_processed_many(_events(2))
+    store.close()
+    log = IngestLog(settings.resolved_ingest_log_dir())
+    log.start()
+    await log.wait_durable(log.append(_events(3)) + 2)
+
+    app = create_app(settings)
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            await app.state.aggregator.join()
+            stats = (await client.get("/stats")).json()
+            assert (stats["received"], stats["unique_processed"]) == (3, 3)
+            assert stats["duplicate_dropped"] == 0
+            assert stats["ingest_log"]["pending"] == 0
+            rollups = (await client.get("/stats/rollups")).json()
+            assert rollups["topics"][0]["duplicates"] == 0
+    finally:
+        await app.router.shutdown()
+        await log.close()
+
+
+@pytest.mark.asyncio
+async def test_publish_ack_modes(tmp_path) -> None:
+    app = create_app(Settings(database_path=tmp_path / "dedup.sqlite", batch_linger_ms=50))
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            event = _event(0).model_dump(mode="json")
+            resp = await client.post("/publish", params={"ack": "committed"}, json=event)
+            assert resp.json() == {"accepted": 1}
+            # No waiting: the response is only sent once the event is stored.
+            assert len((await client.get("/events")).json()) == 1
+
+            durable = {**event, "event_id": "evt-durable"}
+            resp = await client.post("/publish", params={"ack": "durable"}, json=durable)
+            assert resp.json() == {"accepted": 1}
+            assert (await client.get("/stats")).json()["ingest_log"]["flushes"] >= 2
+
+            resp = await client.post("/publish", params={"ack": "eventually"}, json=event)
+            assert resp.status_code == 422
+    finally:
+        await app.router.shutdown()
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from src.config import Settings
+from src.main import create_app
+from src.metrics import Histogram, IngestMetrics
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = Histogram("demo_seconds", "Demo.", (0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe_many([0.5, 0.7, 3.0])
+
+    lines = histogram.render()
+    assert lines[:3] == [
+        'demo_seconds_bucket{le="0.1"} 1',
+        'demo_seconds_bucket{le="1"} 3',
+        'demo_seconds_bucket{le="+Inf"} 4',
+    ]
+    assert lines[-1] == "demo_seconds_count 4"
+    assert histogram.count == 4
+
+
+def test_disabled_metrics_are_no_ops() -> None:
+    metrics = IngestMetrics(enabled=False)
+    metrics.queue_wait.observe_many([1.0, 2.0])
+    metrics.topic_events.inc(1, "orders")
+    metrics.add_gauge("g", "Gauge.", lambda: [({}, 1)])
+    assert metrics.render() == ""
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_pipeline_instruments(tmp_path) -> None:
+    app = create_app(Settings(database_path=tmp_path / "dedup.sqlite", worker_count=2))
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            now = datetime.now(timezone.utc).isoformat()
+            events = [
+                {"topic": topic, "event_id": f"evt-{idx}", "timestamp": now,
+                 "source": "metrics", "payload": {}}
+                for idx, topic in enumerate(["orders", "orders", "users"])
+            ]
+            response = await client.post("/publish", json=events)
+            assert response.status_code == 200
+            await app.state.aggregator.join()
+
+            response = await client.get("/metrics")
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/plain")
+            body = response.text
+    finally:
+        await app.router.shutdown()
+
+    assert "aggregator_publish_latency_seconds_count 1" in body
+    assert "aggregator_queue_wait_seconds_count 3" in body
+    assert "# TYPE aggregator_store_seconds histogram" in body
+    assert "aggregator_commit_batch_size_sum 3" in body
+    assert 'aggregator_topic_events_total{topic="orders"} 2' in body
+    assert 'aggregator_topic_events_total{topic="users"} 1' in body
+    assert 'aggregator_queue_depth{partition="0"} 0' in body
+    assert "aggregator_busy_workers 0" in body
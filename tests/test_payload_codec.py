@@ -0,0 +1,54 @@
+import json
+
+from src.dedup_store import DedupStore
+from src.payload_codec import PayloadCodec, train_dictionary
+
+TS_US = 1_735_689_600_000_000
+
+
+def _payload(seq: int) -> str:
+    return json.dumps(
+        {"user_id": seq, "action": "page_view", "url": f"/products/{seq}?ref=home",
+         "geo": {"country": "ID", "city": "Jakarta"}, "tags": ["new", "mobile"]}
+    )
+
+
+def test_codec_round_trips_every_encoding() -> None:
+    samples = [_payload(seq) for seq in range(200)]
+    plain = PayloadCodec()
+    dictionary = train_dictionary(samples, 2048)
+    assert 0 < len(dictionary) <= 2048
+    with_dict = PayloadCodec(dictionaries={7: dictionary})
+
+    small = '{"a": 1}'
+    assert plain.encode(small)[0] == 0
+    assert PayloadCodec("none").encode(samples[0])[0] == 0
+    assert plain.encode(samples[0])[0] == 1
+    assert with_dict.encode(samples[0])[:3] == b"\x02\x00\x07"
+    assert len(with_dict.encode(samples[5])) < len(plain.encode(samples[5]))
+
+    for codec in (plain, with_dict, PayloadCodec("none")):
+        for payload in (small, samples[3]):
+            blob = codec.encode(payload)
+            assert with_dict.decode(blob) == payload
+            assert with_dict.lazy(blob).decode() == payload
+
+
+def test_store_trains_dictionary_and_decodes_older_rows(tmp_path) -> None:
+    db_path = tmp_path / "dedup.sqlite"
+    store = DedupStore(db_path, zdict_size=4096)
+    first = [("clicks", f"evt-{seq}", TS_US + seq, "web", _payload(seq)) for seq in range(1000)]
+    store.mark_processed_many(first)
+    store.mark_processed_many([("clicks", "evt-late", TS_US + 5000, "web", _payload(5000))])
+    with store._read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM payload_dicts").fetchone()[0] == 1
+        kinds = {row[0] for row in conn.execute("SELECT substr(payload, 1, 1) FROM processed_events")}
+        assert kinds == {b"\x01", b"\x02"}
+    store.close()
+
+    reopened = DedupStore(db_path, zdict_size=4096)
+    rows = reopened.load_events("clicks", lazy=True)
+    assert rows[0][4].decode() == _payload(0)
+    assert rows[-1][4].decode() == _payload(5000)
+    assert reopened.export_rows(limit=1)[0][4] == _payload(0)
+    reopened.close()
@@ -0,0 +1,43 @@
+from src.prefilter import BloomFilter, DuplicatePrefilter, HotKeyCache
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(size_bytes=4096, false_positive_rate=0.01)
+    keys = [("orders", f"evt-{idx}") for idx in range(2000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    misses = sum(("orders", f"other-{idx}") in bloom for idx in range(2000))
+    assert misses < 200
+    assert bloom.estimated_false_positive_rate() < 0.1
+
+
+def test_hot_key_cache_evicts_least_recently_used() -> None:
+    cache = HotKeyCache(max_size=2)
+    cache.add(("t", "a"))
+    cache.add(("t", "b"))
+    assert ("t", "a") in cache
+    cache.add(("t", "c"))
+
+    assert ("t", "b") not in cache
+    assert ("t", "a") in cache and ("t", "c") in cache
+
+
+def test_prefilter_classification_and_counters() -> None:
+    prefilter = DuplicatePrefilter(bloom_bytes=1024, false_positive_rate=0.01, lru_size=10)
+    prefilter.warm([("orders", "evt-old")])
+    assert prefilter.classify(("orders", "evt-new")) is None
+
+    prefilter.mark_ready()
+    assert prefilter.classify(("orders", "evt-new")) is False
+    assert prefilter.classify(("orders", "evt-old")) is None
+
+    prefilter.record(("orders", "evt-new"), is_new=True, probed=False)
+    assert prefilter.classify(("orders", "evt-new")) is True
+
+    stats = prefilter.stats()
+    assert stats["lru_hits"] == 1
+    assert stats["bloom_negatives"] == 1
+    assert stats["bloom_maybes"] == 1
+    assert stats["bloom_keys"] == 2
@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from src.config import Settings
+from src.main import create_app
+from src.response_cache import CachedResponse, ResponseCache, etag_matches, make_etag
+
+
+def _event(event_id: str, topic: str) -> dict:
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat(),
+        "source": "cache-test",
+        "payload": {"id": event_id},
+    }
+
+
+def test_lru_evicts_oldest_and_skips_large_bodies() -> None:
+    cache = ResponseCache(max_entries=2, max_entry_bytes=8)
+    for key in ("a", "b"):
+        cache.put(key, CachedResponse(key.encode(), {}, 0.0))
+    assert cache.get("a") is not None
+    cache.put("c", CachedResponse(b"c", {}, 0.0))
+    cache.put("big", CachedResponse(b"x" * 9, {}, 0.0))
+    assert cache.get("b") is None
+    assert cache.get("big") is None
+    assert cache.stats()["entries"] == 2
+
+    etag = make_etag(("events", "orders"), "0.3")
+    assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(make_etag(("events", "orders"), "0.4"), etag)
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_follows_topic_versions(tmp_path) -> None:
+    app = create_app(Settings(database_path=tmp_path / "dedup.sqlite"))
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            aggregator = app.state.aggregator
+            await client.post("/publish", json=[_event("a", "orders"), _event("b", "users")])
+            await aggregator.join()
+
+            first = await client.get("/events", params={"topic": "orders"})
+            etag = first.headers["etag"]
+            again = await client.get(
+                "/events", params={"topic": "orders"}, headers={"If-None-Match": etag}
+            )
+            assert again.status_code == 304
+            assert again.headers["etag"] == etag
+
+            # Another topic moving does not touch this one's version.
+            await client.post("/publish", json=_event("c", "users"))
+            await aggregator.join()
+            assert (
+                await client.get(
+                    "/events", params={"topic": "orders"}, headers={"If-None-Match": etag}
+                )
+            ).status_code == 304
+            # Neither does a duplicate.
+            await client.post("/publish", json=_event("a", "orders"))
+            await aggregator.join()
+            cached = await client.get("/events", params={"topic": "orders"})
+            assert cached.headers["etag"] == etag
+            assert cached.json() == first.json()
+
+            await client.post("/publish", json=_event("d", "orders"))
+            await aggregator.join()
+            changed = await client.get(
+                "/events", params={"topic": "orders"}, headers={"If-None-Match": etag}
+            )
+            assert changed.status_code == 200
+            assert [e["event_id"] for e in changed.json()] == ["a", "d"]
+
+            stats = await client.get("/stats")
+            assert (
+                await client.get("/stats", headers={"If-None-Match": stats.headers["etag"]})
+            ).status_code == 304
+            cache = (await client.get("/stats")).json()["response_cache"]
+            assert cache["not_modified"] == 3
+            assert cache["hits"] == 2
+            assert cache["misses"] == 3
+    finally:
+        await app.router.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_etags_do_not_survive_a_restart(tmp_path) -> None:
+    settings = Settings(database_path=tmp_path / "dedup.sqlite", ingest_log=False)
+    etags = {}
+    for run, event_ids in enumerate((("a", "b"), ("c", "d"))):
+        app = create_app(settings)
+        await app.router.startup()
+        try:
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+            ) as client:
+                if run:
+                    # Same in-memory counters as before the restart, new data.
+                    await client.post(
+                        "/publish?sync=true", json=[_event(i, "orders") for i in event_ids]
+                    )
+                    for path, etag in etags.items():
+                        response = await client.get(path, headers={"If-None-Match": etag})
+                        assert response.status_code == 200
+                        assert response.headers["etag"] != etag
+                    listed = await client.get("/events?topic=orders")
+                    assert len(listed.json()) == 4
+                else:
+                    await client.post(
+                        "/publish?sync=true", json=[_event(i, "orders") for i in event_ids]
+                    )
+                    for path in ("/events?topic=orders", "/stats"):
+                        etags[path] = (await client.get(path)).headers["etag"]
+        finally:
+            await app.router.shutdown()
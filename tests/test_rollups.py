@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from src.config import Settings
+from src.dedup_store import HOUR_US, MINUTE_US, DedupStore
+from src.main import create_app
+
+TS_US = 1_735_689_600_000_000  # 2025-01-01T00:00:00Z
+# Recent enough that the retention pass at startup keeps minute buckets.
+RECENT = datetime.now(timezone.utc).replace(minute=0, second=30, microsecond=0) - timedelta(
+    hours=1
+)
+
+
+def _record(topic: str, event_id: str, ts_us: int, source: str = "pub") -> tuple:
+    return (topic, event_id, ts_us, source, "{}")
+
+
+def _event(event_id: str, topic: str = "orders", minute: int = 0, source: str = "api") -> dict:
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": (RECENT + timedelta(minutes=minute)).isoformat(),
+        "source": source,
+        "payload": {"id": event_id},
+    }
+
+
+def test_rollups_follow_commits_downsampling_and_releases(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    store.mark_processed_many(
+        [
+            _record("orders", "a", TS_US + 1),
+            _record("orders", "b", TS_US + MINUTE_US + 1),
+            _record("orders", "b", TS_US + MINUTE_US + 1),
+            _record("users", "c", TS_US + 2 * HOUR_US, source="web"),
+        ],
+        duplicates=[_record("orders", "a", TS_US + 1)],
+    )
+    buckets, sources = store.load_rollups()
+    assert buckets == [
+        ("orders", TS_US, MINUTE_US, 1, 1),
+        ("orders", TS_US + MINUTE_US, MINUTE_US, 1, 1),
+        ("users", TS_US + 2 * HOUR_US, MINUTE_US, 1, 0),
+    ]
+    assert sorted(sources) == [("orders", "pub", 2, 2), ("users", "web", 1, 0)]
+    # A bucket is in range when its start is.
+    assert store.load_rollups("orders", since_us=TS_US + 1)[0] == [
+        ("orders", TS_US + MINUTE_US, MINUTE_US, 1, 1)
+    ]
+
+    # Minutes of the first hour fold into it; later arrivals go straight there.
+    assert store.downsample_rollups(TS_US + HOUR_US, 0) == 1
+    store.mark_processed_many([_record("orders", "d", TS_US + 5 * MINUTE_US)])
+    assert store.downsample_rollups(TS_US + HOUR_US, 0) == 0
+    buckets, _ = store.load_rollups("orders")
+    assert buckets == [("orders", TS_US, HOUR_US, 3, 2)]
+
+    assert store.release_keys([("orders", "b")]) == 1
+    buckets, sources = store.load_rollups("orders")
+    assert buckets == [("orders", TS_US, HOUR_US, 2, 2)]
+    assert sources == [("orders", "pub", 2, 2)]
+    store.close()
+
+    reopened = DedupStore(tmp_path / "dedup.sqlite")
+    assert reopened.load_rollups("orders")[0] == [("orders", TS_US, HOUR_US, 2, 2)]
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_rollups_endpoint_counts_prefiltered_duplicates(tmp_path) -> None:
+    app = create_app(Settings(database_path=tmp_path / "dedup.sqlite", ingest_log=False))
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            events = [_event("e1"), _event("e2", minute=1), _event("u1", "users", source="web")]
+            await client.post("/publish", json=events)
+            await app.state.aggregator.join()
+            # Known to the pre-filter now, so these never reach the insert path.
+            await client.post("/publish", json=events[:2])
+            await app.state.aggregator.join()
+
+            response = await client.get("/stats/rollups")
+            body = response.json()
+            assert body["topics"] == [
+                {"topic": "orders", "events": 2, "duplicates": 2, "duplicate_rate": 0.5},
+                {"topic": "users", "events": 1, "duplicates": 0, "duplicate_rate": 0.0},
+            ]
+            assert {"topic": "users", "source": "web", "events": 1, "duplicates": 0} in (
+                body["sources"]
+            )
+            assert [(b["topic"], b["width_seconds"]) for b in body["series"]] == [
+                ("orders", 60), ("orders", 60), ("users", 60)
+            ]
+
+            ranged = await client.get(
+                "/stats/rollups",
+                params={
+                    "topic": "orders",
+                    "since": (RECENT + timedelta(seconds=30)).isoformat(),
+                    "series": "false",
+                },
+            )
+            assert ranged.json()["topics"][0]["events"] == 1
+            assert ranged.json()["series"] == []
+
+            etag = response.headers["ETag"]
+            cached = await client.get("/stats/rollups", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            await client.post("/publish?sync=true", json=[_event("e3")])
+            fresh = await client.get("/stats/rollups", headers={"If-None-Match": etag})
+            assert fresh.json()["topics"][0]["events"] == 3
+    finally:
+        await app.router.shutdown()
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.dedup_store import DedupStore
+from src.sharding import ShardedDedupStore, reshard, shard_paths
+
+TS_US = 1_735_689_600_000_000
+
+
+def _record(topic: str, event_id: str, ts_us: int) -> tuple[str, str, int, str, str]:
+    return (topic, event_id, ts_us, "pub", "{}")
+
+
+def test_sharded_store_routes_and_merges(tmp_path) -> None:
+    store = ShardedDedupStore(tmp_path / "dedup.sqlite", shard_count=3)
+    records = [_record(f"t{idx % 2}", f"evt-{idx}", TS_US + (29 - idx)) for idx in range(30)]
+
+    assert store.mark_processed_many(records) == [True] * 30
+    assert store.mark_processed_many(records[:5] + [_record("t9", "new", TS_US)]) == [
+        False
+    ] * 5 + [True]
+
+    assert all(path.exists() for path in shard_paths(tmp_path / "dedup.sqlite", 3))
+    assert sum(shard.stats()["unique_processed"] > 0 for shard in store.shards) == 3
+    assert store.stats()["unique_processed"] == 31
+    assert store.topics() == ["t0", "t1", "t9"]
+
+    rows = store.load_events()
+    keys = [(row[2], row[0], row[1]) for row in rows]
+    assert keys == sorted(keys) and len(rows) == 31
+    page = store.load_events("t0", limit=4)
+    assert [row[2] for row in page] == sorted(row[2] for row in rows if row[0] == "t0")[:4]
+    store.close()
+
+
+def test_reshard_single_file_store(tmp_path) -> None:
+    source = DedupStore(tmp_path / "dedup.sqlite")
+    source.mark_processed_many([_record("t", f"evt-{idx}", TS_US + idx) for idx in range(50)])
+    source.close()
+
+    with pytest.raises(ValueError, match="single-file"):
+        ShardedDedupStore(tmp_path / "dedup.sqlite", shard_count=2)
+
+    target = tmp_path / "sharded" / "dedup.sqlite"
+    assert reshard(tmp_path / "dedup.sqlite", 1, target, 4) == 50
+
+    store = ShardedDedupStore(target, shard_count=4)
+    assert store.stats()["unique_processed"] == 50
+    assert store.mark_processed_many([_record("t", "evt-7", TS_US)]) == [False]
+    store.close()
+
+    with pytest.raises(ValueError, match="records 4 shards"):
+        ShardedDedupStore(target, shard_count=2)
+
+
+@pytest.mark.asyncio
+async def test_app_with_sharded_store(tmp_path) -> None:
+    import httpx
+
+    from src.config import Settings
+    from src.main import create_app
+
+    app = create_app(Settings(database_path=tmp_path / "dedup.sqlite", shard_count=2))
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            events = [
+                {
+                    "topic": "sharded",
+                    "event_id": f"evt-{idx % 20}",
+                    "timestamp": "2025-01-01T00:00:00+00:00",
+                    "source": "pub",
+                    "payload": {"seq": idx},
+                }
+                for idx in range(40)
+            ]
+            await client.post("/publish", json=events)
+            for _ in range(100):
+                stats = (await client.get("/stats")).json()
+                if stats["unique_processed"] + stats["duplicate_dropped"] >= 40:
+                    break
+                await asyncio.sleep(0.02)
+            assert stats["unique_processed"] == 20
+            assert stats["duplicate_dropped"] == 20
+            assert len((await client.get("/events", params={"topic": "sharded"})).json()) == 20
+    finally:
+        await app.router.shutdown()
+
+
+def test_reshard_carries_pruned_keys_counters_and_rollups(tmp_path) -> None:
+    source = ShardedDedupStore(tmp_path / "dedup.sqlite", shard_count=2)
+    records = [_record("t", f"evt-{idx}", TS_US + idx) for idx in range(20)]
+    source.mark_processed_many(records, duplicates=records[:3])
+    assert source.prune_events(TS_US + 10) == 10
+    # One key per shard.
+    assert len(source.prune_dedup_keys(datetime.now(timezone.utc) + timedelta(days=1), 1)) == 2
+    before = (source.stats(), source.prune_stats())
+    source.close()
+
+    target = tmp_path / "single" / "dedup.sqlite"
+    assert reshard(tmp_path / "dedup.sqlite", 2, target, 3) == 18
+    store = ShardedDedupStore(target, shard_count=3)
+    assert (store.stats(), store.prune_stats()) == before
+    assert store.stats()["unique_processed"] == 20
+    buckets, sources = store.load_rollups()
+    assert sum(row[3] for row in buckets) == 20
+    assert sum(row[4] for row in buckets) == 3
+    assert [(row[2], row[3]) for row in sources] == [(20, 3)]
+    # Keys whose events were pruned are still known on the new layout.
+    kept = {key for shard in store.shards for chunk in shard.iter_dedup_keys() for key in chunk}
+    assert len(kept) == 18
+    assert store.mark_processed_many(records[5:8]) == [
+        ("t", f"evt-{idx}") not in kept for idx in range(5, 8)
+    ]
+    store.close()
@@ -0,0 +1,220 @@
+import gzip
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import pytest
+
+from src.config import Settings
+from src.dedup_store import DedupStore
+from src.main import create_app
+from src.sharding import open_store
+from src.snapshot import export_line, import_chunks, iter_export, read_export
+
+
+TS_US = 1_735_689_600_000_000  # 2025-01-01T00:00:00Z
+
+
+def _record(topic: str, event_id: str, second: int = 0) -> tuple[str, str, int, str, str]:
+    return (topic, event_id, TS_US + second * 1_000_000, "pub", f'{{"id": "{event_id}"}}')
+
+
+def _indexes(path) -> set:
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+            )
+        }
+    finally:
+        conn.close()
+
+
+def test_backup_while_writing_is_a_consistent_store(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    store.mark_processed_many([_record("orders", f"seed-{n}") for n in range(500)])
+    stop = threading.Event()
+
+    def ingest() -> None:
+        n = 0
+        while not stop.is_set():
+            store.mark_processed_many([_record("orders", f"live-{n}-{i}") for i in range(50)])
+            n += 1
+
+    writer = threading.Thread(target=ingest)
+    writer.start()
+    try:
+        target = tmp_path / "backup" / "dedup.sqlite"
+        assert store.backup(target) > 0
+        assert store.backup(target) > 0  # overwriting an earlier copy is fine
+    finally:
+        stop.set()
+        writer.join()
+
+    copy = DedupStore(target)
+    counters = copy.stats()
+    # Counters and rows come from the same snapshot, mid-ingest or not.
+    assert counters["unique_processed"] == len(copy.load_events("orders", limit=100_000))
+    assert counters["unique_processed"] >= 500
+    assert sqlite3.connect(target).execute("PRAGMA integrity_check").fetchone() == ("ok",)
+    copy.close()
+    store.close()
+
+
+def test_export_import_roundtrip_with_filters_and_deferred_indexes(tmp_path) -> None:
+    source = open_store(tmp_path / "source.sqlite", 2)
+    source.mark_processed_many(
+        [_record("orders", f"o-{n}", n) for n in range(30)]
+        + [_record("users", f"u-{n}", n) for n in range(10)]
+    )
+    out = tmp_path / "orders.ndjson.gz"
+    with gzip.open(out, "wb") as handle:
+        for rows in iter_export(
+            source, topic="orders", since_us=TS_US + 5_000_000, until_us=TS_US + 25_000_000,
+            chunk_size=7,
+        ):
+            handle.write(b"".join(export_line(row) for row in rows))
+
+    target_path = tmp_path / "target.sqlite"
+    target = DedupStore(target_path)
+    target.mark_processed(*_record("orders", "o-5", 5))
+    before = _indexes(target_path)
+    with gzip.open(out, "rb") as handle:
+        added = import_chunks(target, read_export(handle, chunk_size=6), defer_indexes=True)
+    assert added == 19  # o-5 .. o-24, o-5 was already there
+    assert _indexes(target_path) == before
+    assert [row[1] for row in target.load_events("orders", limit=100)] == [
+        f"o-{n}" for n in range(5, 25)
+    ]
+    assert target.load_events("users") == []
+
+    # The dedup timestamps travel with the rows and a second import is a no-op.
+    exported = {row[1]: row[5] for rows in iter_export(source, topic="orders") for row in rows}
+    imported = {row[1]: row[5] for rows in iter_export(target) for row in rows}
+    assert all(imported[key] == exported[key] for key in imported if key != "o-5")
+    with gzip.open(out, "rb") as handle:
+        assert import_chunks(target, read_export(handle)) == 0
+    with pytest.raises(ValueError, match="line 2"):
+        list(read_export([b"", b'{"topic": "orders"}']))
+    target.close()
+    source.close()
+
+
+def test_import_normalizes_processed_at_for_retention(tmp_path) -> None:
+    def line(event_id: str, processed_at: object) -> bytes:
+        row = export_line(("orders", event_id, TS_US, "pub", "{}", None))
+        data = json.loads(row)
+        data["processed_at"] = processed_at
+        return json.dumps(data).encode()
+
+    rows = next(
+        read_export(
+            [
+                line("old", "2026-01-01T00:00:00Z"),
+                line("offset", "2026-01-01T02:30:00+02:00"),
+                line("new", "2026-03-01 00:00:00"),
+            ]
+        )
+    )
+    assert [row[5] for row in rows] == [
+        "2026-01-01 00:00:00",
+        "2026-01-01 00:30:00",
+        "2026-03-01 00:00:00",
+    ]
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    assert import_chunks(store, [rows]) == 3
+    # "2026-01-01T..." sorted after "2026-01-01 ..." as text and was never pruned.
+    pruned = store.prune_dedup_keys(datetime(2026, 1, 1, 0, 10, tzinfo=timezone.utc))
+    assert pruned == [("orders", "old")]
+    assert len(store.prune_dedup_keys(datetime(2026, 2, 1, tzinfo=timezone.utc))) == 1
+    store.close()
+
+    for bad in (1767225600, "yesterday"):
+        with pytest.raises(ValueError, match="line 1"):
+            list(read_export([line("bad", bad)]))
+
+
+def test_export_keeps_dedup_keys_whose_events_were_pruned(tmp_path) -> None:
+    source = DedupStore(tmp_path / "source.sqlite")
+    source.mark_processed_many([_record("orders", f"o-{n}", n) for n in range(4)])
+    assert source.prune_events(TS_US + 2_000_000) == 2
+    lines = [export_line(row) for rows in iter_export(source) for row in rows]
+    assert len(lines) == 4
+    assert json.loads(lines[0])["payload"] is None
+    # A time range selects events, so the key-only rows drop out.
+    assert [row[1] for rows in iter_export(source, since_us=TS_US) for row in rows] == [
+        "o-2", "o-3"
+    ]
+
+    target = DedupStore(tmp_path / "target.sqlite")
+    assert import_chunks(target, read_export(lines)) == 4
+    assert target.stats()["unique_processed"] == 4
+    assert [row[1] for row in target.load_events("orders")] == ["o-2", "o-3"]
+    # The pruned keys still reject their duplicates on the copy.
+    assert target.mark_processed_many([_record("orders", "o-0"), _record("orders", "o-9")]) == [
+        False, True
+    ]
+    assert target.load_rollups("orders")[0][0][3:] == (3, 1)
+    with pytest.raises(ValueError, match="processed_at"):
+        list(read_export([export_line(("orders", "x", None, None, None, None))]))
+    target.close()
+    source.close()
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_snapshot_export_and_import(tmp_path) -> None:
+    def _event(event_id: str, topic: str = "orders") -> dict:
+        return {
+            "topic": topic,
+            "event_id": event_id,
+            "timestamp": datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat(),
+            "source": "snapshot-test",
+            "payload": {"id": event_id},
+        }
+
+    assert not any(
+        route.path.startswith("/admin")
+        for route in create_app(Settings(database_path=tmp_path / "off.sqlite")).routes
+    )
+    source = create_app(Settings(database_path=tmp_path / "a.sqlite", admin_endpoints=True))
+    target = create_app(Settings(database_path=tmp_path / "b.sqlite", admin_endpoints=True))
+    await source.router.startup()
+    await target.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=source), base_url="http://a"
+        ) as a, httpx.AsyncClient(transport=httpx.ASGITransport(app=target), base_url="http://b") as b:
+            await a.post("/publish", json=[_event("e1"), _event("e2"), _event("u1", "users")])
+            await source.state.aggregator.join()
+
+            snapshot = (await a.post("/admin/snapshot")).json()
+            assert snapshot["pages"] > 0
+            copy = DedupStore(Path(snapshot["path"]))
+            assert copy.stats()["unique_processed"] == 3
+            copy.close()
+
+            export = await a.get("/admin/export", params={"topic": "orders"})
+            assert export.headers["content-type"].startswith("application/x-ndjson")
+            body = export.content + b"not json\n"
+            result = (await b.post("/admin/import", content=body)).json()
+            assert result == {
+                "imported": 2,
+                "skipped": 0,
+                "rejected": 1,
+                "errors": [result["errors"][0]],
+            }
+            assert result["errors"][0]["line"] == 3
+            assert (await b.post("/admin/import", content=export.content)).json()["skipped"] == 2
+
+            events = (await b.get("/events", params={"topic": "orders"})).json()
+            assert [event["event_id"] for event in events] == ["e1", "e2"]
+            stats = (await b.get("/stats")).json()
+            assert stats["unique_processed"] == 2 and stats["received"] == 0
+    finally:
+        await target.router.shutdown()
+        await source.router.shutdown()
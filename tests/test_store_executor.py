@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.dedup_store import DedupStore
+from src.metrics import IngestMetrics
+from src.store_executor import StoreExecutor
+
+
+def _record(event_id: str) -> tuple:
+    return ("orders", event_id, 1_700_000_000_000_000, "executor-test", "{}")
+
+
+@pytest.mark.asyncio
+async def test_queued_inserts_are_coalesced_in_order(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    metrics = IngestMetrics()
+    executor = StoreExecutor(store, metrics=metrics)
+    gate = threading.Event()
+    try:
+        # Park the writer thread so the next inserts queue up behind it.
+        blocker = asyncio.create_task(executor.write(gate.wait, 5))
+        await asyncio.sleep(0.05)
+        inserts = [
+            asyncio.create_task(executor.mark_processed_many([_record("a"), _record("b")])),
+            asyncio.create_task(executor.mark_processed_many([_record("b")], [True])),
+            asyncio.create_task(executor.mark_processed_many([_record("c")])),
+        ]
+        await asyncio.sleep(0.05)
+        assert executor.write_backlog() == 4
+        gate.set()
+        assert await blocker is True
+        # One transaction; the repeated key is a duplicate of the earlier caller's row.
+        assert await asyncio.gather(*inserts) == [[True, True], [False], [True]]
+        assert metrics.store_coalesced_calls.count == 1
+        assert metrics.store_queue_wait.count == 4
+        assert executor.write_backlog() == 0
+
+        rows = await executor.read(store.load_events)
+        assert [row[1] for row in rows] == ["a", "b", "c"]
+        assert metrics.store_read_queue_wait.count == 1
+    finally:
+        executor.close()
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_writer_errors_reach_the_caller(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    executor = StoreExecutor(store)
+
+    def fail() -> None:
+        raise RuntimeError("boom")
+
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            await executor.write(fail)
+        # The writer thread survives and keeps serving.
+        assert await executor.mark_processed_many([_record("a")]) == [True]
+    finally:
+        executor.close()
+        store.close()
+
+
+@pytest.mark.asyncio
+async def test_base_exception_fails_pending_writes_instead_of_hanging(tmp_path) -> None:
+    store = DedupStore(tmp_path / "dedup.sqlite")
+    executor = StoreExecutor(store)
+    gate = threading.Event()
+
+    def exit_thread() -> None:
+        raise SystemExit("writer stopped")
+
+    async def expect_exit() -> None:
+        # Caught inside the task: a Task re-raises SystemExit out of the loop.
+        with pytest.raises(SystemExit):
+            await executor.write(exit_thread)
+
+    try:
+        blocker = asyncio.create_task(executor.write(gate.wait, 5))
+        await asyncio.sleep(0.05)
+        fatal = asyncio.create_task(expect_exit())
+        queued = asyncio.create_task(executor.mark_processed_many([_record("a")]))
+        await asyncio.sleep(0.05)
+        gate.set()
+        assert await blocker is True
+        await asyncio.wait_for(fatal, 2)
+        with pytest.raises(RuntimeError, match="writer thread died"):
+            await asyncio.wait_for(queued, 2)
+        with pytest.raises(RuntimeError, match="writer thread died"):
+            await executor.mark_processed_many([_record("b")])
+        assert executor.write_backlog() == 0
+        # close() joins the dead thread; the next write starts a fresh one.
+        executor.close()
+        assert await executor.mark_processed_many([_record("b")]) == [True]
+    finally:
+        executor.close()
+        store.close()
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from src.config import Settings
+from src.main import create_app
+from src.tracing import Tracer
+
+WORKER_SPANS = ["queue_wait", "prefilter", "store_queue", "store_commit", "record"]
+
+
+def _event(event_id: str, topic: str = "orders") -> dict:
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat(),
+        "source": "tracing-test",
+        "payload": {"id": event_id},
+    }
+
+
+def test_tracer_samples_and_keeps_the_slowest() -> None:
+    assert Tracer(0.0).start("publish") is None
+    tracer = Tracer(1.0, keep=3)
+    for seconds in (5, 1, 4, 2, 3):
+        trace = tracer.start("publish", started=time.perf_counter() - seconds)
+        trace.pending = 1
+        trace.seal()
+        assert not trace.finished  # waits for its queued event
+        trace.settle(1)
+    assert [round(trace["total_ms"] / 1000) for trace in tracer.slowest()] == [5, 4, 3]
+    assert tracer.stats()["sampled"] == 5 and tracer.stats()["kept"] == 3
+
+
+@pytest.mark.asyncio
+async def test_publish_traces_and_debug_endpoints(tmp_path) -> None:
+    plain = create_app(Settings(database_path=tmp_path / "plain.sqlite"))
+    assert not any(route.path.startswith("/debug") for route in plain.routes)
+
+    app = create_app(
+        Settings(
+            database_path=tmp_path / "dedup.sqlite",
+            debug_endpoints=True,
+            trace_sample_rate=1.0,
+            trace_keep=10,
+            ingest_log=False,
+        )
+    )
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            committed = await client.post(
+                "/publish?ack=committed", json=[_event("e1"), _event("e2", "users")]
+            )
+            trace_id = int(committed.headers["X-Trace-Id"])
+            await client.post("/publish?sync=true", json=[_event("e1"), _event("e3")])
+            await client.post("/publish", json=[_event("e4")])
+            await app.state.aggregator.join()
+
+            body = (await client.get("/debug/traces")).json()
+            assert body["tracer"]["sampled"] == 3 and body["tracer"]["finished"] == 3
+            traces = {trace["trace_id"]: trace for trace in body["traces"]}
+            spans = [span["name"] for span in traces[trace_id]["spans"]]
+            assert spans[:2] == ["parse", "admit"] and spans.count("ack_wait") == 1
+            # One set of worker spans per batch holding events of the request.
+            worker = [name for name in spans[2:] if name != "ack_wait"]
+            assert set(worker) == set(WORKER_SPANS) and len(worker) in (5, 10)
+            assert traces[trace_id]["events"] == 2
+            sync_trace = next(t for t in body["traces"] if t["route"] == "publish?sync")
+            assert [span["name"] for span in sync_trace["spans"]] == [
+                "parse", "store_queue", "store_commit", "record"
+            ]
+            durations = [trace["total_ms"] for trace in body["traces"]]
+            assert durations == sorted(durations, reverse=True)
+
+            async def load() -> None:
+                for n in range(20):
+                    await client.post("/publish", json=[_event(f"load-{n}")])
+                    await asyncio.sleep(0.005)
+
+            report, _ = await asyncio.gather(
+                client.get("/debug/profile", params={"seconds": 0.3, "sort": "tottime"}),
+                load(),
+            )
+            assert "submit_records" in report.text
+            sampled, busy = await asyncio.gather(
+                client.get("/debug/profile", params={"seconds": 0.3, "mode": "sample"}),
+                client.get("/debug/profile", params={"seconds": 0.1, "mode": "sample"}),
+            )
+            assert busy.status_code == 409
+            assert sampled.text.startswith("# samples=")
+            assert "store-writer;" in sampled.text
+            assert (await client.get("/debug/profile?seconds=600")).status_code == 422
+
+            await client.delete("/debug/traces")
+            assert (await client.get("/debug/traces")).json()["traces"] == []
+    finally:
+        await app.router.shutdown()
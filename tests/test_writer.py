@@ -0,0 +1,122 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict
+
+import httpx
+import pytest
+
+from src.config import Settings
+from src.main import create_app
+from src.service import create_service
+from src.writer import serve_writer
+
+
+def _event(event_id: str, topic: str = "orders") -> Dict[str, Any]:
+    return {
+        "topic": topic,
+        "event_id": event_id,
+        "timestamp": datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat(),
+        "source": "frontend-test",
+        "payload": {"id": event_id},
+    }
+
+
+@asynccontextmanager
+async def _writer(settings: Settings, socket_path) -> AsyncIterator[None]:
+    aggregator, dedup_store = create_service(settings)
+    stopped = asyncio.Event()
+    ready = asyncio.Event()
+    task = asyncio.create_task(serve_writer(aggregator, socket_path, stopped, ready.set))
+    await asyncio.wait_for(ready.wait(), 5)
+    try:
+        yield
+    finally:
+        stopped.set()
+        await task
+        dedup_store.close()
+
+
+@asynccontextmanager
+async def _frontend(socket_path) -> AsyncIterator[httpx.AsyncClient]:
+    app = create_app(Settings(writer_socket=str(socket_path)))
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://frontend") as client:
+            yield client
+    finally:
+        await app.router.shutdown()
+
+
+async def _wait_for(
+    client: httpx.AsyncClient, predicate: Callable[[Dict[str, Any]], bool]
+) -> Dict[str, Any]:
+    for _ in range(100):
+        stats = (await client.get("/stats")).json()
+        if predicate(stats):
+            return stats
+        await asyncio.sleep(0.02)
+    pytest.fail(f"stats never matched: {stats}")
+
+
+@pytest.mark.asyncio
+async def test_frontends_share_one_writer(tmp_path) -> None:
+    socket_path = tmp_path / "writer.sock"
+    settings = Settings(database_path=tmp_path / "dedup.sqlite", worker_count=2)
+    async with _writer(settings, socket_path):
+        async with _frontend(socket_path) as first, _frontend(socket_path) as second:
+            resp = await first.post("/publish", json=[_event("a"), _event("b")])
+            assert resp.json() == {"accepted": 2}
+            # The same key through another process is still a duplicate.
+            resp = await second.post("/publish", json=[_event("b"), _event("c", "billing")])
+            assert resp.json() == {"accepted": 2}
+
+            stats = await _wait_for(
+                first, lambda s: s["unique_processed"] + s["duplicate_dropped"] == 4
+            )
+            assert stats["received"] == 4
+            assert stats["unique_processed"] == 3
+            assert stats["duplicate_dropped"] == 1
+            assert stats["topics"] == ["billing", "orders"]
+            other = (await second.get("/stats")).json()
+            assert {k: other[k] for k in ("received", "unique_processed", "topics")} == {
+                k: stats[k] for k in ("received", "unique_processed", "topics")
+            }
+
+            events = (await second.get("/events", params={"topic": "orders"})).json()
+            assert [e["event_id"] for e in events] == ["a", "b"]
+            assert events[0]["payload"] == {"id": "a"}
+
+            page = await first.get("/events", params={"limit": 2})
+            assert len(page.json()) == 2
+            rest = await first.get(
+                "/events", params={"limit": 2, "cursor": page.headers["X-Next-Cursor"]}
+            )
+            assert len(rest.json()) == 1
+
+            stream = await second.get("/events", params={"format": "ndjson"})
+            lines = [json.loads(line) for line in stream.text.splitlines()]
+            assert [line["event_id"] for line in lines] == ["c", "a", "b"]
+
+            metrics = (await first.get("/metrics")).text
+            assert "aggregator_frontend_connections 2" in metrics
+            # Publish latencies travel with the next request to the writer.
+            assert "aggregator_publish_latency_seconds_count 2" in metrics
+
+
+@pytest.mark.asyncio
+async def test_frontend_maps_writer_admission_rejection(tmp_path) -> None:
+    socket_path = tmp_path / "writer.sock"
+    settings = Settings(
+        database_path=tmp_path / "dedup.sqlite",
+        admission_policy="reject",
+        admission_high_water=2,
+    )
+    async with _writer(settings, socket_path):
+        async with _frontend(socket_path) as client:
+            resp = await client.post("/publish", json=[_event(str(i)) for i in range(5)])
+            assert resp.status_code == 429
+            assert resp.json()["reason"] == "high_water"
+            assert int(resp.headers["Retry-After"]) >= 1